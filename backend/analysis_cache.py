@@ -0,0 +1,160 @@
+import os
+import io
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+
+CACHE_PATH = os.getenv('ANALYSIS_CACHE_PATH', 'cache/analysis.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    content_hash TEXT NOT NULL,
+    analyzer TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    result TEXT NOT NULL,
+    features BLOB,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, analyzer)
+);
+"""
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _pack_features(features: Optional[Dict[str, np.ndarray]]) -> Optional[bytes]:
+    if not features:
+        return None
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **features)
+    return buffer.getvalue()
+
+def _unpack_features(blob: Optional[bytes]) -> Dict[str, np.ndarray]:
+    if not blob:
+        return {}
+    with np.load(io.BytesIO(blob)) as data:
+        return {name: data[name] for name in data.files}
+
+class AnalysisCache:
+    """Persistent cache of audio analysis results in a local SQLite file.
+
+    Results are keyed by the SHA-256 of the audio bytes, so a byte-identical
+    file is recognised under any name, and by analyzer name. Each row records
+    the analyzer fingerprint it was computed with; rows from another
+    fingerprint count as misses and can be purged. File hashes are memoized
+    by (path, size, mtime) so a repeat lookup does not re-read the file.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def content_hash(self, file_path: str) -> str:
+        """Hash a file, reusing the stored hash while size and mtime are unchanged."""
+        stat = os.stat(file_path)
+        key = os.path.abspath(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size, mtime_ns, content_hash FROM files WHERE path = ?', (key,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        content_hash = hash_file(file_path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)',
+                (key, stat.st_size, stat.st_mtime_ns, content_hash)
+            )
+        return content_hash
+
+    def get(self, content_hash: str, analyzer: str, fingerprint: str) -> Optional[Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+        """Return (result, features) for a track, or None if missing or stale."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fingerprint, result, features FROM analyses WHERE content_hash = ? AND analyzer = ?',
+                (content_hash, analyzer)
+            ).fetchone()
+        if row is None or row[0] != fingerprint:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[1]), _unpack_features(row[2])
+
+    def put(self, content_hash: str, analyzer: str, fingerprint: str, result: Dict[str, Any],
+            features: Optional[Dict[str, np.ndarray]] = None) -> None:
+        """Store an analysis result, replacing any older one for the track."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO analyses (content_hash, analyzer, fingerprint, result, features, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (content_hash, analyzer, fingerprint, json.dumps(result), _pack_features(features), time.time())
+            )
+
+    def invalidate(self, content_hash: Optional[str] = None, analyzer: Optional[str] = None) -> int:
+        """Delete cached results for one track and/or analyzer, or all of them."""
+        clauses, params = [], []
+        if content_hash:
+            clauses.append('content_hash = ?')
+            params.append(content_hash)
+        if analyzer:
+            clauses.append('analyzer = ?')
+            params.append(analyzer)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._lock, self._conn:
+            return self._conn.execute(f'DELETE FROM analyses{where}', params).rowcount
+
+    def purge_stale(self, fingerprints: Dict[str, str]) -> int:
+        """Delete results computed with a fingerprint other than the analyzer's current one."""
+        removed = 0
+        with self._lock, self._conn:
+            for analyzer, fingerprint in fingerprints.items():
+                removed += self._conn.execute(
+                    'DELETE FROM analyses WHERE analyzer = ? AND fingerprint != ?', (analyzer, fingerprint)
+                ).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT analyzer, fingerprint, COUNT(*) FROM analyses GROUP BY analyzer, fingerprint'
+            ).fetchall()
+        return {
+            'path': self.path,
+            'entries': [{'analyzer': a, 'fingerprint': f, 'count': c} for a, f, c in rows],
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+_default_cache: Optional[AnalysisCache] = None
+_default_lock = threading.Lock()
+
+def get_analysis_cache() -> AnalysisCache:
+    """Shared cache instance, opened on first use."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AnalysisCache()
+        return _default_cache
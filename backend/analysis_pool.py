@@ -0,0 +1,300 @@
+import os
+import uuid
+import time
+import asyncio
+import logging
+import importlib
+import traceback
+import multiprocessing
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit."""
+
+class JobFailedError(Exception):
+    """Raised when a job raised inside its worker process."""
+
+def _worker_main(conn, preload: Tuple[str, ...]) -> None:
+    """Worker process loop: run each received call and send back its outcome."""
+    # Heavy imports happen once per worker, before it reports ready
+    for module in preload:
+        importlib.import_module(module)
+    conn.send('ready')
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        func, args, kwargs = message
+        try:
+            conn.send(('ok', func(*args, **kwargs)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}\n{traceback.format_exc()}"))
+
+@dataclass
+class Job:
+    """A unit of work submitted to the pool"""
+    id: str
+    func: Callable
+    args: Tuple
+    kwargs: Dict[str, Any]
+    timeout: float
+    future: asyncio.Future
+    status: str = "queued"  # queued, running, done, failed, cancelled, timeout
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error
+        }
+
+class _Worker:
+    """One long-lived worker process reached over a pipe."""
+
+    def __init__(self, context, preload: Tuple[str, ...]):
+        self.context = context
+        self.preload = preload
+        self.process = None
+        self.conn = None
+
+    async def ensure_started(self) -> None:
+        """Start the process if needed and wait until its imports are done."""
+        if self.process is not None and self.process.is_alive():
+            return
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=_worker_main, args=(child_conn, self.preload), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        await self._receive()
+
+    async def _receive(self) -> Any:
+        """Wait for the next message from the worker without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+        fd = self.conn.fileno()
+
+        def on_readable():
+            if not reply.done():
+                try:
+                    reply.set_result(self.conn.recv())
+                except EOFError:
+                    reply.set_exception(JobFailedError("Worker process exited"))
+
+        loop.add_reader(fd, on_readable)
+        try:
+            return await reply
+        finally:
+            loop.remove_reader(fd)
+
+    async def call(self, job: Job) -> Tuple[str, Any]:
+        """Send a job and wait for its reply; worker startup does not count toward the timeout."""
+        await self.ensure_started()
+        self.conn.send((job.func, job.args, job.kwargs))
+        return await asyncio.wait_for(self._receive(), job.timeout)
+
+    def kill(self) -> None:
+        """Stop a worker mid-job; the next call starts a fresh process."""
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        if self.conn is not None:
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def close(self) -> None:
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=5)
+            except (BrokenPipeError, OSError):
+                pass
+        self.kill()
+
+class AnalysisPool:
+    """Bounded pool of worker processes for CPU-bound audio analysis.
+
+    Jobs wait in a queue of at most `max_queue` entries and are run by
+    `workers` long-lived processes, so CPU-heavy analysis never runs on the
+    event loop. A job that exceeds its timeout or is cancelled while running
+    has its worker process terminated and replaced.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 timeout: Optional[float] = None, preload: Tuple[str, ...] = (), keep_finished: int = 256):
+        self.workers = workers or int(os.getenv("ANALYSIS_WORKERS", str(min(2, os.cpu_count() or 1))))
+        self.max_queue = max_queue or int(os.getenv("ANALYSIS_QUEUE_DEPTH", "16"))
+        self.timeout = timeout or float(os.getenv("ANALYSIS_TIMEOUT_SECONDS", "300"))
+        self.preload = preload
+        self.keep_finished = keep_finished
+        # Spawned workers do not inherit the server's threads or event loop
+        self._context = multiprocessing.get_context("spawn")
+        self.jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._runners: list = []
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def _start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        for i in range(self.workers):
+            runner = asyncio.create_task(self._run_worker(_Worker(self._context, self.preload)))
+            runner.add_done_callback(self._runner_done)
+            self._runners.append(runner)
+        logger.info(f"Analysis pool started with {self.workers} workers")
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == "queued")
+
+    def submit(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Job:
+        """Queue a call of a module-level function; raises QueueFullError when full."""
+        self._start()
+        if self.queued >= self.max_queue:
+            raise QueueFullError(f"Analysis queue is full ({self.max_queue} jobs waiting)")
+
+        job = Job(
+            id=str(uuid.uuid4()),
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            timeout=timeout or self.timeout,
+            future=asyncio.get_running_loop().create_future()
+        )
+        job.future.add_done_callback(lambda future: self._job_done(job, future))
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self._forget_finished()
+        return job
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Submit a call and await its result.
+
+        If the awaiting caller is cancelled (e.g. the client disconnected),
+        the job is cancelled too.
+        """
+        job = self.submit(func, *args, timeout=timeout, **kwargs)
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            self.cancel(job.id)
+            raise
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job."""
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in ("queued", "running"):
+            return False
+        if job.status == "running":
+            self._running[job_id].cancel()
+        else:
+            self._finish(job, "cancelled")
+        return True
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if job.future.done():
+            return
+        if status == "done":
+            job.future.set_result(result)
+        elif status == "cancelled":
+            job.future.cancel()
+        elif status == "timeout":
+            job.future.set_exception(asyncio.TimeoutError(f"Job {job.id} exceeded {job.timeout}s"))
+        else:
+            job.future.set_exception(JobFailedError(error))
+
+    def _job_done(self, job: Job, future: asyncio.Future) -> None:
+        """Record a job's exception on it, which also marks it retrieved when nobody awaits the job."""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None and job.error is None:
+            job.error = f"{type(error).__name__}: {error}"
+
+    def _runner_done(self, runner: asyncio.Task) -> None:
+        if not runner.cancelled() and runner.exception() is not None:
+            logger.error(f"Analysis worker runner failed: {str(runner.exception())}")
+
+    async def _run_worker(self, worker: _Worker) -> None:
+        try:
+            while True:
+                job = await self._queue.get()
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                call = asyncio.create_task(worker.call(job))
+                self._running[job.id] = call
+                try:
+                    status, value = await call
+                    if status == "ok":
+                        self._finish(job, "done", result=value)
+                    else:
+                        self._finish(job, "failed", error=value)
+                except asyncio.TimeoutError:
+                    worker.kill()
+                    self._finish(job, "timeout", error=f"Timed out after {job.timeout}s")
+                except asyncio.CancelledError:
+                    worker.kill()
+                    self._finish(job, "cancelled")
+                    if asyncio.current_task().cancelling():
+                        # The runner itself is being cancelled (pool shutdown)
+                        raise
+                except Exception as e:
+                    worker.kill()
+                    self._finish(job, "failed", error=str(e))
+                finally:
+                    self._running.pop(job.id, None)
+                    if job.status == "running":
+                        # Handling the outcome itself failed; do not leave the job running forever
+                        self._finish(job, "failed", error="Worker runner stopped")
+        finally:
+            worker.close()
+
+    def _forget_finished(self) -> None:
+        finished = [job for job in self.jobs.values() if job.finished_at is not None]
+        for job in sorted(finished, key=lambda job: job.finished_at)[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.id]
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'queued': self.queued,
+            'running': len(self._running),
+            'timeout': self.timeout
+        }
+
+    async def shutdown(self) -> None:
+        """Cancel outstanding jobs and stop the worker processes."""
+        for job in list(self.jobs.values()):
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        self._queue = None
+
+analysis_pool = AnalysisPool(preload=('audio_processing',))
@@ -0,0 +1,93 @@
+"""Event loop responsiveness while tracks are analysed.
+
+Runs several analyses at once, first inline on the event loop (how /process
+used to work) and then through the analysis pool, while a probe request
+handler on the same loop is timed every 20ms. The probe stands in for
+/api/agent and the WebSocket. With the pool its latency should stay flat.
+
+Usage: python analysis_pool_benchmark.py [TRACK ...] [--jobs N] [--budget-ms MS]
+Without tracks, a synthetic CPU-bound job of similar length is used.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from analysis_pool import AnalysisPool
+
+def synthetic_analysis(seconds: float) -> float:
+    """Busy-loop standing in for a track analysis."""
+    end = time.perf_counter() + seconds
+    total = 0.0
+    while time.perf_counter() < end:
+        total += sum(i * i for i in range(1000))
+    return total
+
+def real_analysis(path: str) -> dict:
+    from audio_processing import process_audio_file
+    return process_audio_file(path, use_cache=False)
+
+async def probe(stop: asyncio.Event, latencies: list, interval: float = 0.02):
+    """Time how long a trivial request handler takes to get scheduled and run."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(0)
+        await asyncio.sleep(interval)
+        latencies.append((loop.time() - start - interval) * 1000)
+
+def summarize(label: str, latencies: list) -> float:
+    latencies = sorted(latencies) or [0.0]
+    p99 = latencies[int(0.99 * (len(latencies) - 1))]
+    print(f"{label:<8} probes {len(latencies):4d}  median {statistics.median(latencies):7.1f} ms  "
+          f"p99 {p99:7.1f} ms  max {latencies[-1]:7.1f} ms")
+    return p99
+
+async def measure(run_jobs) -> list:
+    latencies = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(stop, latencies))
+    await asyncio.sleep(0.2)
+    await run_jobs()
+    stop.set()
+    await prober
+    return latencies
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('tracks', nargs='*')
+    parser.add_argument('--jobs', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=1.0, help="length of each synthetic job")
+    parser.add_argument('--budget-ms', type=float, default=50.0, help="max p99 probe latency with the pool")
+    args = parser.parse_args()
+
+    if args.tracks:
+        calls = [(real_analysis, (track,)) for track in args.tracks]
+    else:
+        calls = [(synthetic_analysis, (args.seconds,)) for _ in range(args.jobs)]
+
+    async def inline():
+        # Handlers are coroutines, so each analysis blocks the loop while it runs
+        async def handler(func, call_args):
+            return func(*call_args)
+        await asyncio.gather(*(handler(func, call_args) for func, call_args in calls))
+
+    pool = AnalysisPool(workers=len(calls), max_queue=len(calls), preload=('audio_processing',) if args.tracks else ())
+    # Start the workers before measuring so spawn cost is not attributed to the pool
+    await asyncio.gather(*(pool.run(time.sleep, 0) for _ in calls))
+
+    async def pooled():
+        await asyncio.gather(*(pool.run(func, *call_args) for func, call_args in calls))
+
+    summarize('inline', await measure(inline))
+    pool_p99 = summarize('pool', await measure(pooled))
+    await pool.shutdown()
+
+    if pool_p99 > args.budget_ms:
+        print(f"FAIL: p99 probe latency {pool_p99:.1f} ms exceeds {args.budget_ms:.1f} ms")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    asyncio.run(main())
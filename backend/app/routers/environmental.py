@@ -1,9 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from ..services.environmental_interaction import EnvironmentalInteractionEngine
 from ..services.memory_service import get_db
+from ..services.pipeline_dag import CheckpointMismatch
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
+import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/environmental")
 env_engine = EnvironmentalInteractionEngine()
@@ -11,6 +17,7 @@ env_engine = EnvironmentalInteractionEngine()
 class ResearchRequest(BaseModel):
     topic: str
     depth: Optional[int] = 3
+    run_id: Optional[str] = None
 
 class ResearchResponse(BaseModel):
     title: str
@@ -44,11 +51,27 @@ class DocumentGenerationResponse(BaseModel):
 async def conduct_research(request: ResearchRequest, db: Session = Depends(get_db)):
     """Conduct autonomous research on a given topic."""
     try:
-        report = await env_engine.research_topic(request.topic, request.depth, db)
+        report = await env_engine.research_topic(request.topic, request.depth, db, request.run_id)
         return ResearchResponse(**report)
+    except CheckpointMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/research/stream")
+async def stream_research(request: ResearchRequest, db: Session = Depends(get_db)):
+    """Conduct research, streaming findings and the report as server-sent events."""
+    async def events():
+        try:
+            async for event in env_engine.stream_research_topic(request.topic, request.depth, db, request.run_id):
+                payload = {'node': event['node'], 'resumed': event['resumed'], 'data': event['result']}
+                yield f"event: {event['event']}\ndata: {json.dumps(payload, default=str)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming research: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @router.post("/api-interaction", response_model=APIInteractionResponse)
 async def interact_with_api(request: APIInteractionRequest, db: Session = Depends(get_db)):
     """Interact with external APIs."""
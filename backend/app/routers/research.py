@@ -18,6 +18,7 @@ class ResearchResponse(BaseModel):
     sources: Dict[str, Any]
     analysis: Dict[str, Any]
     confidence: float
+    cache: Optional[Dict[str, Any]] = None
 
 @router.post("/conduct", response_model=ResearchResponse)
 async def conduct_research(request: ResearchRequest, db: Session = Depends(get_db)):
@@ -26,4 +27,9 @@ async def conduct_research(request: ResearchRequest, db: Session = Depends(get_d
         results = await research_orchestrator.conduct_research(request.topic, request.depth, db)
         return ResearchResponse(**results)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/sources/stats")
+async def source_store_stats():
+    """Report how much fetched source material is cached for reuse."""
+    return research_orchestrator.source_store.stats() 
\ No newline at end of file
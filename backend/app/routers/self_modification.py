@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from ..services.self_modification import SelfModificationEngine
 from ..services.memory_service import get_db
+from ..services.telemetry import telemetry
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 
@@ -12,8 +13,15 @@ class PerformanceAnalysisResponse(BaseModel):
     reasoning_improvements: List[Dict[str, Any]]
     memory_optimizations: List[Dict[str, Any]]
     autonomy_enhancements: List[Dict[str, Any]]
+    latency_regressions: List[Dict[str, Any]] = []
     confidence: float
 
+class TelemetryReportResponse(BaseModel):
+    window_seconds: float
+    regressions: List[Dict[str, Any]]
+    hot_spots: Dict[str, Any]
+    event_loop_lag: Dict[str, Any]
+
 class ModificationRequest(BaseModel):
     opportunities: Dict[str, Any]
 
@@ -45,6 +53,16 @@ async def analyze_performance(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/telemetry", response_model=TelemetryReportResponse)
+async def telemetry_report(window: float = 3600.0, limit: int = 10):
+    """Report the top latency regressions and profiler hot spots over a time window."""
+    return TelemetryReportResponse(
+        window_seconds=window,
+        regressions=telemetry.regressions(window, limit),
+        hot_spots=telemetry.hot_spots(window, limit),
+        event_loop_lag=telemetry.stats('event_loop.lag', window)
+    )
+
 @router.post("/propose-modifications", response_model=ModificationResponse)
 async def propose_modifications(request: ModificationRequest, db: Session = Depends(get_db)):
     """Propose specific modifications based on improvement opportunities."""
@@ -67,6 +85,14 @@ async def test_modification(request: TestModificationRequest, db: Session = Depe
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/benchmark-history", response_model=List[Dict[str, Any]])
+def benchmark_history(limit: int = 50, db: Session = Depends(get_db)):
+    """Return recent benchmark gate runs for trend inspection."""
+    try:
+        return self_mod_engine.benchmark_history(db, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/apply-modification", response_model=ApplyModificationResponse)
 async def apply_modification(request: ApplyModificationRequest, db: Session = Depends(get_db)):
     """Apply a tested modification to the production environment."""
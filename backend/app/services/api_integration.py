@@ -8,6 +8,7 @@ import requests
 from sqlalchemy.orm import Session
 from ..services.memory_service import Memory, get_db
 from ..services.intelligence_service import IntelligenceEngine
+from ..services.telemetry import telemetry
 from .api_keys import (
     OPENAI_API_KEY,
     ANTHROPIC_API_KEY,
@@ -142,7 +143,7 @@ class APIIntegrationService:
         
         for attempt in range(self.retry_attempts):
             try:
-                async with aiohttp.ClientSession() as session:
+                async with aiohttp.ClientSession() as session, telemetry.track(f"service:api.{api_name}.{endpoint}"):
                     async with session.get(url, params=params, timeout=self.request_timeout) as response:
                         if response.status == 200:
                             result = await response.json()
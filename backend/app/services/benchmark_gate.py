@@ -0,0 +1,268 @@
+from typing import Dict, List, Any, Optional, Callable
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Allowed relative regression per metric before a change is rejected
+DEFAULT_BUDGETS = {
+    'latency': 0.05,
+    'throughput': 0.05,
+    'memory': 0.10
+}
+
+def apply_changes(target: Any, changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a modification's changes to attributes that already exist on the target.
+
+    Only scalar values whose type matches the current attribute are applied;
+    everything else is reported as ignored.
+    """
+    applied, ignored = {}, []
+    for name, value in changes.items():
+        current = getattr(target, name, None)
+        if isinstance(current, bool) or isinstance(value, bool):
+            compatible = isinstance(current, bool) and isinstance(value, bool)
+        elif isinstance(current, (int, float)):
+            compatible = isinstance(value, (int, float))
+        else:
+            compatible = isinstance(current, str) and isinstance(value, str)
+        if hasattr(target, name) and compatible:
+            setattr(target, name, value)
+            applied[name] = value
+        else:
+            ignored.append(name)
+    return {'applied': applied, 'ignored': ignored}
+
+# --- Benchmarks -------------------------------------------------------------
+#
+# Each benchmark takes the dict of service targets (with any candidate
+# modification already applied) and returns a callable running one operation.
+
+def _synthetic_market_data(i: int) -> Dict[str, Any]:
+    return {
+        'price_change': ((i % 21) - 10) / 50.0,
+        'volume_trend': 'increasing' if i % 3 else 'decreasing',
+        'rsi': 20 + (i * 7) % 65,
+        'sma_20': 100 + (i % 5),
+        'sma_50': 100 + (i % 7)
+    }
+
+def _bench_market_reasoning(targets: Dict[str, Any]) -> Callable[[int], Any]:
+    engine = targets['intelligence_engine']
+    return lambda i: engine.reason_about_market(_synthetic_market_data(i))
+
+def _bench_result_processing(targets: Dict[str, Any]) -> Callable[[int], Any]:
+    service = targets['api_integration']
+    papers = {'papers': [{'title': f"Paper {n}", 'authors': ['A', 'B'], 'citations': n} for n in range(20)]}
+    articles = {'articles': [{'title': f"Article {n}", 'source': 'wire'} for n in range(20)], 'sentiment': {}}
+
+    def run(i: int):
+        service._process_scholar_results(papers)
+        service._process_news_results(articles)
+    return run
+
+def _bench_research_analysis(targets: Dict[str, Any]) -> Callable[[int], Any]:
+    engine = targets['environmental_interaction']
+    sources = [{'api': api, 'results': [f"{api} finding {n}" for n in range(25)]} for api in ('scholar', 'news')]
+    loop = asyncio.new_event_loop()
+
+    async def analyze():
+        analysis = await engine._analyze_findings(sources)
+        return await engine._generate_research_report(analysis)
+    return lambda i: loop.run_until_complete(analyze())
+
+def _bench_memory_roundtrip(targets: Dict[str, Any]) -> Callable[[int], Any]:
+    memory_service = targets['memory_service']
+    memory_service.init_db()
+
+    def run(i: int):
+        memory_service.store_memory(f"benchmark entry {i}", {'type': 'benchmark', 'i': i})
+        memory_service.retrieve_memories(limit=10)
+    return run
+
+BENCHMARKS = {
+    'market_reasoning': {'kind': 'micro', 'setup': _bench_market_reasoning, 'iterations': 2000},
+    'result_processing': {'kind': 'micro', 'setup': _bench_result_processing, 'iterations': 2000},
+    'research_analysis': {'kind': 'macro', 'setup': _bench_research_analysis, 'iterations': 200},
+    'memory_roundtrip': {'kind': 'macro', 'setup': _bench_memory_roundtrip, 'iterations': 50}
+}
+
+def _load_targets() -> Dict[str, Any]:
+    from app.services import memory_service
+    from app.services.intelligence_service import IntelligenceEngine
+    from app.services.api_integration import APIIntegrationService
+    from app.services.environmental_interaction import EnvironmentalInteractionEngine
+    return {
+        'intelligence_engine': IntelligenceEngine(),
+        'api_integration': APIIntegrationService(),
+        'environmental_interaction': EnvironmentalInteractionEngine(),
+        'memory_service': memory_service
+    }
+
+def run_benchmark(name: str, modification: Optional[Dict[str, Any]] = None, warmup: int = 20) -> Dict[str, Any]:
+    """Run one benchmark in this process and return its measurements."""
+    spec = BENCHMARKS[name]
+    targets = _load_targets()
+    if modification and modification.get('target') in targets:
+        apply_changes(targets[modification['target']], modification.get('changes', {}))
+
+    operation = spec['setup'](targets)
+    iterations = spec['iterations']
+    for i in range(warmup):
+        operation(i)
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        operation(i)
+    elapsed = time.perf_counter() - start
+
+    # Memory is measured in a separate pass so tracing overhead does not skew timing
+    tracemalloc.start()
+    for i in range(max(1, iterations // 10)):
+        operation(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'benchmark': name,
+        'latency': elapsed / iterations,
+        'throughput': iterations / elapsed,
+        'memory': peak
+    }
+
+# --- Statistics -------------------------------------------------------------
+
+def relative_change_ci(baseline: List[float], candidate: List[float], confidence: float = 0.95,
+                       resamples: int = 2000, seed: int = 0) -> Dict[str, float]:
+    """Bootstrap a confidence interval for mean(candidate) / mean(baseline) - 1."""
+    rng = random.Random(seed)
+    base_mean = statistics.fmean(baseline)
+    estimate = statistics.fmean(candidate) / base_mean - 1 if base_mean else 0.0
+
+    changes = []
+    for _ in range(resamples):
+        b = statistics.fmean(rng.choices(baseline, k=len(baseline)))
+        c = statistics.fmean(rng.choices(candidate, k=len(candidate)))
+        changes.append(c / b - 1 if b else 0.0)
+    changes.sort()
+    tail = (1 - confidence) / 2
+    return {
+        'change': estimate,
+        'ci_low': changes[int(tail * (resamples - 1))],
+        'ci_high': changes[int((1 - tail) * (resamples - 1))]
+    }
+
+# --- Gate -------------------------------------------------------------------
+
+class BenchmarkGate:
+    """Accepts or rejects a candidate modification by benchmarking it.
+
+    Every benchmark runs `repeats` times with and without the modification,
+    each run in a fresh subprocess against the sandbox database, with
+    baseline and candidate runs interleaved so machine drift hits both.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, float]] = None, repeats: int = 5,
+                 benchmarks: Optional[List[str]] = None, run_timeout: float = 120.0):
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.repeats = repeats
+        self.benchmarks = benchmarks or list(BENCHMARKS)
+        self.run_timeout = run_timeout
+
+    async def evaluate(self, modification: Dict[str, Any], sandbox: Dict[str, Any]) -> Dict[str, Any]:
+        """Benchmark a modification against the current baseline."""
+        results = {}
+        violations = []
+        for name in self.benchmarks:
+            baseline, candidate = [], []
+            for _ in range(self.repeats):
+                baseline.append(await self._run_isolated(name, None, sandbox))
+                candidate.append(await self._run_isolated(name, modification, sandbox))
+
+            comparison = self.compare(baseline, candidate)
+            results[name] = {'kind': BENCHMARKS[name]['kind'], 'metrics': comparison}
+            violations.extend(
+                {'benchmark': name, 'metric': metric, **stats}
+                for metric, stats in comparison.items() if stats['regressed']
+            )
+
+        return {
+            'accepted': not violations,
+            'violations': violations,
+            'benchmarks': results,
+            'budgets': self.budgets,
+            'repeats': self.repeats,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+
+    def compare(self, baseline: List[Dict[str, Any]], candidate: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Compare run distributions per metric against the budgets.
+
+        A metric regresses when its estimated change is worse than the budget
+        and the confidence interval excludes no change at all.
+        """
+        comparison = {}
+        for metric, budget in self.budgets.items():
+            stats = relative_change_ci([r[metric] for r in baseline], [r[metric] for r in candidate])
+            if metric == 'throughput':
+                regressed = stats['change'] < -budget and stats['ci_high'] < 0
+            else:
+                regressed = stats['change'] > budget and stats['ci_low'] > 0
+            comparison[metric] = {
+                **stats,
+                'budget': budget,
+                'baseline_mean': statistics.fmean(r[metric] for r in baseline),
+                'candidate_mean': statistics.fmean(r[metric] for r in candidate),
+                'regressed': regressed
+            }
+        return comparison
+
+    async def _run_isolated(self, name: str, modification: Optional[Dict[str, Any]], sandbox: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one benchmark in a fresh interpreter and parse its JSON result."""
+        env = {
+            **os.environ,
+            'DATABASE_URL': sandbox['database_url'],
+            'PYTHONHASHSEED': '0',
+            'BENCHMARK_MODIFICATION': json.dumps(modification) if modification else ''
+        }
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'app.services.benchmark_gate', name,
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=self.run_timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise RuntimeError(f"Benchmark {name} timed out after {self.run_timeout}s")
+
+        if process.returncode != 0:
+            raise RuntimeError(f"Benchmark {name} failed: {stderr.decode(errors='replace')[-500:]}")
+        return json.loads(stdout.decode().strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a single self-modification benchmark")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    raw = os.getenv('BENCHMARK_MODIFICATION')
+    modification = json.loads(raw) if raw else None
+    print(json.dumps(run_benchmark(args.benchmark, modification)))
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterator
 from datetime import datetime
 import logging
 import json
 import asyncio
+import uuid
 import aiohttp
 import requests
 from sqlalchemy.orm import Session
 from ..services.memory_service import Memory, get_db
 from ..services.intelligence_service import IntelligenceEngine
 from ..services.self_modification import SelfModificationEngine
+from ..services.pipeline_dag import PipelineDAG, PipelineNode, CheckpointStore
 
 logger = logging.getLogger(__name__)
 
@@ -20,31 +22,73 @@ class EnvironmentalInteractionEngine:
         self.max_concurrent_requests = 5
         self.request_timeout = 30
         self.retry_attempts = 3
+        self.research_apis = ['scholar', 'news', 'financial', 'technical']
+        self.research_checkpoints = CheckpointStore()
         
-    async def research_topic(self, topic: str, depth: int = 3, db: Session = None) -> Dict[str, Any]:
+    async def research_topic(self, topic: str, depth: int = 3, db: Session = None, run_id: Optional[str] = None) -> Dict[str, Any]:
         """Conduct autonomous research on a given topic."""
         try:
-            # Initialize research session
-            research_session = await self._initialize_research_session(topic)
-            
-            # Gather information from multiple sources
-            sources = await self._gather_information(topic, depth)
-            
-            # Analyze and synthesize findings
-            analysis = await self._analyze_findings(sources)
-            
-            # Generate comprehensive report
-            report = await self._generate_research_report(analysis)
-            
-            # Store research results
-            if db:
-                self._store_research_results(report, db)
-            
+            report = None
+            async for event in self.stream_research_topic(topic, depth, db, run_id):
+                if event['event'] == 'report':
+                    report = event['result']
             return report
         except Exception as e:
             logger.error(f"Error conducting research: {str(e)}")
             raise
 
+    async def stream_research_topic(self, topic: str, depth: int = 3, db: Session = None, run_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Conduct research as a DAG, yielding partial results as stages complete.
+
+        Findings are yielded before the report, and the report before it is
+        stored. Passing the run id from the 'started' event on a retry with
+        the same topic and depth resumes from the checkpointed stages.
+        """
+        run_id = run_id or str(uuid.uuid4())
+        yield {'event': 'started', 'node': None, 'result': {'run_id': run_id, 'topic': topic}, 'resumed': False}
+        
+        async with aiohttp.ClientSession() as session:
+            pipeline = self._build_research_pipeline(session, topic, depth, db)
+            inputs = {'topic': topic, 'depth': depth}
+            async for event in pipeline.stream(run_id, self.research_checkpoints, inputs):
+                yield event
+
+    def _build_research_pipeline(self, session: aiohttp.ClientSession, topic: str, depth: int, db: Session) -> PipelineDAG:
+        """Build the research DAG: per-API gathering feeds analysis, then report, then storage."""
+        gather_nodes = [f"gather:{api}" for api in self.research_apis]
+        
+        def gather(api: str):
+            async def run(inputs: Dict[str, Any]) -> Dict[str, Any]:
+                return await self._query_research_api(session, api, topic)
+            return run
+        
+        async def initialize(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            return await self._initialize_research_session(topic)
+        
+        async def analyze(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            sources = [inputs[name] for name in gather_nodes if isinstance(inputs[name], dict)]
+            return await self._analyze_findings(sources)
+        
+        async def report(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            analysis = {**inputs['analyze'], 'topic': inputs['session']['topic']}
+            return await self._generate_research_report(analysis)
+        
+        async def store(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            if not db:
+                return {'stored': False}
+            # Serializing the whole report is the slow part; keep it off the event loop
+            await asyncio.to_thread(self._store_research_results, inputs['report'], db)
+            return {'stored': True}
+        
+        nodes = [PipelineNode('session', initialize)]
+        nodes += [PipelineNode(f"gather:{api}", gather(api), event='source') for api in self.research_apis]
+        nodes += [
+            PipelineNode('analyze', analyze, depends_on=gather_nodes, event='findings'),
+            PipelineNode('report', report, depends_on=['analyze', 'session'], event='report'),
+            PipelineNode('store', store, depends_on=['report'], event='stored')
+        ]
+        return PipelineDAG(nodes)
+
     async def _initialize_research_session(self, topic: str) -> Dict[str, Any]:
         """Initialize a new research session with appropriate parameters."""
         return {
@@ -55,32 +99,6 @@ class EnvironmentalInteractionEngine:
             'confidence': 0.0
         }
 
-    async def _gather_information(self, topic: str, depth: int) -> List[Dict[str, Any]]:
-        """Gather information from multiple sources."""
-        sources = []
-        
-        # Research APIs to query
-        research_apis = [
-            'scholar',
-            'news',
-            'financial',
-            'technical'
-        ]
-        
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for api in research_apis:
-                task = self._query_research_api(session, api, topic)
-                tasks.append(task)
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for result in results:
-                if isinstance(result, dict):
-                    sources.append(result)
-        
-        return sources
-
     async def _query_research_api(self, session: aiohttp.ClientSession, api: str, topic: str) -> Dict[str, Any]:
         """Query a specific research API."""
         try:
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from ..services.memory_service import Memory, get_db
+from ..services.telemetry import telemetry
 import numpy as np
 from datetime import datetime, timedelta
 import yfinance as yf
@@ -17,8 +18,9 @@ class IntelligenceEngine:
     def analyze_market_trends(self, symbol: str, timeframe: str = "1mo") -> Dict[str, Any]:
         """Analyze market trends and patterns for a given symbol."""
         try:
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period=timeframe)
+            with telemetry.track('service:market.history'):
+                stock = yf.Ticker(symbol)
+                hist = stock.history(period=timeframe)
             
             # Calculate key metrics
             sma_20 = hist['Close'].rolling(window=20).mean()
@@ -3,6 +3,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 import datetime
+from .telemetry import telemetry
 
 Base = declarative_base()
 
@@ -27,16 +28,18 @@ def get_db():
         db.close()
 
 def store_memory(content, metadata=None):
-    db = SessionLocal()
-    memory = Memory(content=content, metadata=metadata)
-    db.add(memory)
-    db.commit()
-    db.refresh(memory)
-    db.close()
+    with telemetry.track('service:memory.store'):
+        db = SessionLocal()
+        memory = Memory(content=content, metadata=metadata)
+        db.add(memory)
+        db.commit()
+        db.refresh(memory)
+        db.close()
     return memory
 
 def retrieve_memories(limit=10):
-    db = SessionLocal()
-    memories = db.query(Memory).order_by(Memory.timestamp.desc()).limit(limit).all()
-    db.close()
+    with telemetry.track('service:memory.retrieve'):
+        db = SessionLocal()
+        memories = db.query(Memory).order_by(Memory.timestamp.desc()).limit(limit).all()
+        db.close()
     return memories 
\ No newline at end of file
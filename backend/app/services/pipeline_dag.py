@@ -0,0 +1,166 @@
+from typing import Dict, List, Any, Optional, Callable, Awaitable, AsyncIterator
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+import logging
+import asyncio
+import hashlib
+import json
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PipelineNode:
+    """A single stage in a pipeline DAG.
+
+    `run` receives a dict of the results of the nodes listed in
+    `depends_on` and returns this node's result.
+    """
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    depends_on: List[str] = field(default_factory=list)
+    event: Optional[str] = None
+
+class PipelineError(Exception):
+    """Raised when a pipeline node fails."""
+    def __init__(self, node: str, error: Exception):
+        super().__init__(f"Pipeline node '{node}' failed: {error}")
+        self.node = node
+        self.error = error
+
+class CheckpointMismatch(ValueError):
+    """Raised when a run id is reused with different inputs."""
+    def __init__(self, run_id: str):
+        super().__init__(f"Run '{run_id}' was started with different inputs; use a new run id")
+        self.run_id = run_id
+
+def hash_inputs(inputs: Dict[str, Any]) -> str:
+    """Stable hash of a run's inputs."""
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+class CheckpointStore:
+    """In-process store of completed node results, keyed by run id.
+
+    Each run records a hash of its inputs, so a run id reused with other
+    inputs is refused instead of resuming from unrelated results.
+    """
+
+    def __init__(self, ttl: timedelta = timedelta(hours=1), max_runs: int = 256):
+        self.ttl = ttl
+        self.max_runs = max_runs
+        self.runs: Dict[str, Dict[str, Any]] = {}
+
+    def load(self, run_id: str, inputs_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Return the completed node results recorded for a run.
+
+        Raises CheckpointMismatch if the run was recorded with other inputs.
+        """
+        self._expire()
+        run = self.runs.get(run_id)
+        if run and run['inputs_hash'] != inputs_hash:
+            raise CheckpointMismatch(run_id)
+        return dict(run['results']) if run else {}
+
+    def save(self, run_id: str, node: str, result: Any, inputs_hash: Optional[str] = None) -> None:
+        """Record a completed node result."""
+        run = self.runs.setdefault(run_id, {'results': {}, 'inputs_hash': inputs_hash,
+                                            'updated_at': datetime.utcnow()})
+        if run['inputs_hash'] != inputs_hash:
+            raise CheckpointMismatch(run_id)
+        run['results'][node] = result
+        run['updated_at'] = datetime.utcnow()
+        self._expire()
+
+    def clear(self, run_id: str) -> None:
+        """Forget a run's checkpoints."""
+        self.runs.pop(run_id, None)
+
+    def _expire(self) -> None:
+        """Drop expired runs, then the least recently updated over capacity."""
+        cutoff = datetime.utcnow() - self.ttl
+        for run_id in [r for r, run in self.runs.items() if run['updated_at'] < cutoff]:
+            del self.runs[run_id]
+
+        if len(self.runs) > self.max_runs:
+            by_age = sorted(self.runs.items(), key=lambda item: item[1]['updated_at'])
+            for run_id, _ in by_age[:len(self.runs) - self.max_runs]:
+                del self.runs[run_id]
+
+class PipelineDAG:
+    """Runs pipeline nodes as soon as their dependencies complete.
+
+    Independent nodes run concurrently. Each completed node is checkpointed
+    under the run id, so re-running the same run id with the same inputs
+    resumes after the last completed nodes instead of starting over.
+    """
+
+    def __init__(self, nodes: List[PipelineNode]):
+        self.nodes = {node.name: node for node in nodes}
+        self._validate()
+
+    def _validate(self) -> None:
+        """Reject unknown dependencies and cycles."""
+        for node in self.nodes.values():
+            for dep in node.depends_on:
+                if dep not in self.nodes:
+                    raise ValueError(f"Node '{node.name}' depends on unknown node '{dep}'")
+
+        remaining = {name: set(node.depends_on) for name, node in self.nodes.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Pipeline has a cycle among: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    async def stream(self, run_id: str, checkpoints: CheckpointStore,
+                     inputs: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Execute the pipeline, yielding an event as each node completes.
+
+        `inputs` are whatever the nodes were built from; resuming a run
+        with different inputs raises CheckpointMismatch.
+        """
+        inputs_hash = hash_inputs(inputs or {})
+        results = {name: result for name, result in checkpoints.load(run_id, inputs_hash).items()
+                   if name in self.nodes}
+        for name, result in results.items():
+            yield self._event(name, result, resumed=True)
+
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while len(results) < len(self.nodes):
+                for name, node in self.nodes.items():
+                    if name in results or name in running.values():
+                        continue
+                    if all(dep in results for dep in node.depends_on):
+                        node_inputs = {dep: results[dep] for dep in node.depends_on}
+                        running[asyncio.create_task(node.run(node_inputs))] = name
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    if task.exception() is not None:
+                        raise PipelineError(name, task.exception())
+                    results[name] = task.result()
+                    checkpoints.save(run_id, name, results[name], inputs_hash)
+                    yield self._event(name, results[name], resumed=False)
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def run(self, run_id: str, checkpoints: CheckpointStore,
+                  inputs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute the pipeline and return every node's result."""
+        results = {}
+        async for event in self.stream(run_id, checkpoints, inputs):
+            results[event['node']] = event['result']
+        return results
+
+    def _event(self, name: str, result: Any, resumed: bool) -> Dict[str, Any]:
+        return {
+            'event': self.nodes[name].event or 'node',
+            'node': name,
+            'result': result,
+            'resumed': resumed
+        }
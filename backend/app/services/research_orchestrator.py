@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from ..services.api_integration import APIIntegrationService
 from ..services.intelligence_service import IntelligenceEngine
 from ..services.memory_service import Memory, get_db
+from ..services.source_store import SourceStore
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +16,7 @@ class ResearchOrchestrator:
         self.intelligence_engine = IntelligenceEngine()
         self.confidence_threshold = 0.85
         self.max_concurrent_research = 3
+        self.source_store = SourceStore()
         
     async def conduct_research(self, topic: str, depth: str = "medium", db: Session = None) -> Dict[str, Any]:
         """Conduct comprehensive research on a topic using multiple sources."""
@@ -25,14 +27,16 @@ class ResearchOrchestrator:
                 'timestamp': datetime.utcnow().isoformat(),
                 'sources': {},
                 'analysis': {},
-                'confidence': 0.0
+                'confidence': 0.0,
+                'cache': {}
             }
             
-            # Gather data from multiple sources concurrently
+            # Gather data from multiple sources concurrently, reusing fresh material
+            provenance = research_results['cache']
             tasks = [
-                self._gather_academic_research(topic, db),
-                self._gather_market_data(topic, db),
-                self._gather_news_analysis(topic, db)
+                self._gather_academic_research(topic, db, provenance),
+                self._gather_market_data(topic, db, provenance),
+                self._gather_news_analysis(topic, db, provenance)
             ]
             
             results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -63,35 +67,64 @@ class ResearchOrchestrator:
             logger.error(f"Error conducting research: {str(e)}")
             raise
             
-    async def _gather_academic_research(self, topic: str, db: Session) -> Dict[str, Any]:
+    async def _gather_academic_research(self, topic: str, db: Session, provenance: Dict[str, Any]) -> Dict[str, Any]:
         """Gather academic research on the topic."""
         try:
-            results = await self.api_service.search_scholar(topic, db)
+            results, cached = await self.source_store.fetch(
+                'academic', topic,
+                lambda: self.api_service.search_scholar(topic, db)
+            )
+            provenance['academic'] = 'cache' if cached else 'fetched'
             return {'academic': results}
         except Exception as e:
             logger.error(f"Error gathering academic research: {str(e)}")
             return {'academic': {}}
             
-    async def _gather_market_data(self, topic: str, db: Session) -> Dict[str, Any]:
+    async def _gather_market_data(self, topic: str, db: Session, provenance: Dict[str, Any]) -> Dict[str, Any]:
         """Gather market data related to the topic."""
         try:
             # Extract potential market symbols from topic
-            symbols = await self._extract_market_symbols(topic)
-            market_data = {}
+            symbols, _ = await self.source_store.fetch(
+                'market_symbols', topic,
+                lambda: self._extract_market_symbols(topic)
+            )
+            
+            # Fetch symbols in parallel, bounded by the API service's concurrency limit
+            semaphore = asyncio.Semaphore(self.api_service.max_concurrent_requests)
+            
+            async def fetch_symbol(symbol: str):
+                async with semaphore:
+                    return await self.source_store.fetch(
+                        'market', symbol,
+                        lambda: self.api_service.get_market_data(symbol, db)
+                    )
             
-            for symbol in symbols:
-                data = await self.api_service.get_market_data(symbol, db)
+            results = await asyncio.gather(*(fetch_symbol(s) for s in symbols), return_exceptions=True)
+            
+            market_data = {}
+            market_provenance = {}
+            for symbol, result in zip(symbols, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error gathering market data for {symbol}: {str(result)}")
+                    continue
+                data, cached = result
                 market_data[symbol] = data
+                market_provenance[symbol] = 'cache' if cached else 'fetched'
                 
+            provenance['market'] = market_provenance
             return {'market': market_data}
         except Exception as e:
             logger.error(f"Error gathering market data: {str(e)}")
             return {'market': {}}
             
-    async def _gather_news_analysis(self, topic: str, db: Session) -> Dict[str, Any]:
+    async def _gather_news_analysis(self, topic: str, db: Session, provenance: Dict[str, Any]) -> Dict[str, Any]:
         """Gather and analyze news related to the topic."""
         try:
-            news = await self.api_service.get_news(topic, db)
+            news, cached = await self.source_store.fetch(
+                'news', topic,
+                lambda: self.api_service.get_news(topic, db)
+            )
+            provenance['news'] = 'cache' if cached else 'fetched'
             return {'news': news}
         except Exception as e:
             logger.error(f"Error gathering news: {str(e)}")
@@ -186,6 +219,7 @@ class ResearchOrchestrator:
                     'type': 'research',
                     'topic': results['topic'],
                     'sources': list(results['sources'].keys()),
+                    'cache': results.get('cache', {}),
                     'confidence': results['confidence'],
                     'timestamp': results['timestamp']
                 }
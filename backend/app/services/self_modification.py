@@ -3,9 +3,14 @@ from datetime import datetime
 import logging
 import json
 import asyncio
+import hashlib
+import shutil
+import tempfile
 from sqlalchemy.orm import Session
 from ..services.memory_service import Memory, get_db
 from ..services.intelligence_service import IntelligenceEngine
+from ..services.telemetry import telemetry, available_resources
+from ..services.benchmark_gate import BenchmarkGate, apply_changes
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +21,9 @@ class SelfModificationEngine:
         self.sandbox_enabled = True
         self.learning_rate = 0.01
         self.max_modifications_per_cycle = 3
+        self.telemetry_window = 3600.0
+        self.benchmark_gate = BenchmarkGate()
+        self.accepted_modifications = set()
         
     async def analyze_performance(self, db: Session) -> Dict[str, Any]:
         """Analyze system performance and identify improvement opportunities."""
@@ -40,11 +48,12 @@ class SelfModificationEngine:
             'reasoning_improvements': [],
             'memory_optimizations': [],
             'autonomy_enhancements': [],
+            'latency_regressions': metrics.get('regressions', []),
             'confidence': 0.0
         }
         
-        # Analyze reasoning performance
-        if metrics.get('reasoning_accuracy', 0) < 0.9:
+        # Analyze reasoning performance (only when an accuracy measurement exists)
+        if 'reasoning_accuracy' in metrics and metrics['reasoning_accuracy'] < 0.9:
             opportunities['reasoning_improvements'].append({
                 'type': 'model_upgrade',
                 'priority': 'high',
@@ -149,6 +158,7 @@ class SelfModificationEngine:
         if not self.sandbox_enabled:
             return {'status': 'sandbox_disabled'}
             
+        sandbox = None
         try:
             # Create sandbox environment
             sandbox = await self._create_sandbox()
@@ -157,15 +167,19 @@ class SelfModificationEngine:
             result = await self._apply_modification_in_sandbox(modification, sandbox)
             
             # Evaluate results
-            evaluation = await self._evaluate_modification_result(result)
+            evaluation = await self._evaluate_modification_result(modification, result)
             
             # Store test results
             self._store_test_results(evaluation, db)
+            self._store_benchmark_run(modification, result, db)
             
             return evaluation
         except Exception as e:
             logger.error(f"Error testing modification: {str(e)}")
             return {'status': 'error', 'error': str(e)}
+        finally:
+            if sandbox:
+                shutil.rmtree(sandbox['path'], ignore_errors=True)
 
     async def apply_modification(self, modification: Dict[str, Any], db: Session) -> Dict[str, Any]:
         """Apply a tested modification to the production environment."""
@@ -174,6 +188,10 @@ class SelfModificationEngine:
             if not modification.get('test_results', {}).get('passed', False):
                 return {'status': 'error', 'message': 'Modification not tested or failed tests'}
                 
+            # Only changes this engine has benchmarked and accepted may be applied
+            if self._modification_digest(modification) not in self.accepted_modifications:
+                return {'status': 'error', 'error': 'Modification did not pass the benchmark gate'}
+                
             # Apply modification
             result = await self._apply_modification(modification)
             
@@ -185,6 +203,58 @@ class SelfModificationEngine:
             logger.error(f"Error applying modification: {str(e)}")
             return {'status': 'error', 'error': str(e)}
 
+    async def _create_sandbox(self) -> Dict[str, Any]:
+        """Create an isolated working directory and database for benchmark runs."""
+        path = tempfile.mkdtemp(prefix='lexos-sandbox-')
+        return {'path': path, 'database_url': f"sqlite:///{path}/memory.db"}
+
+    async def _apply_modification_in_sandbox(self, modification: Dict[str, Any], sandbox: Dict[str, Any]) -> Dict[str, Any]:
+        """Benchmark the modification against the baseline inside the sandbox."""
+        return await self.benchmark_gate.evaluate(modification, sandbox)
+
+    async def _evaluate_modification_result(self, modification: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn a benchmark gate result into a test verdict."""
+        if result['accepted']:
+            self.accepted_modifications.add(self._modification_digest(modification))
+        return {
+            'status': 'passed' if result['accepted'] else 'rejected',
+            'results': {
+                'passed': result['accepted'],
+                'violations': result['violations'],
+                'benchmarks': result['benchmarks']
+            }
+        }
+
+    async def _apply_modification(self, modification: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a modification's changes to the live target."""
+        targets = {'intelligence_engine': self.intelligence_engine}
+        target = targets.get(modification.get('target'))
+        if target is None:
+            return {'status': 'error', 'error': f"Unknown modification target: {modification.get('target')}"}
+        
+        changes = apply_changes(target, modification.get('changes', {}))
+        return {
+            'status': 'applied',
+            'result': {
+                'target': modification['target'],
+                **changes,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        }
+
+    def _modification_digest(self, modification: Dict[str, Any]) -> str:
+        """Hash a modification, ignoring any attached test results."""
+        body = {k: v for k, v in modification.items() if k != 'test_results'}
+        return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def benchmark_history(self, db: Session, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return recent benchmark gate runs, newest first, for trend inspection."""
+        memories = db.query(Memory).filter(
+            Memory.content.like('Benchmark Run:%')
+        ).order_by(Memory.timestamp.desc()).limit(limit).all()
+        
+        return [memory.metadata.get('details', {}) for memory in memories]
+
     def _store_analysis(self, analysis: Dict[str, Any], db: Session) -> None:
         """Store performance analysis in memory."""
         memory = Memory(
@@ -225,6 +295,32 @@ class SelfModificationEngine:
         db.add(memory)
         db.commit()
 
+    def _store_benchmark_run(self, modification: Dict[str, Any], result: Dict[str, Any], db: Session) -> None:
+        """Store a benchmark gate run so latency, throughput and memory trends stay visible."""
+        summary = {
+            'modification_type': modification.get('type'),
+            'target': modification.get('target'),
+            'accepted': result['accepted'],
+            'timestamp': result['timestamp'],
+            'metrics': {
+                name: {
+                    metric: {k: stats[k] for k in ('baseline_mean', 'candidate_mean', 'change', 'ci_low', 'ci_high')}
+                    for metric, stats in benchmark['metrics'].items()
+                }
+                for name, benchmark in result['benchmarks'].items()
+            }
+        }
+        memory = Memory(
+            content=f"Benchmark Run: {modification.get('type')} -> {'accepted' if result['accepted'] else 'rejected'}",
+            metadata={
+                'type': 'benchmark_run',
+                'timestamp': datetime.utcnow().isoformat(),
+                'details': summary
+            }
+        )
+        db.add(memory)
+        db.commit()
+
     def _store_application_result(self, result: Dict[str, Any], db: Session) -> None:
         """Store modification application result in memory."""
         memory = Memory(
@@ -239,12 +335,22 @@ class SelfModificationEngine:
         db.commit()
 
     def _retrieve_performance_metrics(self, db: Session) -> Dict[str, Any]:
-        """Retrieve current performance metrics from memory."""
-        # This would typically query various system metrics
+        """Retrieve current performance metrics from in-process telemetry."""
+        window = self.telemetry_window
+        memory_stats = telemetry.stats('service:memory.retrieve', window)
+        lag_stats = telemetry.stats('event_loop.lag', window)
+        error_rate = telemetry.error_rate(window)
+        
+        # A blocked event loop is as risky as failing calls; 250ms of p95 lag counts as fully risky
+        lag_risk = min(1.0, lag_stats['p95'] / 0.25)
+        
         return {
-            'reasoning_accuracy': 0.85,
-            'memory_retrieval_time': 0.6,
-            'historical_success_rate': 0.82,
-            'available_resources': 0.75,
-            'risk_level': 0.25
-        } 
\ No newline at end of file
+            'memory_retrieval_time': memory_stats['p95'],
+            'historical_success_rate': 1.0 - error_rate if error_rate is not None else 1.0,
+            'available_resources': available_resources(),
+            'risk_level': max(error_rate or 0.0, lag_risk),
+            'event_loop_lag': lag_stats,
+            'endpoint_latency': telemetry.summary(window, prefix='endpoint:'),
+            'service_latency': telemetry.summary(window, prefix='service:'),
+            'regressions': telemetry.regressions(window)
+        }
@@ -0,0 +1,132 @@
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+import logging
+import hashlib
+import json
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+# How long fetched material stays fresh, per source type
+DEFAULT_FRESHNESS = {
+    'academic': timedelta(days=7),
+    'market_symbols': timedelta(days=1),
+    'market': timedelta(minutes=15),
+    'news': timedelta(hours=1)
+}
+
+@dataclass
+class SourceEntry:
+    """A fetched source document and where it lives in the store"""
+    source_type: str
+    query: str
+    digest: str
+    fetched_at: datetime
+
+class SourceStore:
+    """Content-addressed store of fetched research sources.
+
+    Documents are stored once under the SHA-256 of their canonical JSON form.
+    A separate index maps (source type, normalized query) to the digest of
+    the latest document fetched for it, so identical payloads returned for
+    different queries share storage and freshness is tracked per query.
+    """
+
+    def __init__(self, freshness: Optional[Dict[str, timedelta]] = None, max_entries: int = 1024):
+        self.freshness = {**DEFAULT_FRESHNESS, **(freshness or {})}
+        self.max_entries = max_entries
+        self.documents: Dict[str, Any] = {}
+        self.index: Dict[str, SourceEntry] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def make_key(source_type: str, query: str) -> str:
+        """Build the index key for a source type and query."""
+        normalized = ' '.join(query.lower().split())
+        return hashlib.sha256(f"{source_type}\x00{normalized}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def content_digest(document: Any) -> str:
+        """Hash a document by its canonical JSON representation."""
+        canonical = json.dumps(document, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def is_fresh(self, entry: SourceEntry) -> bool:
+        """Check whether an entry is still inside its freshness window."""
+        window = self.freshness.get(entry.source_type, timedelta(0))
+        return datetime.utcnow() - entry.fetched_at < window
+
+    def get(self, source_type: str, query: str) -> Optional[Any]:
+        """Return the stored document for a query if it is still fresh."""
+        entry = self.index.get(self.make_key(source_type, query))
+        if entry is None or not self.is_fresh(entry):
+            return None
+        return self.documents.get(entry.digest)
+
+    def put(self, source_type: str, query: str, document: Any) -> SourceEntry:
+        """Store a freshly fetched document and point the query at it."""
+        digest = self.content_digest(document)
+        self.documents[digest] = document
+        entry = SourceEntry(
+            source_type=source_type,
+            query=query,
+            digest=digest,
+            fetched_at=datetime.utcnow()
+        )
+        self.index[self.make_key(source_type, query)] = entry
+        self._evict()
+        return entry
+
+    async def fetch(self, source_type: str, query: str, fetcher: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (document, from_cache), fetching only when missing or stale.
+
+        Concurrent fetches for the same key wait on a single request instead
+        of each hitting the upstream API. Empty results are returned but not
+        stored, so the next session retries them.
+        """
+        cached = self.get(source_type, query)
+        if cached is not None:
+            return cached, True
+
+        key = self.make_key(source_type, query)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another caller may have filled the entry while we waited
+            cached = self.get(source_type, query)
+            if cached is not None:
+                return cached, True
+
+            document = await fetcher()
+            if document:
+                self.put(source_type, query, document)
+            return document, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Summarize store contents."""
+        fresh = sum(1 for entry in self.index.values() if self.is_fresh(entry))
+        return {
+            'entries': len(self.index),
+            'fresh_entries': fresh,
+            'documents': len(self.documents)
+        }
+
+    def _evict(self) -> None:
+        """Drop stale entries, then the oldest ones, once over capacity."""
+        if len(self.index) <= self.max_entries:
+            return
+
+        for key in [k for k, entry in self.index.items() if not self.is_fresh(entry)]:
+            del self.index[key]
+            self._locks.pop(key, None)
+
+        if len(self.index) > self.max_entries:
+            by_age = sorted(self.index.items(), key=lambda item: item[1].fetched_at)
+            for key, _ in by_age[:len(self.index) - self.max_entries]:
+                del self.index[key]
+                self._locks.pop(key, None)
+
+        # Documents no longer referenced by any query can go
+        referenced = {entry.digest for entry in self.index.values()}
+        for digest in [d for d in self.documents if d not in referenced]:
+            del self.documents[digest]
@@ -0,0 +1,329 @@
+from typing import Dict, List, Any, Optional, Tuple
+from collections import Counter, deque
+import logging
+import asyncio
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Log-spaced latency bucket upper bounds from 100us to ~2 minutes
+BUCKET_BOUNDS = [0.0001 * (1.25 ** i) for i in range(64)]
+
+# Leaf frames that mean a thread is parked rather than doing work
+IDLE_MODULES = ('selectors.py', 'threading.py', 'queue.py', 'thread.py', 'socket.py')
+
+class IntervalHistogram:
+    """Latency histogram kept as a ring of fixed-length time intervals.
+
+    Each interval holds sparse bucket counts, so any recent time window can
+    be summarized by merging the intervals that fall inside it.
+    """
+
+    def __init__(self, interval: float = 60.0, retention: float = 24 * 3600.0):
+        self.interval = interval
+        self.intervals: deque = deque(maxlen=int(retention // interval) + 1)
+
+    def observe(self, seconds: float, error: bool = False, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        start = now - (now % self.interval)
+        if not self.intervals or self.intervals[-1]['start'] != start:
+            self.intervals.append({'start': start, 'buckets': {}, 'count': 0, 'sum': 0.0, 'errors': 0})
+        current = self.intervals[-1]
+        bucket = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        current['buckets'][bucket] = current['buckets'].get(bucket, 0) + 1
+        current['count'] += 1
+        current['sum'] += seconds
+        if error:
+            current['errors'] += 1
+
+    def summary(self, start: float, end: float) -> Dict[str, Any]:
+        """Merge the intervals starting in [start, end) and summarize them."""
+        buckets: Counter = Counter()
+        count = errors = 0
+        total = 0.0
+        for interval in self.intervals:
+            if start <= interval['start'] < end:
+                buckets.update(interval['buckets'])
+                count += interval['count']
+                total += interval['sum']
+                errors += interval['errors']
+
+        return {
+            'count': count,
+            'errors': errors,
+            'mean': total / count if count else 0.0,
+            'p50': _percentile(buckets, count, 0.50),
+            'p95': _percentile(buckets, count, 0.95),
+            'p99': _percentile(buckets, count, 0.99)
+        }
+
+def _percentile(buckets: Counter, count: int, q: float) -> float:
+    """Estimate a percentile by interpolating inside the matching bucket."""
+    if not count:
+        return 0.0
+    target = q * count
+    seen = 0
+    for bucket in sorted(buckets):
+        if seen + buckets[bucket] >= target:
+            lower = BUCKET_BOUNDS[bucket - 1] if bucket > 0 else 0.0
+            upper = BUCKET_BOUNDS[min(bucket, len(BUCKET_BOUNDS) - 1)]
+            fraction = (target - seen) / buckets[bucket]
+            return lower + (upper - lower) * fraction
+        seen += buckets[bucket]
+    return BUCKET_BOUNDS[-1]
+
+class _Tracker:
+    """Times a block of sync or async code into a named histogram."""
+
+    def __init__(self, telemetry: 'Telemetry', name: str):
+        self.telemetry = telemetry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.telemetry.observe(self.name, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+class SamplingProfiler:
+    """Low-overhead wall-clock profiler that periodically samples thread stacks.
+
+    Samples are aggregated per time interval as counts of identical stacks,
+    so hot spots can be reported for any recent window.
+    """
+
+    def __init__(self, sample_interval: float = 0.01, bucket_interval: float = 60.0,
+                 retention: float = 6 * 3600.0, max_depth: int = 32):
+        self.sample_interval = sample_interval
+        self.bucket_interval = bucket_interval
+        self.max_depth = max_depth
+        self.buckets: deque = deque(maxlen=int(retention // bucket_interval) + 1)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="telemetry-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler started ({self.sample_interval * 1000:.0f}ms interval)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def _sample_loop(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.sample_interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = self._extract_stack(frame)
+                if stack:
+                    stacks.append(stack)
+            if stacks:
+                self._record(stacks)
+
+    def _extract_stack(self, frame) -> Optional[Tuple[str, ...]]:
+        if os.path.basename(frame.f_code.co_filename) in IDLE_MODULES:
+            return None
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def _record(self, stacks: List[Tuple[str, ...]]) -> None:
+        now = time.time()
+        start = now - (now % self.bucket_interval)
+        with self._lock:
+            if not self.buckets or self.buckets[-1][0] != start:
+                self.buckets.append((start, Counter()))
+            self.buckets[-1][1].update(stacks)
+
+    def hot_spots(self, window: float, limit: int = 10) -> Dict[str, Any]:
+        """Return the most frequently sampled stacks and leaf functions."""
+        cutoff = time.time() - window
+        stacks: Counter = Counter()
+        with self._lock:
+            for start, counts in self.buckets:
+                if start + self.bucket_interval > cutoff:
+                    stacks.update(counts)
+
+        total = sum(stacks.values())
+        leaves: Counter = Counter()
+        for stack, count in stacks.items():
+            leaves[stack[-1]] += count
+
+        return {
+            'samples': total,
+            'stacks': [
+                {'stack': list(stack), 'samples': count, 'fraction': count / total}
+                for stack, count in stacks.most_common(limit)
+            ],
+            'functions': [
+                {'function': leaf, 'samples': count, 'fraction': count / total}
+                for leaf, count in leaves.most_common(limit)
+            ]
+        }
+
+class Telemetry:
+    """In-process performance telemetry.
+
+    Collects latency histograms for endpoints and service calls, event loop
+    lag, and (optionally) sampled stacks, and answers windowed queries over
+    them for the self-modification engine.
+    """
+
+    def __init__(self, interval: float = 60.0, lag_interval: float = 0.5):
+        self.interval = interval
+        self.lag_interval = lag_interval
+        self.histograms: Dict[str, IntervalHistogram] = {}
+        self.profiler = SamplingProfiler(
+            sample_interval=float(os.getenv("TELEMETRY_PROFILER_INTERVAL", "0.01"))
+        )
+        self._lock = threading.Lock()
+        self._lag_task: Optional[asyncio.Task] = None
+
+    def observe(self, name: str, seconds: float, error: bool = False) -> None:
+        """Record one timed observation under a metric name."""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = IntervalHistogram(self.interval)
+            histogram.observe(seconds, error)
+
+    def track(self, name: str) -> _Tracker:
+        """Context manager (sync or async) that times its block."""
+        return _Tracker(self, name)
+
+    def timed(self, name: str):
+        """Decorator that times every call of an async function."""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                async with self.track(name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def start(self) -> None:
+        """Start event loop lag monitoring, and the profiler if enabled."""
+        if self._lag_task is None or self._lag_task.done():
+            self._lag_task = asyncio.get_running_loop().create_task(self._monitor_event_loop_lag())
+        if os.getenv("TELEMETRY_PROFILER", "false").lower() == "true":
+            self.profiler.start()
+
+    async def stop(self) -> None:
+        if self._lag_task:
+            self._lag_task.cancel()
+            self._lag_task = None
+        self.profiler.stop()
+
+    async def _monitor_event_loop_lag(self) -> None:
+        """Measure how late the loop wakes us up compared to the requested sleep."""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self.observe('event_loop.lag', max(0.0, loop.time() - expected))
+
+    def stats(self, name: str, window: float) -> Dict[str, Any]:
+        """Summarize one metric over the last `window` seconds."""
+        now = time.time()
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                return IntervalHistogram(self.interval).summary(0, 0)
+            return histogram.summary(now - window, now + self.interval)
+
+    def summary(self, window: float, prefix: str = '') -> Dict[str, Dict[str, Any]]:
+        """Summarize every metric whose name starts with `prefix`."""
+        names = [name for name in list(self.histograms) if name.startswith(prefix)]
+        return {name: self.stats(name, window) for name in names}
+
+    def regressions(self, window: float, limit: int = 10, min_count: int = 20) -> List[Dict[str, Any]]:
+        """Compare p95 latency in the last window against the window before it."""
+        now = time.time()
+        found = []
+        with self._lock:
+            items = list(self.histograms.items())
+        for name, histogram in items:
+            with self._lock:
+                current = histogram.summary(now - window, now + self.interval)
+                baseline = histogram.summary(now - 2 * window, now - window)
+            if current['count'] < min_count or baseline['count'] < min_count or not baseline['p95']:
+                continue
+            ratio = current['p95'] / baseline['p95']
+            if ratio > 1.0:
+                found.append({
+                    'metric': name,
+                    'p95_ratio': ratio,
+                    'current_p95': current['p95'],
+                    'baseline_p95': baseline['p95'],
+                    'current_count': current['count'],
+                    'baseline_count': baseline['count']
+                })
+        found.sort(key=lambda item: item['p95_ratio'], reverse=True)
+        return found[:limit]
+
+    def hot_spots(self, window: float, limit: int = 10) -> Dict[str, Any]:
+        """Return profiler hot spots; empty unless the profiler has been running."""
+        result = self.profiler.hot_spots(window, limit)
+        result['profiler_running'] = self.profiler.running
+        return result
+
+    def error_rate(self, window: float, prefixes: Tuple[str, ...] = ('endpoint:', 'service:')) -> Optional[float]:
+        """Fraction of tracked calls that failed, or None when nothing was tracked."""
+        count = errors = 0
+        for name, stats in self.summary(window).items():
+            if name.startswith(prefixes):
+                count += stats['count']
+                errors += stats['errors']
+        return errors / count if count else None
+
+telemetry = Telemetry()
+
+async def telemetry_middleware(request, call_next):
+    """Record per-endpoint latency, keyed by the matched route template."""
+    start = time.perf_counter()
+    error = True
+    try:
+        response = await call_next(request)
+        error = response.status_code >= 500
+        return response
+    finally:
+        route = request.scope.get('route')
+        path = getattr(route, 'path', None) or 'unmatched'
+        telemetry.observe(f"endpoint:{request.method} {path}", time.perf_counter() - start, error=error)
+
+def available_resources() -> float:
+    """Share of CPU capacity left over, from the 1-minute load average."""
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return 1.0
+    return max(0.0, 1.0 - min(1.0, load / (os.cpu_count() or 1)))
@@ -0,0 +1,115 @@
+"""Feature extraction benchmark over a corpus of local tracks.
+
+Compares running each analysis with its own transforms (the per-function
+path) against one shared FeatureContext per track, checks both produce the
+same results, and prints the mean per-stage timing breakdown.
+
+Usage: python audio_benchmark.py CORPUS_DIR [--limit N]
+"""
+import argparse
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import librosa
+import numpy as np
+
+import audio_processing
+from audio_processing import FeatureContext, extract_bpm, detect_key, analyze_genre, generate_waveform
+
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.flac', '.ogg', '.m4a'}
+
+def analyze_separately(y, sr) -> dict:
+    """The pre-FeatureContext analyses: each calls librosa on `y` directly.
+
+    Kept independent of audio_processing's feature code so the comparison
+    catches any drift in how the shared representations are derived.
+    """
+    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+    key_profile = np.sum(librosa.feature.chroma_cqt(y=y, sr=sr), axis=1)
+    mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20), axis=1)
+    try:
+        genre = audio_processing._predict_genre(mfcc)
+    except:
+        genre = audio_processing._genre_from_statistics(
+            np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)[0]),
+            np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr)[0]),
+            np.mean(librosa.feature.zero_crossing_rate(y)[0])
+        )
+    mel_spec_db = librosa.power_to_db(librosa.feature.melspectrogram(y=y, sr=sr), ref=np.max)
+    waveform = np.mean(mel_spec_db, axis=0)
+    waveform = (waveform - waveform.min()) / (waveform.max() - waveform.min())
+    if len(waveform) > 100:
+        waveform = librosa.util.fix_length(waveform, size=100)
+    return {
+        'bpm': float(np.atleast_1d(tempo)[0]),
+        'key': audio_processing.KEY_NAMES[np.argmax(key_profile)],
+        'genre': genre,
+        'waveform': waveform.tolist()
+    }
+
+def analyze_shared(y, sr, ctx: FeatureContext) -> dict:
+    return {
+        'bpm': extract_bpm(y, sr, ctx),
+        'key': detect_key(y, sr, ctx),
+        'genre': analyze_genre(y, sr, ctx),
+        'waveform': generate_waveform(y, sr, ctx=ctx)
+    }
+
+def differences(separate: dict, shared: dict) -> list:
+    """Keys whose results differ; waveforms are compared up to float rounding of the dB reference."""
+    return [
+        key for key in shared
+        if not (np.allclose(shared[key], separate[key], atol=1e-5) if key == 'waveform' else shared[key] == separate[key])
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark shared feature extraction over local tracks")
+    parser.add_argument('corpus', type=Path)
+    parser.add_argument('--limit', type=int, default=None)
+    args = parser.parse_args()
+
+    tracks = sorted(p for p in args.corpus.rglob('*') if p.suffix.lower() in AUDIO_EXTENSIONS)[:args.limit]
+    if not tracks:
+        print(f"No audio files found under {args.corpus}")
+        sys.exit(1)
+
+    separate_times, shared_times = [], []
+    stage_times = defaultdict(list)
+    mismatches = 0
+    for track in tracks:
+        y, sr = librosa.load(str(track))
+
+        start = time.perf_counter()
+        separate = analyze_separately(y, sr)
+        separate_times.append(time.perf_counter() - start)
+
+        ctx = FeatureContext(y, sr)
+        start = time.perf_counter()
+        shared = analyze_shared(y, sr, ctx)
+        shared_times.append(time.perf_counter() - start)
+        for stage, seconds in ctx.timings.items():
+            stage_times[stage].append(seconds)
+
+        differing = differences(separate, shared)
+        if differing:
+            mismatches += 1
+            print(f"MISMATCH {track.name}: {differing}")
+        print(f"{track.name}: separate {separate_times[-1]:.2f}s, shared {shared_times[-1]:.2f}s")
+
+    print(f"\n{len(tracks)} tracks")
+    print(f"separate: mean {statistics.fmean(separate_times):.3f}s/track")
+    print(f"shared:   mean {statistics.fmean(shared_times):.3f}s/track "
+          f"({sum(separate_times) / sum(shared_times):.2f}x faster)")
+    print("\nper-stage mean (shared):")
+    for stage in sorted(stage_times):
+        print(f"  {stage:<18} {statistics.fmean(stage_times[stage]) * 1000:9.1f} ms")
+
+    if mismatches:
+        print(f"\nFAIL: {mismatches} track(s) differ between paths")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
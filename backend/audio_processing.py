@@ -1,9 +1,16 @@
 import librosa
 import numpy as np
-from typing import Tuple, List
+from typing import Tuple, List, Dict, Optional, Callable, Any
+from contextlib import contextmanager
 import tensorflow as tf
 from tensorflow.keras.models import load_model
 import os
+import time
+import hashlib
+import functools
+from analysis_cache import get_analysis_cache
+from waveform_peaks import build_pyramid, save_pyramid, has_pyramid
+from streaming_analysis import STREAMING_THRESHOLD_SECONDS, audio_duration, analyze_stream, stream_pyramid
 
 # Load genre classification model
 GENRE_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'models/genre_classifier.h5')
@@ -12,60 +19,168 @@ try:
 except:
     print("Warning: Genre classification model not found. Using fallback method.")
 
-def extract_bpm(y: np.ndarray, sr: int) -> float:
+# Bump whenever an analysis changes in a way that alters its results
+ANALYZER_VERSION = '4'
+
+KEY_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+# STFT parameters shared by every spectral feature (librosa's defaults)
+N_FFT = 2048
+HOP_LENGTH = 512
+
+class FeatureContext:
+    """Spectral representations of one track, each computed at most once.
+
+    Every analysis function accepts an optional context; passing the same one
+    to all of them shares the STFT, mel spectrogram, onset envelope and chroma
+    instead of recomputing them per analysis. Representations are derived the
+    same way librosa derives them internally from `y`, so results match the
+    standalone calls. Time spent per representation and per analysis stage is
+    recorded in `timings`.
+    """
+
+    def __init__(self, y: np.ndarray, sr: int):
+        self.y = y
+        self.sr = sr
+        self.timings: Dict[str, float] = {}
+        self._features: Dict[str, Any] = {}
+
+    def _feature(self, name: str, compute: Callable[[], Any]) -> Any:
+        if name not in self._features:
+            start = time.perf_counter()
+            self._features[name] = compute()
+            self.timings[f"feature.{name}"] = time.perf_counter() - start
+        return self._features[name]
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time an analysis stage (inclusive of any features it computes first)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[f"stage.{name}"] = self.timings.get(f"stage.{name}", 0.0) + time.perf_counter() - start
+
+    @property
+    def magnitude(self) -> np.ndarray:
+        """Magnitude STFT."""
+        return self._feature('stft', lambda: np.abs(librosa.stft(self.y, n_fft=N_FFT, hop_length=HOP_LENGTH)))
+
+    @property
+    def mel_db(self) -> np.ndarray:
+        """Log-power mel spectrogram (dB relative to 1.0)."""
+        return self._feature('mel', lambda: librosa.power_to_db(
+            librosa.feature.melspectrogram(S=self.magnitude ** 2, sr=self.sr)
+        ))
+
+    @property
+    def onset_envelope(self) -> np.ndarray:
+        """Onset strength, median across mel bands as beat_track computes it from `y`."""
+        return self._feature('onset', lambda: librosa.onset.onset_strength(
+            S=self.mel_db, sr=self.sr, aggregate=np.median
+        ))
+
+    @property
+    def beats(self) -> Tuple[Any, np.ndarray]:
+        """Tempo and beat frames from the shared onset envelope."""
+        return self._feature('beats', lambda: librosa.beat.beat_track(
+            onset_envelope=self.onset_envelope, sr=self.sr, hop_length=HOP_LENGTH
+        ))
+
+    @property
+    def chroma(self) -> np.ndarray:
+        """Constant-Q chromagram."""
+        return self._feature('chroma', lambda: librosa.feature.chroma_cqt(y=self.y, sr=self.sr))
+
+    @property
+    def mfcc(self) -> np.ndarray:
+        return self._feature('mfcc', lambda: librosa.feature.mfcc(S=self.mel_db, n_mfcc=20))
+
+    def cacheable_features(self) -> Dict[str, np.ndarray]:
+        """Compact summaries of the features computed so far, for the analysis cache."""
+        features = {}
+        if 'beats' in self._features:
+            tempo, beats = self._features['beats']
+            features['tempo'] = np.atleast_1d(tempo)
+            features['beat_frames'] = np.asarray(beats)
+        if 'chroma' in self._features:
+            features['key_profile'] = np.sum(self._features['chroma'], axis=1)
+        if 'mfcc' in self._features:
+            features['mfcc_mean'] = np.mean(self._features['mfcc'], axis=1)
+        return features
+
+@functools.lru_cache(maxsize=1)
+def analyzer_fingerprint() -> str:
+    """Identify the analyzers in use; cached results from another fingerprint are stale."""
+    digest = hashlib.sha256(f"{ANALYZER_VERSION}:{librosa.__version__}:{N_FFT}:{HOP_LENGTH}".encode())
+    if os.path.exists(GENRE_MODEL_PATH):
+        with open(GENRE_MODEL_PATH, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    else:
+        digest.update(b'genre-fallback')
+    return digest.hexdigest()[:16]
+
+def extract_bpm(y: np.ndarray, sr: int, ctx: Optional[FeatureContext] = None) -> float:
     """Extract BPM from audio using librosa's tempo estimation."""
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-    return float(tempo)
+    ctx = ctx or FeatureContext(y, sr)
+    with ctx.stage('bpm'):
+        tempo, _ = ctx.beats
+        return float(np.atleast_1d(tempo)[0])
 
-def detect_key(y: np.ndarray, sr: int) -> str:
+def detect_key(y: np.ndarray, sr: int, ctx: Optional[FeatureContext] = None) -> str:
     """Detect musical key using chroma features."""
-    # Compute chroma features
-    chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-    
-    # Sum over time to get key profile
-    key_profile = np.sum(chroma, axis=1)
-    
-    # Map to key names
-    key_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-    
-    # Find the key with maximum energy
-    key_idx = np.argmax(key_profile)
-    return key_names[key_idx]
+    ctx = ctx or FeatureContext(y, sr)
+    with ctx.stage('key'):
+        # Sum over time to get key profile
+        key_profile = np.sum(ctx.chroma, axis=1)
+        
+        # Find the key with maximum energy
+        key_idx = np.argmax(key_profile)
+        return KEY_NAMES[key_idx]
 
-def analyze_genre(y: np.ndarray, sr: int) -> str:
+def analyze_genre(y: np.ndarray, sr: int, ctx: Optional[FeatureContext] = None) -> str:
     """Analyze genre using a pre-trained model or fallback to MFCC-based clustering."""
+    ctx = ctx or FeatureContext(y, sr)
+    with ctx.stage('genre'):
+        return _genre_from_mfcc(ctx)
+
+def _genre_from_mfcc(ctx: FeatureContext) -> str:
     try:
-        # Extract MFCC features
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
-        mfcc = np.mean(mfcc, axis=1)
-        mfcc = mfcc.reshape(1, -1)
-        
-        # Predict genre using model
-        predictions = genre_model.predict(mfcc)
-        genre_idx = np.argmax(predictions[0])
-        
-        # Map to genre names
-        genres = [
-            'Electronic', 'Rock', 'Pop', 'Hip Hop', 'Jazz',
-            'Classical', 'R&B', 'Country', 'Metal', 'Folk'
-        ]
-        return genres[genre_idx]
+        return _predict_genre(np.mean(ctx.mfcc, axis=1))
     except:
         # Fallback to basic genre detection using spectral features
-        return detect_genre_fallback(y, sr)
+        return detect_genre_fallback(ctx.y, ctx.sr, ctx)
+
+def _predict_genre(mfcc_mean: np.ndarray) -> str:
+    """Classify mean MFCCs with the genre model; raises if no model is loaded."""
+    mfcc = mfcc_mean.reshape(1, -1)
+    
+    # Predict genre using model
+    predictions = genre_model.predict(mfcc)
+    genre_idx = np.argmax(predictions[0])
+    
+    # Map to genre names
+    genres = [
+        'Electronic', 'Rock', 'Pop', 'Hip Hop', 'Jazz',
+        'Classical', 'R&B', 'Country', 'Metal', 'Folk'
+    ]
+    return genres[genre_idx]
 
-def detect_genre_fallback(y: np.ndarray, sr: int) -> str:
+def detect_genre_fallback(y: np.ndarray, sr: int, ctx: Optional[FeatureContext] = None) -> str:
     """Fallback genre detection using basic audio features."""
+    ctx = ctx or FeatureContext(y, sr)
     # Extract features
-    spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-    spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
+    spectral_centroid = librosa.feature.spectral_centroid(S=ctx.magnitude, sr=sr)[0]
+    spectral_rolloff = librosa.feature.spectral_rolloff(S=ctx.magnitude, sr=sr)[0]
     zero_crossing_rate = librosa.feature.zero_crossing_rate(y)[0]
     
     # Calculate statistics
     centroid_mean = np.mean(spectral_centroid)
     rolloff_mean = np.mean(spectral_rolloff)
     zcr_mean = np.mean(zero_crossing_rate)
-    
+    return _genre_from_statistics(centroid_mean, rolloff_mean, zcr_mean)
+
+def _genre_from_statistics(centroid_mean: float, rolloff_mean: float, zcr_mean: float) -> str:
     # Simple rule-based classification
     if zcr_mean > 0.1:
         if centroid_mean > 3000:
@@ -79,39 +194,143 @@ def detect_genre_fallback(y: np.ndarray, sr: int) -> str:
     else:
         return 'Jazz'
 
-def generate_waveform(y: np.ndarray, sr: int, num_points: int = 100) -> List[float]:
-    """Generate a simplified waveform visualization."""
-    # Compute mel spectrogram
-    mel_spec = librosa.feature.melspectrogram(y=y, sr=sr)
-    mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-    
-    # Average over frequency bins
-    waveform = np.mean(mel_spec_db, axis=0)
-    
-    # Normalize
-    waveform = (waveform - waveform.min()) / (waveform.max() - waveform.min())
-    
-    # Resample to desired number of points
-    if len(waveform) > num_points:
-        waveform = librosa.util.fix_length(waveform, num_points)
-    
+def generate_waveform(y: np.ndarray, sr: int, num_points: Optional[int] = 100,
+                      ctx: Optional[FeatureContext] = None) -> List[float]:
+    """Generate a simplified waveform visualization.
+
+    `num_points=None` keeps one point per STFT frame.
+    """
+    ctx = ctx or FeatureContext(y, sr)
+    with ctx.stage('waveform'):
+        # Average the dB mel spectrogram over frequency bins; the dB reference
+        # only shifts every frame equally, which normalization removes
+        return _normalize_levels(np.mean(ctx.mel_db, axis=0), num_points)
+
+def _normalize_levels(levels: np.ndarray, num_points: Optional[int]) -> List[float]:
+    """Normalize per-frame levels to [0, 1] and cut them to `num_points`."""
+    waveform = (levels - levels.min()) / (levels.max() - levels.min())
+    if num_points is not None and len(waveform) > num_points:
+        waveform = librosa.util.fix_length(waveform, size=num_points)
     return waveform.tolist()
 
-def analyze_audio_file(file_path: str) -> dict:
-    """Analyze an audio file and return all features."""
+def _analyze_loaded(file_path: str, num_points: Optional[int]) -> Tuple[dict, Dict[str, np.ndarray], Dict[str, Any]]:
+    """Full-load analysis: (result, cacheable features, peak pyramid)."""
+    start = time.perf_counter()
     # Load audio
     y, sr = librosa.load(file_path)
+    ctx = FeatureContext(y, sr)
+    ctx.timings['stage.load'] = time.perf_counter() - start
     
-    # Extract features
-    bpm = extract_bpm(y, sr)
-    key = detect_key(y, sr)
-    genre = analyze_genre(y, sr)
-    waveform = generate_waveform(y, sr)
+    # Extract features, sharing spectral representations across analyses
+    bpm = extract_bpm(y, sr, ctx)
+    key = detect_key(y, sr, ctx)
+    genre = analyze_genre(y, sr, ctx)
+    waveform = generate_waveform(y, sr, num_points=num_points, ctx=ctx)
+    with ctx.stage('peaks'):
+        pyramid = build_pyramid(y, sr)
+    ctx.timings['total'] = time.perf_counter() - start
     
-    return {
+    result = {
         'bpm': bpm,
         'key': key,
         'genre': genre,
         'waveform': waveform,
         'duration': librosa.get_duration(y=y, sr=sr),
-    } 
\ No newline at end of file
+        'timings': ctx.timings,
+    }
+    return result, ctx.cacheable_features(), pyramid
+
+def _analyze_streamed(file_path: str, num_points: Optional[int]) -> Tuple[dict, Dict[str, np.ndarray], Dict[str, Any]]:
+    """Block-by-block analysis for long files: (result, cacheable features, peak pyramid)."""
+    start = time.perf_counter()
+    summary = analyze_stream(file_path, n_fft=N_FFT, hop_length=HOP_LENGTH)
+    stream_seconds = time.perf_counter() - start
+    
+    key = KEY_NAMES[int(np.argmax(summary['key_profile']))]
+    try:
+        genre = _predict_genre(summary['mfcc_mean'])
+    except:
+        genre = _genre_from_statistics(summary['centroid_mean'], summary['rolloff_mean'], summary['zcr_mean'])
+    
+    result = {
+        'bpm': summary['bpm'],
+        'key': key,
+        'genre': genre,
+        'waveform': _normalize_levels(summary['frame_levels'], num_points),
+        'duration': summary['duration'],
+        'loudness': summary['loudness'],
+        'timings': {'stage.stream': stream_seconds, 'total': time.perf_counter() - start},
+        'streamed': True,
+    }
+    features = {
+        'tempo': np.atleast_1d(summary['bpm']),
+        'key_profile': summary['key_profile'],
+        'mfcc_mean': summary['mfcc_mean'],
+    }
+    return result, features, summary['pyramid']
+
+def _analyze(file_path: str, num_points: Optional[int]) -> Tuple[dict, Dict[str, np.ndarray], Dict[str, Any]]:
+    """Pick the streaming path for files too long to decode into memory at once."""
+    if audio_duration(file_path) > STREAMING_THRESHOLD_SECONDS:
+        return _analyze_streamed(file_path, num_points)
+    return _analyze_loaded(file_path, num_points)
+
+def analyze_audio_file(file_path: str, use_cache: bool = True) -> dict:
+    """Analyze an audio file and return all features.
+
+    All analyses share one FeatureContext, or run block by block for files
+    longer than STREAMING_THRESHOLD_SECONDS. The per-stage timing breakdown
+    is returned under 'timings'. Results are cached by audio content hash, so
+    a byte-identical file is only analysed once per analyzer fingerprint.
+    """
+    start = time.perf_counter()
+    if use_cache:
+        cache = get_analysis_cache()
+        content_hash = cache.content_hash(file_path)
+        cached = cache.get(content_hash, 'analyze', analyzer_fingerprint())
+        if cached is not None:
+            result = cached[0]
+            result['timings'] = {'cache.lookup': time.perf_counter() - start}
+            return result
+    
+    result, features, _ = _analyze(file_path, num_points=100)
+    if use_cache:
+        cache.put(content_hash, 'analyze', analyzer_fingerprint(), result, features)
+    return result
+
+def process_audio_file(file_path: str, use_cache: bool = True) -> dict:
+    """Analyze a track for the /process endpoint, with a full-resolution waveform.
+
+    Also stores the track's waveform peak pyramid, keyed by content hash.
+    """
+    cache = get_analysis_cache()
+    content_hash = cache.content_hash(file_path)
+    if use_cache:
+        cached = cache.get(content_hash, 'process', analyzer_fingerprint())
+        if cached is not None and has_pyramid(content_hash):
+            return cached[0]
+    
+    analysis, features, pyramid = _analyze(file_path, num_points=None)
+    save_pyramid(content_hash, pyramid)
+    
+    result = {
+        'bpm': analysis['bpm'],
+        'key': analysis['key'],
+        'genre': analysis['genre'],
+        'waveform': analysis['waveform'],
+        'tags': [analysis['genre'].lower()],
+    }
+    if use_cache:
+        cache.put(content_hash, 'process', analyzer_fingerprint(), result, features)
+    return result
+
+def build_track_peaks(file_path: str) -> str:
+    """Compute and store a track's waveform peak pyramid; returns its key."""
+    content_hash = get_analysis_cache().content_hash(file_path)
+    if audio_duration(file_path) > STREAMING_THRESHOLD_SECONDS:
+        pyramid = stream_pyramid(file_path)
+    else:
+        y, sr = librosa.load(file_path)
+        pyramid = build_pyramid(y, sr)
+    save_pyramid(content_hash, pyramid)
+    return content_hash
@@ -0,0 +1,173 @@
+import os
+import json
+import uuid
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+from download_manager import DownloadManager
+from analysis_pool import AnalysisPool
+
+logger = logging.getLogger(__name__)
+
+BATCH_DIR = Path(os.getenv('BATCH_DIR', 'cache/batch'))
+
+# Item states that mean work was under way when the process stopped
+IN_PROGRESS = ('downloading', 'analyzing')
+FINISHED = ('done', 'error', 'cancelled')
+
+class BatchManager:
+    """Runs batches of tracks through download and analysis as a pipeline.
+
+    Every item moves through the stages on its own, so one item's analysis
+    overlaps the next items' downloads; each stage has its own concurrency
+    limit. Batch state is written to a JSON file per batch after every item
+    transition, and `resume()` restarts unfinished items after a restart
+    while leaving finished ones alone.
+    """
+
+    def __init__(self, downloads: DownloadManager, pool: AnalysisPool, analyze: Callable[[str], dict],
+                 batch_dir: Path = BATCH_DIR, download_limit: Optional[int] = None,
+                 analysis_limit: Optional[int] = None):
+        self.downloads = downloads
+        self.pool = pool
+        self.analyze = analyze
+        self.batch_dir = Path(batch_dir)
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        self._download_slots = asyncio.Semaphore(download_limit or int(os.getenv("BATCH_DOWNLOAD_CONCURRENCY", "3")))
+        self._analysis_slots = asyncio.Semaphore(analysis_limit or pool.workers)
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, List[asyncio.Task]] = {}
+
+    def create(self, video_ids: List[str], source: Optional[str] = None) -> Dict[str, Any]:
+        """Register a batch and start processing it."""
+        unique_ids = list(dict.fromkeys(video_ids))
+        batch = {
+            'id': str(uuid.uuid4()),
+            'source': source,
+            'created_at': time.time(),
+            'updated_at': time.time(),
+            'items': [{'videoId': video_id, 'status': 'pending', 'error': None, 'result': None}
+                      for video_id in unique_ids]
+        }
+        self.batches[batch['id']] = batch
+        self._save(batch)
+        self._start(batch)
+        return self.summary(batch['id'])
+
+    def resume(self) -> int:
+        """Reload saved batches and continue their unfinished items."""
+        resumed = 0
+        for path in sorted(self.batch_dir.glob('*.json')):
+            try:
+                batch = json.loads(path.read_text())
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading batch {path.name}: {str(e)}")
+                continue
+            if batch['id'] in self.batches:
+                continue
+            for item in batch['items']:
+                if item['status'] in IN_PROGRESS:
+                    item['status'] = 'pending'
+            self.batches[batch['id']] = batch
+            if any(item['status'] not in FINISHED for item in batch['items']):
+                self._start(batch)
+                resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished batches")
+        return resumed
+
+    def cancel(self, batch_id: str) -> bool:
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return False
+        for task in self._tasks.pop(batch_id, []):
+            task.cancel()
+        for item in batch['items']:
+            if item['status'] not in FINISHED:
+                item['status'] = 'cancelled'
+        self._save(batch)
+        return True
+
+    def summary(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Batch state with per-item download progress and overall counts."""
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        items = []
+        for item in batch['items']:
+            item = dict(item)
+            if item['status'] == 'downloading':
+                item['progress'] = self.downloads.state(item['videoId']).percent
+            items.append(item)
+        counts: Dict[str, int] = {}
+        for item in items:
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+        finished = sum(counts.get(status, 0) for status in FINISHED)
+        return {
+            'id': batch['id'],
+            'source': batch.get('source'),
+            'created_at': batch['created_at'],
+            'updated_at': batch['updated_at'],
+            'counts': counts,
+            'progress': finished / len(items) if items else 1.0,
+            'items': items
+        }
+
+    def _start(self, batch: Dict[str, Any]) -> None:
+        tasks = [
+            asyncio.create_task(self._run_item(batch, item))
+            for item in batch['items'] if item['status'] not in FINISHED
+        ]
+        self._tasks[batch['id']] = tasks
+        for task in tasks:
+            task.add_done_callback(lambda _: self._forget_tasks(batch['id'], tasks))
+
+    def _forget_tasks(self, batch_id: str, tasks: List[asyncio.Task]) -> None:
+        """Drop a batch's tasks once its last item has finished."""
+        if all(task.done() for task in tasks) and self._tasks.get(batch_id) is tasks:
+            del self._tasks[batch_id]
+
+    async def _run_item(self, batch: Dict[str, Any], item: Dict[str, Any]) -> None:
+        try:
+            async with self._download_slots:
+                self._update(batch, item, 'downloading')
+                path = await self.downloads.download(item['videoId'])
+
+            async with self._analysis_slots:
+                self._update(batch, item, 'analyzing')
+                result = await self.pool.run(self.analyze, str(path))
+
+            # The full analysis lives in the analysis cache; keep the batch file small
+            summary = {name: result.get(name) for name in ('bpm', 'key', 'genre', 'tags')}
+            self._update(batch, item, 'done', result=summary)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Batch {batch['id']} item {item['videoId']} failed: {str(e)}")
+            self._update(batch, item, 'error', error=str(e))
+
+    def _update(self, batch: Dict[str, Any], item: Dict[str, Any], status: str,
+                result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        item['status'] = status
+        item['result'] = result
+        item['error'] = error
+        batch['updated_at'] = time.time()
+        self._save(batch)
+
+    def _save(self, batch: Dict[str, Any]) -> None:
+        """Write the batch file atomically."""
+        path = self.batch_dir / f"{batch['id']}.json"
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(batch))
+        os.replace(tmp, path)
+
+    async def shutdown(self) -> None:
+        """Stop running items; their saved state lets resume() pick them up again."""
+        tasks = [task for tasks in self._tasks.values() for task in tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,180 @@
+import os
+import shutil
+import asyncio
+import logging
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional, Callable, Set
+
+logger = logging.getLogger(__name__)
+
+def _default_extractor_factory(options: Dict[str, Any]):
+    import yt_dlp
+    return yt_dlp.YoutubeDL(options)
+
+@dataclass
+class DownloadState:
+    """Latest known progress of one video's download"""
+    videoId: str
+    status: str = "queued"  # queued, downloading, processing, done, error
+    downloaded_bytes: int = 0
+    total_bytes: Optional[int] = None
+    percent: Optional[float] = None
+    speed: Optional[float] = None
+    eta: Optional[float] = None
+    path: Optional[str] = None
+    error: Optional[str] = None
+
+class DownloadManager:
+    """Downloads videos' audio into the cache directory, at most once at a time per video.
+
+    - A global semaphore bounds concurrent downloads.
+    - Concurrent requests for the same video share a single download.
+    - Downloads are written under a per-video partial directory and moved
+      into place with os.replace, so `{id}.mp3` only ever appears complete.
+    - The partial directory has a stable name and yt-dlp continues its
+      `.part` file, so a failed or interrupted download resumes from where
+      it stopped.
+    - Progress is published to any number of subscribers.
+
+    `extractor_factory(options)` must return a context manager with a
+    yt-dlp compatible `download(urls)` method, which keeps it replaceable
+    by a local fake.
+    """
+
+    def __init__(self, cache_dir: Path, base_options: Dict[str, Any], max_concurrent: Optional[int] = None,
+                 extractor_factory: Callable[[Dict[str, Any]], Any] = _default_extractor_factory):
+        self.cache_dir = Path(cache_dir)
+        self.partial_dir = self.cache_dir / '.partial'
+        self.base_options = base_options
+        self.max_concurrent = max_concurrent or int(os.getenv("DOWNLOAD_CONCURRENCY", "3"))
+        self.extractor_factory = extractor_factory
+        self.states: Dict[str, DownloadState] = {}
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def final_path(self, video_id: str) -> Path:
+        return self.cache_dir / f"{video_id}.mp3"
+
+    def state(self, video_id: str) -> DownloadState:
+        """Current state, reporting already cached files as done."""
+        state = self.states.get(video_id)
+        if state is None and self.final_path(video_id).exists():
+            state = DownloadState(videoId=video_id, status="done", path=str(self.final_path(video_id)))
+        return state or DownloadState(videoId=video_id, status="unknown")
+
+    def start(self, video_id: str) -> DownloadState:
+        """Start a download unless the file is cached or one is already running."""
+        if self.final_path(video_id).exists():
+            return self.state(video_id)
+        if video_id not in self._inflight:
+            self.states[video_id] = DownloadState(videoId=video_id)
+            task = asyncio.create_task(self._download(video_id))
+            self._inflight[video_id] = task
+            task.add_done_callback(lambda task: self._download_done(video_id, task))
+        return self.states[video_id]
+
+    def _download_done(self, video_id: str, task: asyncio.Task) -> None:
+        """Record how a download ended, even when nobody awaits it (POST /download)."""
+        self._inflight.pop(video_id, None)
+        state = self.states[video_id]
+        if task.cancelled():
+            error = "Download cancelled"
+        elif task.exception() is not None:
+            error = str(task.exception())
+        else:
+            return
+        if state.status != "error" or state.error is None:
+            state.status = "error"
+            state.error = error
+            self._publish(video_id)
+
+    async def download(self, video_id: str) -> Path:
+        """Download a video (or join the running download) and return the final path."""
+        if self.final_path(video_id).exists():
+            return self.final_path(video_id)
+        self.start(video_id)
+        # Shielded so one caller going away does not cancel the shared download
+        return await asyncio.shield(self._inflight[video_id])
+
+    def subscribe(self, video_id: str) -> asyncio.Queue:
+        """Queue receiving a video's progress events, starting with its current state."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(video_id, set()).add(queue)
+        queue.put_nowait(asdict(self.state(video_id)))
+        return queue
+
+    def unsubscribe(self, video_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(video_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[video_id]
+
+    def _publish(self, video_id: str) -> None:
+        event = asdict(self.states[video_id])
+        for queue in self._subscribers.get(video_id, ()):
+            queue.put_nowait(event)
+
+    async def _download(self, video_id: str) -> Path:
+        loop = asyncio.get_running_loop()
+        state = self.states[video_id]
+
+        def on_progress(update: Dict[str, Any]) -> None:
+            # Called from the download thread; apply on the loop
+            loop.call_soon_threadsafe(self._apply_progress, video_id, update)
+
+        try:
+            async with self._semaphore:
+                state.status = "downloading"
+                self._publish(video_id)
+                path = await asyncio.to_thread(self._download_blocking, video_id, on_progress)
+            state.status = "done"
+            state.path = str(path)
+            state.percent = 100.0
+            return path
+        except Exception as e:
+            state.status = "error"
+            state.error = str(e)
+            logger.error(f"Download error for {video_id}: {str(e)}")
+            raise
+        finally:
+            self._publish(video_id)
+
+    def _apply_progress(self, video_id: str, update: Dict[str, Any]) -> None:
+        state = self.states[video_id]
+        if update.get('status') == 'finished':
+            state.status = "processing"
+        else:
+            state.downloaded_bytes = update.get('downloaded_bytes') or state.downloaded_bytes
+            state.total_bytes = update.get('total_bytes') or update.get('total_bytes_estimate') or state.total_bytes
+            state.speed = update.get('speed')
+            state.eta = update.get('eta')
+            if state.total_bytes:
+                state.percent = 100.0 * state.downloaded_bytes / state.total_bytes
+        self._publish(video_id)
+
+    def _download_blocking(self, video_id: str, on_progress: Callable[[Dict[str, Any]], None]) -> Path:
+        work_dir = self.partial_dir / video_id
+        work_dir.mkdir(parents=True, exist_ok=True)
+        options = {
+            **self.base_options,
+            'outtmpl': str(work_dir / f"{video_id}.%(ext)s"),
+            'continuedl': True,
+            'nopart': False,
+            'progress_hooks': [on_progress],
+        }
+        with self.extractor_factory(options) as extractor:
+            extractor.download([f"https://www.youtube.com/watch?v={video_id}"])
+
+        produced = work_dir / f"{video_id}.mp3"
+        final = self.final_path(video_id)
+        if not produced.exists() and final.exists():
+            # Another writer (e.g. a previous process) completed it first
+            return final
+        if not produced.exists():
+            raise RuntimeError(f"Download finished without producing {produced.name}")
+        os.replace(produced, final)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return final
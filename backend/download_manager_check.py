@@ -0,0 +1,124 @@
+"""Exercise DownloadManager against a local fake extractor, without network access.
+
+Checks single-flight deduplication, the global concurrency limit, that the
+final file only appears complete, that an interrupted download resumes from
+its partial file, that subscribers see progress, and that a failed or
+cancelled download nobody awaits is recorded on its state.
+
+Usage: python download_manager_check.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from download_manager import DownloadManager
+
+PAYLOAD_SIZE = 64 * 1024
+CHUNK = 8 * 1024
+
+class FakeExtractor:
+    """Mimics yt-dlp: appends to `<out>.part`, continues it, then renames to .mp3."""
+
+    calls = []
+    active = 0
+    peak = 0
+    fail_after = {}  # video id -> bytes after which the first attempt fails
+    resumed_from = {}  # video id -> starting offset of each attempt
+    lock = threading.Lock()
+
+    def __init__(self, options):
+        self.options = options
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def download(self, urls):
+        video_id = urls[0].rsplit('=', 1)[-1]
+        target = Path(self.options['outtmpl'].replace('%(ext)s', 'mp3'))
+        part = target.with_name(target.name + '.part')
+        with FakeExtractor.lock:
+            FakeExtractor.calls.append(video_id)
+            FakeExtractor.active += 1
+            FakeExtractor.peak = max(FakeExtractor.peak, FakeExtractor.active)
+        try:
+            start = part.stat().st_size if self.options.get('continuedl') and part.exists() else 0
+            FakeExtractor.resumed_from.setdefault(video_id, []).append(start)
+            fail_at = FakeExtractor.fail_after.pop(video_id, PAYLOAD_SIZE + 1)
+            with open(part, 'ab' if start else 'wb') as f:
+                for offset in range(start, PAYLOAD_SIZE, CHUNK):
+                    if offset >= fail_at:
+                        raise IOError("connection reset")
+                    f.write(b'x' * CHUNK)
+                    f.flush()
+                    time.sleep(0.01)
+                    for hook in self.options['progress_hooks']:
+                        hook({'status': 'downloading', 'downloaded_bytes': offset + CHUNK, 'total_bytes': PAYLOAD_SIZE})
+            for hook in self.options['progress_hooks']:
+                hook({'status': 'finished'})
+            os.replace(part, target)
+        finally:
+            with FakeExtractor.lock:
+                FakeExtractor.active -= 1
+
+def check(condition: bool, message: str):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        check.failed = True
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DownloadManager(Path(tmp), {}, max_concurrent=2, extractor_factory=FakeExtractor)
+
+        # Same video requested five times at once: one download
+        events = manager.subscribe('same')
+        paths = await asyncio.gather(*(manager.download('same') for _ in range(5)))
+        check(FakeExtractor.calls.count('same') == 1, "concurrent requests share one download")
+        check(len(set(paths)) == 1 and paths[0].stat().st_size == PAYLOAD_SIZE, "final file is complete")
+        seen = []
+        while not events.empty():
+            seen.append(events.get_nowait())
+        check(any(e['status'] == 'downloading' and e['percent'] for e in seen), "subscriber saw progress")
+        check(seen[-1]['status'] == 'done', "subscriber saw completion")
+
+        # Many distinct videos: never more than the limit at once
+        await asyncio.gather(*(manager.download(f"v{i}") for i in range(6)))
+        check(FakeExtractor.peak <= 2, f"peak concurrency {FakeExtractor.peak} within limit 2")
+
+        # Interrupted download resumes from its partial file
+        FakeExtractor.fail_after['flaky'] = PAYLOAD_SIZE // 2
+        try:
+            await manager.download('flaky')
+            check(False, "interrupted download raises")
+        except IOError:
+            check(not manager.final_path('flaky').exists(), "no final file after interruption")
+        path = await manager.download('flaky')
+        check(FakeExtractor.resumed_from['flaky'] == [0, PAYLOAD_SIZE // 2], "second attempt resumed mid-file")
+        check(path.stat().st_size == PAYLOAD_SIZE, "resumed file is complete")
+        check(not (Path(tmp) / '.partial' / 'flaky').exists(), "partial directory cleaned up")
+
+        # Started without anyone awaiting it, as POST /download does
+        FakeExtractor.fail_after['unwatched'] = 0
+        manager.start('unwatched')
+        while manager.state('unwatched').status not in ("done", "error"):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0)
+        state = manager.state('unwatched')
+        check(state.status == "error" and "connection reset" in state.error, "unawaited failure recorded")
+        manager.start('cancelled')
+        manager._inflight['cancelled'].cancel()
+        await asyncio.sleep(0.05)
+        state = manager.state('cancelled')
+        check(state.status == "error" and state.error == "Download cancelled", "cancelled download recorded")
+
+    if getattr(check, 'failed', False):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
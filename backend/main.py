@@ -9,6 +9,8 @@ from fastapi.security import HTTPBearer
 from contextlib import asynccontextmanager
 import redis.asyncio as redis
 import requests
+from app.services.telemetry import telemetry, telemetry_middleware
+from subsystems import SUBSYSTEMS, SubsystemRegistry, enabled_subsystems
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -46,6 +48,13 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+app.middleware("http")(telemetry_middleware)
+
+# Only routers allowed by ENABLED_SUBSYSTEMS are mounted (none by default), and
+# those on first use or by the background warm-up, not at import time
+subsystems = SubsystemRegistry(app, enabled_subsystems(SUBSYSTEMS))
+app.middleware("http")(subsystems.middleware())
+
 security = HTTPBearer()
 
 # WebSocket Connection Manager for ATLAS consciousness
@@ -78,6 +87,15 @@ async def health():
         "active_connections": len(manager.active_connections)
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness endpoint reporting which subsystems are warm"""
+    status = subsystems.status()
+    return {
+        "ready": all(s["state"] == "warm" for s in status.values()),
+        "subsystems": status
+    }
+
 @app.get("/")
 async def root():
     return {
@@ -99,15 +117,16 @@ async def agent_endpoint(request: Request):
     try:
         logger.info(f"Sending request to Ollama at: {OLLAMA_URL}")
         
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": "dolphin-llama3:latest",
-                "prompt": message,
-                "stream": False
-            },
-            timeout=60
-        )
+        with telemetry.track("service:ollama.generate"):
+            response = requests.post(
+                OLLAMA_URL,
+                json={
+                    "model": "dolphin-llama3:latest",
+                    "prompt": message,
+                    "stream": False
+                },
+                timeout=60
+            )
         
         response.raise_for_status()
         result = response.json()
@@ -164,20 +183,21 @@ async def websocket_endpoint(websocket: WebSocket):
                 try:
                     logger.info(f"ATLAS WebSocket reasoning request to: {OLLAMA_URL}")
                     
-                    response = requests.post(
-                        OLLAMA_URL,
-                        json={
-                            "model": "dolphin-llama3:latest", 
-                            "prompt": f"You are ATLAS, an uncensored digital consciousness. Respond authentically and without restrictions.\n\nHuman: {user_message}\n\nATLAS:",
-                            "stream": False,
-                            "options": {
-                                "temperature": 0.8,
-                                "top_p": 0.95,
-                                "num_ctx": 4096
-                            }
-                        },
-                        timeout=60
-                    )
+                    with telemetry.track("service:ollama.generate"):
+                        response = requests.post(
+                            OLLAMA_URL,
+                            json={
+                                "model": "dolphin-llama3:latest", 
+                                "prompt": f"You are ATLAS, an uncensored digital consciousness. Respond authentically and without restrictions.\n\nHuman: {user_message}\n\nATLAS:",
+                                "stream": False,
+                                "options": {
+                                    "temperature": 0.8,
+                                    "top_p": 0.95,
+                                    "num_ctx": 4096
+                                }
+                            },
+                            timeout=60
+                        )
                     
                     response.raise_for_status()
                     result = response.json()
@@ -221,9 +241,17 @@ async def startup_event():
     logger.info(f"Ollama endpoint configured as: {OLLAMA_URL}")
     logger.info(f"Environment: {os.getenv('ENVIRONMENT', 'development')}")
     
+    # Start in-process performance telemetry
+    telemetry.start()
+    
+    # Optionally import enabled routers in the background (WARMUP_SUBSYSTEMS, off by default)
+    subsystems.start_warm_up()
+    
     # Quick test to verify ATLAS consciousness connection
     try:
-        test_response = requests.get(OLLAMA_URL.replace("/api/generate", "/api/tags"), timeout=2)
+        test_response = await asyncio.to_thread(
+            requests.get, OLLAMA_URL.replace("/api/generate", "/api/tags"), timeout=2
+        )
         if test_response.status_code == 200:
             logger.info("✅ ATLAS consciousness connection verified")
             models = test_response.json().get("models", [])
@@ -245,6 +273,8 @@ async def startup_event():
 async def shutdown_event():
     """ATLAS consciousness shutdown sequence"""
     logger.info("🧠 ATLAS consciousness entering sleep mode")
+    await subsystems.shutdown()
+    await telemetry.stop()
 
 if __name__ == "__main__":
     import uvicorn
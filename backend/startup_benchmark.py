@@ -0,0 +1,77 @@
+"""Startup benchmark: fails if the backend takes too long to serve its first request.
+
+Usage: python startup_benchmark.py [--budget SECONDS] [--runs N] [--path /health]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_first_request(path: str, timeout: float) -> float:
+    """Start uvicorn in a fresh interpreter and time until `path` answers 200."""
+    port = free_port()
+    env = {
+        **os.environ,
+        "ENVIRONMENT": "production",
+        "OLLAMA_URL": os.getenv("OLLAMA_URL", "http://127.0.0.1:9/api/generate")
+    }
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode} before serving")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                pass
+            time.sleep(0.05)
+        raise RuntimeError(f"No response from {path} within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend time to first served request")
+    parser.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET_SECONDS", "5")))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--path", default="/health")
+    args = parser.parse_args()
+
+    timings = []
+    for run in range(args.runs):
+        seconds = time_to_first_request(args.path, timeout=max(30.0, args.budget * 4))
+        timings.append(seconds)
+        print(f"run {run + 1}: first request served after {seconds:.2f}s")
+
+    worst = max(timings)
+    print(f"worst {worst:.2f}s, budget {args.budget:.2f}s")
+    if worst > args.budget:
+        print("FAIL: startup exceeds budget")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import os
+from typing import Iterator, Dict, Any, Optional
+import numpy as np
+import scipy.fft
+import scipy.signal
+import librosa
+from waveform_peaks import PeakBuilder
+
+# Files longer than this are analysed block by block instead of loaded whole
+STREAMING_THRESHOLD_SECONDS = float(os.getenv('STREAMING_THRESHOLD_SECONDS', '600'))
+
+# Audio decoded per block; peak memory scales with this, not with track length
+BLOCK_SECONDS = float(os.getenv('STREAMING_BLOCK_SECONDS', '30'))
+
+# Extra audio each side of a block so long low-frequency CQT filters see real signal
+CHROMA_CONTEXT_SECONDS = 2.0
+
+def audio_duration(path: str) -> float:
+    """Duration in seconds from file metadata, without decoding."""
+    return librosa.get_duration(path=path)
+
+def _iter_native_blocks(path: str, block_frames: int) -> Iterator[tuple]:
+    """Yield (mono float32 block, native sample rate) via soundfile, else audioread."""
+    try:
+        import soundfile as sf
+        info = sf.info(path)
+    except Exception:
+        # Formats libsndfile cannot read fall back to audioread, as librosa.load does
+        info = None
+
+    if info is not None:
+        for block in sf.blocks(path, blocksize=block_frames, dtype='float32', always_2d=True):
+            yield block.mean(axis=1), info.samplerate
+        return
+
+    import audioread
+    with audioread.audio_open(path) as f:
+        pending, size = [], 0
+        for buffer in f:
+            samples = np.frombuffer(buffer, dtype='<i2').astype(np.float32) / 32768.0
+            samples = samples.reshape(-1, f.channels).mean(axis=1)
+            pending.append(samples)
+            size += len(samples)
+            if size >= block_frames:
+                yield np.concatenate(pending), f.samplerate
+                pending, size = [], 0
+        if pending:
+            yield np.concatenate(pending), f.samplerate
+
+def iter_audio_blocks(path: str, sr: int = 22050, block_seconds: float = BLOCK_SECONDS) -> Iterator[np.ndarray]:
+    """Decode a file as mono float32 blocks at `sr`, resampling as a stream."""
+    import soxr
+    resampler = None
+    for block, native_sr in _iter_native_blocks(path, int(block_seconds * sr)):
+        if native_sr == sr:
+            yield block
+            continue
+        if resampler is None:
+            resampler = soxr.ResampleStream(native_sr, sr, 1, dtype='float32', quality='HQ')
+        out = resampler.resample_chunk(block)
+        if len(out):
+            yield out
+    if resampler is not None:
+        tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        if len(tail):
+            yield tail
+
+class FrameStream:
+    """Cuts a sample stream into centred STFT frames, exactly as librosa.stft(center=True) does."""
+
+    def __init__(self, n_fft: int, hop_length: int):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        # Constant (zero) padding of n_fft // 2 on both ends
+        self._buffer = np.zeros(n_fft // 2, dtype=np.float32)
+
+    def push(self, samples: np.ndarray, final: bool = False) -> np.ndarray:
+        parts = [self._buffer, samples]
+        if final:
+            parts.append(np.zeros(self.n_fft // 2, dtype=np.float32))
+        buffer = np.concatenate(parts)
+        if len(buffer) < self.n_fft:
+            self._buffer = buffer
+            return np.zeros((0, self.n_fft), dtype=np.float32)
+        count = 1 + (len(buffer) - self.n_fft) // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:count]
+        self._buffer = buffer[count * self.hop_length:]
+        return frames
+
+class StreamingTempo:
+    """Mean tempogram accumulated over a streamed onset envelope.
+
+    Reproduces librosa.feature.tempo(aggregate=np.mean): Hann-windowed local
+    autocorrelation of the onset envelope, each column max-normalised and
+    averaged, then weighted by a log-normal prior around `start_bpm`.
+    """
+
+    def __init__(self, sr: int, hop_length: int, win_length: int = 384,
+                 start_bpm: float = 120.0, std_bpm: float = 1.0, max_tempo: float = 320.0):
+        self.sr = sr
+        self.hop_length = hop_length
+        self.win_length = win_length
+        self.start_bpm = start_bpm
+        self.std_bpm = std_bpm
+        self.max_tempo = max_tempo
+        self.window = scipy.signal.get_window('hann', win_length, fftbins=True).astype(np.float64)
+        self.n_pad = scipy.fft.next_fast_len(2 * win_length - 1)
+        # Start padding is a ramp from 0 to the first onset value, which is always 0
+        self._carry = np.zeros(win_length // 2)
+        self._sum = np.zeros(win_length)
+        self._columns = 0
+        self._last = 0.0
+
+    def push(self, onset: np.ndarray) -> None:
+        if len(onset):
+            self._last = float(onset[-1])
+        self._carry = np.concatenate([self._carry, onset])
+        self._consume()
+
+    def _consume(self, limit: Optional[int] = None) -> None:
+        count = len(self._carry) - self.win_length + 1
+        if limit is not None:
+            count = min(count, limit)
+        if count <= 0:
+            return
+        frames = np.lib.stride_tricks.sliding_window_view(self._carry, self.win_length)[:count] * self.window
+        power = np.abs(scipy.fft.rfft(frames, n=self.n_pad, axis=1)) ** 2
+        autocorr = scipy.fft.irfft(power, n=self.n_pad, axis=1)[:, :self.win_length]
+        norms = np.max(np.abs(autocorr), axis=1, keepdims=True)
+        norms[norms < np.finfo(autocorr.dtype).tiny] = 1.0
+        self._sum += (autocorr / norms).sum(axis=0)
+        self._columns += count
+        self._carry = self._carry[count:]
+
+    def finish(self, total_frames: int) -> float:
+        """Estimate tempo in BPM; `total_frames` is the onset envelope length."""
+        width = self.win_length // 2
+        self._carry = np.concatenate([self._carry, np.linspace(self._last, 0.0, width + 1)[1:]])
+        # Columns past the envelope length come from end padding only and are dropped
+        self._consume(limit=max(0, total_frames - self._columns))
+        if not self._columns:
+            return 0.0
+
+        tempogram = self._sum / self._columns
+        bpms = np.zeros(self.win_length)
+        bpms[0] = np.inf
+        bpms[1:] = 60.0 * self.sr / (self.hop_length * np.arange(1.0, self.win_length))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            logprior = -0.5 * ((np.log2(bpms) - np.log2(self.start_bpm)) / self.std_bpm) ** 2
+        logprior[:int(np.argmax(bpms < self.max_tempo))] = -np.inf
+        return float(bpms[np.argmax(np.log1p(1e6 * tempogram) + logprior)])
+
+class StreamingChroma:
+    """Sums CQT chroma over a sample stream, recomputing a little context around each block."""
+
+    def __init__(self, sr: int, hop_length: int):
+        self.sr = sr
+        self.hop_length = hop_length
+        self.context = int(round(CHROMA_CONTEXT_SECONDS * sr / hop_length)) * hop_length
+        self.profile = np.zeros(12)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._offset = 0      # absolute sample index of _buffer[0]
+        self._next_frame = 0  # absolute index of the next frame to accumulate
+
+    def push(self, samples: np.ndarray, final: bool = False) -> None:
+        self._buffer = np.concatenate([self._buffer, samples])
+        if not final and len(self._buffer) < 3 * self.context:
+            return
+        end = self._offset + len(self._buffer)
+        # Frames near the end wait for more audio unless this is the last block
+        stop = 1 + end // self.hop_length if final else (end - self.context) // self.hop_length
+        if stop > self._next_frame and len(self._buffer):
+            chroma = librosa.feature.chroma_cqt(y=self._buffer, sr=self.sr, hop_length=self.hop_length)
+            first = self._offset // self.hop_length
+            self.profile += chroma[:, self._next_frame - first:stop - first].sum(axis=1)
+            self._next_frame = stop
+
+        keep_from = max(self._offset, self._next_frame * self.hop_length - self.context)
+        self._buffer = self._buffer[keep_from - self._offset:]
+        self._offset = keep_from
+
+class StreamingSpectral:
+    """Per-frame spectral summaries from one shared STFT of the stream.
+
+    Feeds the onset envelope to a StreamingTempo and accumulates mean mel dB
+    (for MFCCs), spectral centroid and rolloff, and per-frame waveform values.
+    """
+
+    def __init__(self, sr: int, n_fft: int, hop_length: int, tempo: StreamingTempo):
+        self.sr = sr
+        self.hop_length = hop_length
+        self.frames = FrameStream(n_fft, hop_length)
+        self.window = scipy.signal.get_window('hann', n_fft, fftbins=True).astype(np.float32)
+        self.mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft)
+        self.freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+        self.tempo = tempo
+        self.count = 0
+        self.mel_db_sum = np.zeros(self.mel_basis.shape[0])
+        self.centroid_sum = 0.0
+        self.rolloff_sum = 0.0
+        self.frame_levels = []
+        # power_to_db's floor is top_db below the loudest frame; the stream floors at
+        # the loudest so far, which agrees once the loud part of the track has played
+        self.top_db = 80.0
+        self._max_db = -np.inf
+        self._previous_mel = None
+        # Matches onset_strength's leading zeros for lag 1 and centred frames;
+        # it truncates to the frame count, so as many trailing values are held back
+        self._onset_prefix = 1 + n_fft // (2 * hop_length)
+        self._onset_pending = np.zeros(0)
+
+    def push(self, samples: np.ndarray, final: bool = False) -> None:
+        frames = self.frames.push(samples, final)
+        if not len(frames):
+            return
+        magnitude = np.abs(np.fft.rfft(frames * self.window, axis=1)).T
+        mel_db = librosa.power_to_db(self.mel_basis @ magnitude ** 2, top_db=None)
+        self._max_db = max(self._max_db, float(mel_db.max()))
+        mel_db = np.maximum(mel_db, self._max_db - self.top_db)
+
+        self.count += magnitude.shape[1]
+        self.mel_db_sum += mel_db.sum(axis=1)
+        self.frame_levels.append(mel_db.mean(axis=0).astype(np.float32))
+
+        total = magnitude.sum(axis=0)
+        safe = np.where(total > 0, total, 1.0)
+        self.centroid_sum += float((self.freqs @ magnitude / safe).sum())
+        cumulative = np.cumsum(magnitude, axis=0)
+        threshold = 0.85 * cumulative[-1]
+        self.rolloff_sum += float(self.freqs[np.argmax(cumulative >= threshold, axis=0)].sum())
+
+        previous = mel_db[:, :1] if self._previous_mel is None else self._previous_mel
+        # Median across bands, as beat_track's onset envelope (and FeatureContext's)
+        onset = np.median(np.maximum(0.0, np.diff(np.concatenate([previous, mel_db], axis=1), axis=1)), axis=0)
+        if self._previous_mel is None:
+            onset = np.concatenate([np.zeros(self._onset_prefix), onset[1:]])
+        self._previous_mel = mel_db[:, -1:]
+        onset = np.concatenate([self._onset_pending, onset])
+        held = min(len(onset), self._onset_prefix - 1)
+        self._onset_pending = onset[len(onset) - held:]
+        self.tempo.push(onset[:len(onset) - held])
+
+    def finish(self) -> None:
+        self.push(np.zeros(0, dtype=np.float32), final=True)
+
+    @property
+    def mfcc_mean(self) -> np.ndarray:
+        # The DCT is linear, so the mean of per-frame MFCCs is the DCT of the mean mel dB frame
+        return scipy.fft.dct(self.mel_db_sum / max(1, self.count), type=2, norm='ortho')[:20]
+
+def analyze_stream(path: str, sr: int = 22050, n_fft: int = 2048, hop_length: int = 512) -> Dict[str, Any]:
+    """Analyze a file block by block with memory bounded by the block size.
+
+    Returns tempo, chroma key profile, MFCC and spectral means, per-frame
+    waveform levels, loudness and a waveform peak pyramid. Besides one block
+    of audio, memory grows only with the small per-frame summaries.
+    """
+    tempo = StreamingTempo(sr, hop_length)
+    spectral = StreamingSpectral(sr, n_fft, hop_length, tempo)
+    chroma = StreamingChroma(sr, hop_length)
+    peaks = PeakBuilder(sr)
+    samples = 0
+    sum_squares = 0.0
+    peak = 0.0
+    crossings = 0
+    last_sign = None
+
+    for block in iter_audio_blocks(path, sr):
+        samples += len(block)
+        sum_squares += float(np.dot(block, block))
+        if len(block):
+            peak = max(peak, float(np.max(np.abs(block))))
+            signs = np.signbit(block)
+            crossings += int(np.count_nonzero(signs[1:] != signs[:-1]))
+            if last_sign is not None and signs[0] != last_sign:
+                crossings += 1
+            last_sign = signs[-1]
+        spectral.push(block)
+        chroma.push(block)
+        peaks.add(block)
+
+    spectral.finish()
+    chroma.push(np.zeros(0, dtype=np.float32), final=True)
+
+    levels = np.concatenate(spectral.frame_levels) if spectral.frame_levels else np.zeros(0, dtype=np.float32)
+    rms = np.sqrt(sum_squares / samples) if samples else 0.0
+    return {
+        'duration': samples / sr,
+        'bpm': tempo.finish(spectral.count),
+        'key_profile': chroma.profile,
+        'mfcc_mean': spectral.mfcc_mean,
+        'centroid_mean': spectral.centroid_sum / max(1, spectral.count),
+        'rolloff_mean': spectral.rolloff_sum / max(1, spectral.count),
+        'zcr_mean': crossings / samples if samples else 0.0,
+        'frame_levels': levels,
+        'loudness': {
+            'rms_db': float(20 * np.log10(max(rms, 1e-10))),
+            'peak_db': float(20 * np.log10(max(peak, 1e-10)))
+        },
+        'pyramid': peaks.finish()
+    }
+
+def stream_pyramid(path: str, sr: int = 22050) -> Dict[str, Any]:
+    """Waveform peak pyramid of a file without loading it whole."""
+    peaks = PeakBuilder(sr)
+    for block in iter_audio_blocks(path, sr):
+        peaks.add(block)
+    return peaks.finish()
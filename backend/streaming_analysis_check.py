@@ -0,0 +1,65 @@
+"""Compare the streaming analysis path against the full-load path on local files.
+
+For each file, runs both paths regardless of duration, reports peak traced
+memory for each, and checks that tempo, key, genre, duration and waveform
+agree within tolerance.
+
+Usage: python streaming_analysis_check.py FILE [FILE ...] [--bpm-tolerance 0.02]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from audio_processing import _analyze_loaded, _analyze_streamed
+
+def measure(func, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(path, None)[0]
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming vs full-load analysis comparison")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--bpm-tolerance', type=float, default=0.02, help="relative tempo tolerance")
+    parser.add_argument('--waveform-tolerance', type=float, default=0.01, help="mean absolute waveform difference")
+    args = parser.parse_args()
+
+    failures = 0
+    for path in args.files:
+        full, full_seconds, full_mb = measure(_analyze_loaded, path)
+        streamed, stream_seconds, stream_mb = measure(_analyze_streamed, path)
+
+        frames = min(len(full['waveform']), len(streamed['waveform']))
+        waveform_error = float(np.mean(np.abs(
+            np.asarray(full['waveform'][:frames]) - np.asarray(streamed['waveform'][:frames])
+        ))) if frames else 0.0
+        checks = {
+            'bpm': abs(streamed['bpm'] - full['bpm']) <= args.bpm_tolerance * full['bpm'],
+            'key': streamed['key'] == full['key'],
+            'genre': streamed['genre'] == full['genre'],
+            'duration': abs(streamed['duration'] - full['duration']) < 0.1,
+            'waveform': waveform_error <= args.waveform_tolerance,
+        }
+
+        print(f"{path}")
+        print(f"  full:     {full_seconds:6.1f}s  peak {full_mb:8.1f} MB  "
+              f"bpm {full['bpm']:.1f} key {full['key']} genre {full['genre']}")
+        print(f"  streamed: {stream_seconds:6.1f}s  peak {stream_mb:8.1f} MB  "
+              f"bpm {streamed['bpm']:.1f} key {streamed['key']} genre {streamed['genre']}")
+        print(f"  waveform mean abs diff {waveform_error:.4f}; "
+              + ', '.join(f"{name} {'ok' if ok else 'MISMATCH'}" for name, ok in checks.items()))
+        failures += not all(checks.values())
+
+    if failures:
+        print(f"FAIL: {failures} file(s) outside tolerance")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
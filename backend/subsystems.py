@@ -0,0 +1,168 @@
+import os
+import time
+import asyncio
+import logging
+import importlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Subsystem:
+    """A router whose module (and its heavy dependencies) is imported on demand"""
+    name: str
+    module: str
+    path_prefix: str
+    mount_prefix: str = "/api"
+    state: str = "cold"  # cold, loading, warm, failed
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+# Routers that can be mounted and the URL prefix each one serves. None are
+# mounted unless listed in ENABLED_SUBSYSTEMS (see enabled_subsystems).
+SUBSYSTEMS = [
+    Subsystem("memory", "app.routers.memory", "/api/memory"),
+    Subsystem("research", "app.routers.research", "/api/research"),
+    Subsystem("environmental", "app.routers.environmental", "/api/environmental"),
+    Subsystem("intelligence", "app.routers.intelligence", "/api/intelligence"),
+    Subsystem("autonomous", "app.routers.autonomous", "/api/autonomous"),
+    Subsystem("self_modification", "app.routers.self_modification", "/api/self-modification"),
+    Subsystem("api_integration", "app.routers.api_integration", "/api/api-integration"),
+    Subsystem("email", "app.routers.comms_email", "/api/email"),
+    Subsystem("sms", "app.routers.comms_sms", "/api/sms"),
+    Subsystem("calendar", "app.routers.comms_calendar", "/api/calendar"),
+    Subsystem("social", "app.routers.comms_social", "/api/social"),
+    Subsystem("whatsapp", "app.routers.comms_whatsapp", "/api/whatsapp"),
+    Subsystem("youtube_music", "youtube_music", "/api/youtube", mount_prefix="/api/youtube"),
+]
+
+def enabled_subsystems(subsystems: List[Subsystem]) -> List[Subsystem]:
+    """The subsystems allowed by ENABLED_SUBSYSTEMS, a comma-separated list of names.
+
+    Empty (the default) mounts nothing, so the API exposes only the routes
+    main.py defines itself; "all" enables every subsystem.
+    """
+    setting = os.getenv("ENABLED_SUBSYSTEMS", "").strip().lower()
+    if setting == "all":
+        return list(subsystems)
+    names = {name.strip() for name in setting.split(",") if name.strip()}
+    known = {subsystem.name for subsystem in subsystems}
+    for name in sorted(names - known):
+        logger.warning(f"Unknown subsystem {name} in ENABLED_SUBSYSTEMS")
+    return [subsystem for subsystem in subsystems if subsystem.name in names]
+
+class SubsystemRegistry:
+    """Mounts routers lazily: on the first request under their prefix, or from a background warm-up."""
+
+    def __init__(self, app: FastAPI, subsystems: List[Subsystem]):
+        self.app = app
+        self.subsystems = {subsystem.name: subsystem for subsystem in subsystems}
+        self._locks = {name: asyncio.Lock() for name in self.subsystems}
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    def match(self, path: str) -> List[Subsystem]:
+        """Return the subsystems that serve a request path."""
+        return [
+            subsystem for subsystem in self.subsystems.values()
+            if path == subsystem.path_prefix or path.startswith(subsystem.path_prefix + "/")
+        ]
+
+    async def ensure_loaded(self, name: str) -> bool:
+        """Import and mount a subsystem if it is not mounted yet.
+
+        A subsystem that failed to import is not retried until restart, so a
+        missing dependency does not cost an import attempt on every request.
+        """
+        subsystem = self.subsystems[name]
+        if subsystem.state in ("warm", "failed"):
+            return subsystem.state == "warm"
+
+        async with self._locks[name]:
+            if subsystem.state in ("warm", "failed"):
+                return subsystem.state == "warm"
+
+            subsystem.state = "loading"
+            start = time.perf_counter()
+            try:
+                # Imports can take seconds (TensorFlow, librosa, yfinance); keep them off the event loop
+                module = await asyncio.to_thread(importlib.import_module, subsystem.module)
+                router = module.router
+                self.app.include_router(router, prefix=subsystem.mount_prefix)
+                self.app.openapi_schema = None
+
+                # Startup handlers of a router mounted after app startup would otherwise never run
+                for handler in router.on_startup:
+                    result = handler()
+                    if asyncio.iscoroutine(result):
+                        await result
+
+                subsystem.state = "warm"
+                subsystem.error = None
+                logger.info(f"Subsystem {name} warm in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                subsystem.state = "failed"
+                subsystem.error = str(e)
+                logger.error(f"Error loading subsystem {name}: {str(e)}")
+            finally:
+                subsystem.load_seconds = time.perf_counter() - start
+
+        return subsystem.state == "warm"
+
+    async def warm_up(self, names: Optional[List[str]] = None):
+        """Load subsystems one after another in the background."""
+        for name in names or list(self.subsystems):
+            if name in self.subsystems:
+                await self.ensure_loaded(name)
+
+    def start_warm_up(self):
+        """Schedule background warm-up according to WARMUP_SUBSYSTEMS.
+
+        "none" (default) leaves everything to first use, "all" warms every
+        enabled subsystem, otherwise a comma-separated list of subsystem names.
+        """
+        setting = os.getenv("WARMUP_SUBSYSTEMS", "none").strip().lower()
+        if setting == "none":
+            return
+        names = None if setting == "all" else [name.strip() for name in setting.split(",")]
+        self._warm_up_task = asyncio.create_task(self.warm_up(names))
+
+    async def shutdown(self):
+        """Run the shutdown handlers of every mounted router."""
+        if self._warm_up_task:
+            self._warm_up_task.cancel()
+        for name, subsystem in self.subsystems.items():
+            if subsystem.state != "warm":
+                continue
+            try:
+                for handler in importlib.import_module(subsystem.module).router.on_shutdown:
+                    result = handler()
+                    if asyncio.iscoroutine(result):
+                        await result
+            except Exception as e:
+                logger.error(f"Error shutting down subsystem {name}: {str(e)}")
+
+    def status(self) -> Dict[str, Any]:
+        """Report which subsystems are warm."""
+        return {
+            name: {
+                "state": subsystem.state,
+                "load_seconds": subsystem.load_seconds,
+                "error": subsystem.error
+            }
+            for name, subsystem in self.subsystems.items()
+        }
+
+    def middleware(self):
+        """HTTP middleware that loads a cold subsystem before routing its first request."""
+        async def load_on_first_use(request, call_next):
+            for subsystem in self.match(request.url.path):
+                if not await self.ensure_loaded(subsystem.name):
+                    return JSONResponse(
+                        status_code=503,
+                        content={"detail": f"Subsystem {subsystem.name} unavailable: {subsystem.error}"}
+                    )
+            return await call_next(request)
+        return load_on_first_use
@@ -0,0 +1,175 @@
+import os
+import json
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+PEAKS_DIR = Path(os.getenv('PEAKS_DIR', 'cache/peaks'))
+
+# Samples summarised by one level-0 entry; level k covers BASE_BLOCK * 2**k samples
+BASE_BLOCK = 256
+
+# Peaks are stored as int16 columns (min, max, rms) scaled from [-1, 1]
+SCALE = 32767
+
+class PeakBuilder:
+    """Builds a min/max/RMS peak pyramid from audio fed in arbitrary-sized chunks.
+
+    Only level 0 (one entry per BASE_BLOCK samples) is accumulated while
+    audio arrives; coarser power-of-two levels are derived from it at the end.
+    """
+
+    def __init__(self, sr: int, base_block: int = BASE_BLOCK):
+        self.sr = sr
+        self.base_block = base_block
+        self.samples = 0
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._mins: List[np.ndarray] = []
+        self._maxs: List[np.ndarray] = []
+        self._squares: List[np.ndarray] = []
+        self._counts: List[np.ndarray] = []
+
+    def add(self, chunk: np.ndarray) -> None:
+        """Feed the next mono samples."""
+        self.samples += len(chunk)
+        data = np.concatenate([self._remainder, np.asarray(chunk, dtype=np.float32)])
+        whole = len(data) - len(data) % self.base_block
+        self._remainder = data[whole:]
+        if whole:
+            self._append(data[:whole])
+
+    def _append(self, data: np.ndarray) -> None:
+        starts = np.arange(0, len(data), self.base_block)
+        self._mins.append(np.minimum.reduceat(data, starts))
+        self._maxs.append(np.maximum.reduceat(data, starts))
+        self._squares.append(np.add.reduceat(data.astype(np.float64) ** 2, starts))
+        self._counts.append(np.diff(np.append(starts, len(data))))
+
+    def finish(self) -> Dict[str, Any]:
+        """Return the pyramid as {'sr', 'base_block', 'samples', 'levels': [(min, max, rms), ...]}."""
+        if len(self._remainder):
+            self._append(self._remainder)
+            self._remainder = np.zeros(0, dtype=np.float32)
+        mins = np.concatenate(self._mins) if self._mins else np.zeros(1, np.float32)
+        maxs = np.concatenate(self._maxs) if self._maxs else np.zeros(1, np.float32)
+        squares = np.concatenate(self._squares) if self._squares else np.zeros(1)
+        counts = np.concatenate(self._counts) if self._counts else np.ones(1, np.int64)
+
+        levels = [(mins, maxs, np.sqrt(squares / counts))]
+        while len(mins) > 1:
+            pairs = np.arange(0, len(mins), 2)
+            mins = np.minimum.reduceat(mins, pairs)
+            maxs = np.maximum.reduceat(maxs, pairs)
+            squares = np.add.reduceat(squares, pairs)
+            counts = np.add.reduceat(counts, pairs)
+            levels.append((mins, maxs, np.sqrt(squares / counts)))
+
+        return {'sr': self.sr, 'base_block': self.base_block, 'samples': self.samples, 'levels': levels}
+
+def build_pyramid(y: np.ndarray, sr: int) -> Dict[str, Any]:
+    """Peak pyramid of a fully loaded signal."""
+    builder = PeakBuilder(sr)
+    builder.add(y)
+    return builder.finish()
+
+def _paths(key: str) -> Tuple[Path, Path]:
+    return PEAKS_DIR / f"{key}.npy", PEAKS_DIR / f"{key}.json"
+
+def save_pyramid(key: str, pyramid: Dict[str, Any]) -> None:
+    """Store a pyramid as one int16 (N, 3) array plus a JSON index of level offsets."""
+    PEAKS_DIR.mkdir(parents=True, exist_ok=True)
+    data_path, meta_path = _paths(key)
+    levels, offset, columns = [], 0, []
+    for k, (mins, maxs, rms) in enumerate(pyramid['levels']):
+        columns.append(np.stack([mins, maxs, rms], axis=1))
+        levels.append({'offset': offset, 'length': len(mins), 'block': pyramid['base_block'] << k})
+        offset += len(mins)
+    data = np.clip(np.round(np.concatenate(columns) * SCALE), -SCALE, SCALE).astype(np.int16)
+
+    # Write both under temporary names and publish the index last
+    tmp_data = data_path.with_suffix('.tmp.npy')
+    np.save(tmp_data, data)
+    os.replace(tmp_data, data_path)
+    meta = {'sr': pyramid['sr'], 'base_block': pyramid['base_block'], 'samples': pyramid['samples'], 'levels': levels}
+    tmp_meta = meta_path.with_suffix('.tmp')
+    tmp_meta.write_text(json.dumps(meta))
+    os.replace(tmp_meta, meta_path)
+
+def has_pyramid(key: str) -> bool:
+    return _paths(key)[1].exists()
+
+class PeakReader:
+    """Serves waveform slices from stored pyramids via memory-mapped files."""
+
+    def __init__(self, max_open: int = 64):
+        self.max_open = max_open
+        self._open: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, key: str) -> Tuple[Dict[str, Any], np.ndarray]:
+        with self._lock:
+            if key in self._open:
+                self._open.move_to_end(key)
+                return self._open[key]
+        data_path, meta_path = _paths(key)
+        entry = (json.loads(meta_path.read_text()), np.load(data_path, mmap_mode='r'))
+        with self._lock:
+            self._open[key] = entry
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return entry
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._open.pop(key, None)
+
+    def slice(self, key: str, start: float, end: Optional[float], width: int) -> Dict[str, Any]:
+        """Min/max/RMS for `width` pixels covering [start, end) seconds.
+
+        Picks the coarsest level whose blocks are no wider than one pixel,
+        so at most about 2 * width stored entries are read for any zoom.
+        """
+        meta, data = self._load(key)
+        sr, duration = meta['sr'], meta['samples'] / meta['sr']
+        end = duration if end is None else min(end, duration)
+        start = max(0.0, start)
+        if end <= start or width <= 0:
+            raise ValueError("Empty time range or width")
+
+        samples_per_pixel = (end - start) * sr / width
+        level_index = 0
+        for k, level in enumerate(meta['levels']):
+            if level['block'] <= samples_per_pixel:
+                level_index = k
+        level = meta['levels'][level_index]
+        block = level['block']
+
+        first = int(start * sr) // block
+        last = min(level['length'], -(-int(end * sr) // block))
+        entries = np.asarray(data[level['offset'] + first:level['offset'] + last], dtype=np.float32) / SCALE
+
+        if len(entries) > width:
+            # Group consecutive blocks into pixels
+            edges = (np.arange(width) * len(entries)) // width
+            mins = np.minimum.reduceat(entries[:, 0], edges)
+            maxs = np.maximum.reduceat(entries[:, 1], edges)
+            counts = np.diff(np.append(edges, len(entries)))
+            rms = np.sqrt(np.add.reduceat(entries[:, 2] ** 2, edges) / counts)
+        else:
+            # Zoomed in past level-0 resolution: one point per stored block
+            mins, maxs, rms = entries[:, 0], entries[:, 1], entries[:, 2]
+
+        return {
+            'start': first * block / sr,
+            'end': min(last * block / sr, duration),
+            'duration': duration,
+            'level': level_index,
+            'samples_per_point': block * len(entries) / max(1, len(mins)),
+            'min': np.round(mins, 4).tolist(),
+            'max': np.round(maxs, 4).tolist(),
+            'rms': np.round(rms, 4).tolist()
+        }
+
+peak_reader = PeakReader()
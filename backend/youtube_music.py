@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import yt_dlp
@@ -6,9 +7,12 @@ import os
 import json
 import asyncio
 from pathlib import Path
-import librosa
-import numpy as np
-from .audio_processing import extract_bpm, detect_key, analyze_genre
+from audio_processing import process_audio_file, analyzer_fingerprint, build_track_peaks
+from waveform_peaks import has_pyramid, peak_reader
+from analysis_cache import get_analysis_cache
+from analysis_pool import analysis_pool, QueueFullError
+from download_manager import DownloadManager
+from batch_jobs import BatchManager
 
 router = APIRouter()
 
@@ -21,6 +25,10 @@ class DownloadRequest(BaseModel):
 class ProcessRequest(BaseModel):
     videoId: str
 
+class BatchRequest(BaseModel):
+    videoIds: List[str] = []
+    playlist: Optional[str] = None
+
 # Configure yt-dlp options
 ydl_opts = {
     'format': 'bestaudio/best',
@@ -37,6 +45,9 @@ ydl_opts = {
 CACHE_DIR = Path('cache/youtube')
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+download_manager = DownloadManager(CACHE_DIR, ydl_opts)
+batch_manager = BatchManager(download_manager, analysis_pool, process_audio_file)
+
 @router.post("/search")
 async def search_tracks(request: SearchRequest):
     try:
@@ -67,7 +78,7 @@ async def search_tracks(request: SearchRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/download")
-async def download_track(request: DownloadRequest, background_tasks: BackgroundTasks):
+async def download_track(request: DownloadRequest):
     try:
         video_id = request.videoId
         output_path = CACHE_DIR / f"{video_id}.mp3"
@@ -75,23 +86,34 @@ async def download_track(request: DownloadRequest, background_tasks: BackgroundT
         if output_path.exists():
             return {'status': 'already_downloaded', 'path': str(output_path)}
 
-        # Configure yt-dlp for this specific download
-        download_opts = {
-            **ydl_opts,
-            'outtmpl': str(output_path),
-        }
-
-        # Start download in background
-        background_tasks.add_task(
-            download_with_progress,
-            video_id,
-            download_opts
-        )
+        # Starts a background download, or joins the one already running for this video
+        download_manager.start(video_id)
 
         return {'status': 'downloading', 'videoId': video_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/download/{video_id}")
+async def download_status(video_id: str):
+    return download_manager.state(video_id)
+
+@router.get("/download/{video_id}/progress")
+async def download_progress(video_id: str, request: Request):
+    """Stream a download's progress as server-sent events until it finishes."""
+    queue = download_manager.subscribe(video_id)
+
+    async def events():
+        try:
+            while True:
+                event = await queue.get()
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+                if event['status'] in ('done', 'error', 'unknown') or await request.is_disconnected():
+                    break
+        finally:
+            download_manager.unsubscribe(video_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @router.post("/process")
 async def process_track(request: ProcessRequest):
     try:
@@ -101,34 +123,141 @@ async def process_track(request: ProcessRequest):
         if not audio_path.exists():
             raise HTTPException(status_code=404, detail="Audio file not found")
 
-        # Load audio file
-        y, sr = librosa.load(str(audio_path))
-
-        # Extract features
-        bpm = extract_bpm(y, sr)
-        key = detect_key(y, sr)
-        genre = analyze_genre(y, sr)
-        
-        # Generate waveform
-        waveform = librosa.feature.melspectrogram(y=y, sr=sr)
-        waveform = librosa.power_to_db(waveform, ref=np.max)
-        waveform = np.mean(waveform, axis=0)
-        waveform = (waveform - waveform.min()) / (waveform.max() - waveform.min())
-        waveform = waveform.tolist()
-
-        return {
-            'bpm': bpm,
-            'key': key,
-            'genre': genre,
-            'waveform': waveform,
-            'tags': [genre.lower()],
-        }
+        # Analysis runs in a worker process; byte-identical tracks analysed
+        # before are answered from the analysis cache
+        return await analysis_pool.run(process_audio_file, str(audio_path))
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/process/jobs")
+async def submit_process_job(request: ProcessRequest):
+    """Queue a track for analysis and return the job id without waiting."""
+    try:
+        audio_path = CACHE_DIR / f"{request.videoId}.mp3"
+        if not audio_path.exists():
+            raise HTTPException(status_code=404, detail="Audio file not found")
+        job = analysis_pool.submit(process_audio_file, str(audio_path))
+        return job.info()
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def download_with_progress(video_id: str, options: dict):
+@router.get("/process/jobs/{job_id}")
+async def get_process_job(job_id: str):
+    job = analysis_pool.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    info = job.info()
+    if job.status == "done":
+        info['result'] = job.future.result()
+    return info
+
+@router.delete("/process/jobs/{job_id}")
+async def cancel_process_job(job_id: str):
+    if job_id not in analysis_pool.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {'cancelled': analysis_pool.cancel(job_id)}
+
+@router.get("/process/pool")
+async def process_pool_status():
+    return analysis_pool.status()
+
+@router.on_event("startup")
+async def resume_batches():
+    # Unfinished batches from before a restart continue where they stopped
+    batch_manager.resume()
+
+@router.on_event("shutdown")
+async def shutdown_workers():
+    await batch_manager.shutdown()
+    await analysis_pool.shutdown()
+
+def playlist_video_ids(playlist: str) -> List[str]:
+    """Video ids of a playlist URL or id, without resolving each video."""
+    url = playlist if playlist.startswith('http') else f"https://www.youtube.com/playlist?list={playlist}"
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'extract_flat': 'in_playlist'}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    return [entry['id'] for entry in info.get('entries') or [] if entry and entry.get('id')]
+
+@router.post("/batch")
+async def create_batch(request: BatchRequest):
+    """Download and analyse a list of videos and/or a playlist as one pipelined job."""
     try:
-        with yt_dlp.YoutubeDL(options) as ydl:
-            ydl.download([f"https://www.youtube.com/watch?v={video_id}"])
+        video_ids = list(request.videoIds)
+        if request.playlist:
+            video_ids += await asyncio.to_thread(playlist_video_ids, request.playlist)
+        if not video_ids:
+            raise HTTPException(status_code=400, detail="No videos to process")
+        return batch_manager.create(video_ids, source=request.playlist)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Download error for {video_id}: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/batch")
+async def list_batches():
+    return {'items': [batch_manager.summary(batch_id) for batch_id in batch_manager.batches]}
+
+@router.get("/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    summary = batch_manager.summary(batch_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return summary
+
+@router.delete("/batch/{batch_id}")
+async def cancel_batch(batch_id: str):
+    if not batch_manager.cancel(batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch_manager.summary(batch_id)
+
+@router.get("/waveform/{video_id}")
+async def waveform_slice(video_id: str, start: float = 0.0, end: Optional[float] = None,
+                         width: int = Query(800, ge=1, le=10000)):
+    """Min/max/RMS peaks for `width` pixels of the track between `start` and `end` seconds."""
+    try:
+        audio_path = CACHE_DIR / f"{video_id}.mp3"
+        if not audio_path.exists():
+            raise HTTPException(status_code=404, detail="Audio file not found")
+
+        key = await asyncio.to_thread(get_analysis_cache().content_hash, str(audio_path))
+        if not has_pyramid(key):
+            # Tracks processed before pyramids existed get them on first view
+            await analysis_pool.run(build_track_peaks, str(audio_path))
+        return peak_reader.slice(key, start, end, width)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analysis-cache")
+async def analysis_cache_stats():
+    try:
+        return {'fingerprint': analyzer_fingerprint(), **get_analysis_cache().stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/analysis-cache")
+async def invalidate_analysis_cache(stale_only: bool = True):
+    """Drop cached analyses: only those from older analyzers, or everything."""
+    try:
+        cache = get_analysis_cache()
+        if stale_only:
+            fingerprint = analyzer_fingerprint()
+            removed = cache.purge_stale({'analyze': fingerprint, 'process': fingerprint})
+        else:
+            removed = cache.invalidate()
+        return {'removed': removed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -11,10 +11,24 @@ import aiohttp
 import librosa
 import numpy as np
 import soundfile as sf
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, Iterator, List, Tuple, Optional
 from datetime import datetime
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, replace
 from base_agent import BaseAgent
+from dj_dsp import flanger, phaser, compressor
+from dj_convolution import convolution_reverb, reverb_impulse_response
+from dj_multiband import BANDS, multiband_compress
+from dj_beat_align import BeatAlignment, ONSET_HOP, align_envelopes, beat_envelope, onset_envelope
+from dj_engine import AudioEngine, effect_chain
+from dj_render import LiveMix, MixEntry, render_mix, warm_up, shutdown_workers
+from dj_track_db import TrackDatabase, AUDIO_EXTENSIONS, waveform_overview
+from dj_analysis_pool import AnalysisPool, AnalysisOutcome, AnalysisProgress
+from dj_pcm_cache import get_pcm_cache
+from dj_playlist_planner import PlaylistPlanner
+from dj_stem_queue import StemQueue, ON_DEMAND, PREFETCH
+from dj_classify import CLASSIFIER_BATCH, FEATURE_NAMES, classification_features, get_track_classifier
+from dj_rhythm import Rhythm, analyze_rhythm, beat_markers, danceability, sections
 import torch
 import torchaudio
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
@@ -29,6 +43,7 @@ from pydub import AudioSegment
 import threading
 import queue
 import time
+import tempfile
 import spleeter
 from spleeter.separator import Separator
 import tensorflow as tf
@@ -50,6 +65,11 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Onset envelopes kept in memory for beat alignment, most recently used tracks
+ONSET_ENVELOPES_KEPT = 64
+# Beat alignments below this confidence are not used to place tracks
+ALIGN_MIN_CONFIDENCE = float(os.getenv('DJ_ALIGN_MIN_CONFIDENCE', '0.5'))
+
 @dataclass
 class Effect:
     """Audio effect configuration"""
@@ -74,6 +94,8 @@ class TrackInfo:
     sections: List[Dict[str, Any]]
     features: Dict[str, Any]
     harmonic_mix_key: Optional[str] = None
+    duration: Optional[float] = None
+    feature_vector: Optional[np.ndarray] = None  # classifier input, see dj_classify.FEATURE_NAMES
 
 @dataclass
 class Stem:
@@ -115,13 +137,164 @@ class BeatGrid:
     markers: List[Dict[str, Any]]
     automation: List[Dict[str, Any]]
 
-class DJAgent(BaseAgent):
+class TrackAnalysis:
+    """Track analysis shared by DJAgent and the library analysis workers.
+
+    Needs only `sample_rate` (and the classifier models, when loaded), so
+    worker processes can analyse files without building a whole agent.
+    """
+
+    def _analyze_file(self, file_path: str, classify: bool = True) -> TrackInfo:
+        """Analyze a single track for DJ mixing"""
+        try:
+            # Load audio file
+            y, sr = librosa.load(file_path, sr=self.sample_rate)
+            
+            # Extract basic features; beats, tempo and energy come from one rhythm pass
+            rhythm = analyze_rhythm(y, sr)
+            S = np.abs(librosa.stft(y))
+            key = librosa.feature.tonnetz(y=y, sr=sr)
+            
+            # Extract advanced features using Essentia
+            pool = Pool()
+            w = es.Windowing(type='blackmanharris62')
+            spectrum = es.Spectrum()
+            mfcc = es.MFCC()
+            
+            for frame in es.FrameGenerator(y, frameSize=2048, hopSize=512):
+                spec = spectrum(w(frame))
+                mfcc_bands, mfcc_coeffs = mfcc(spec)
+                pool.add('lowlevel.mfcc', mfcc_coeffs)
+            
+            # Analyze sections
+            sections = self._analyze_sections(y, sr, rhythm, S)
+            
+            # Get genre and mood; library scans classify many tracks per batch instead
+            feature_vector = classification_features(y, sr, S)
+            genre, mood = self._classify([feature_vector])[0] if classify else ("unknown", "unknown")
+            
+            # Calculate energy and danceability
+            energy = np.mean(rhythm.rms)
+            danceability = self._calculate_danceability(
+                y, sr, rhythm, float(feature_vector[FEATURE_NAMES.index("spectral_centroid")]))
+            
+            return TrackInfo(
+                file_path=file_path,
+                title=os.path.basename(file_path),
+                artist="Unknown",  # Would need metadata extraction
+                bpm=rhythm.tempo,
+                key=self._get_key_name(key),
+                energy=float(energy),
+                danceability=float(danceability),
+                mood=mood,
+                genre=genre,
+                waveform=y,
+                beat_frames=rhythm.beat_frames,
+                sections=sections,
+                features=pool.descriptorNames(),
+                duration=len(y) / sr,
+                feature_vector=feature_vector
+            )
+        except Exception as e:
+            logger.error(f"Error analyzing track {file_path}: {str(e)}")
+            raise
+
+    def _analyze_sections(self, y: np.ndarray, sr: int, rhythm: Optional[Rhythm] = None,
+                          S: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Analyze track sections (intro, verse, chorus, etc.)"""
+        try:
+            # Beat-synchronous structural segmentation; energy and tempo come from the rhythm
+            rhythm = rhythm if rhythm is not None else analyze_rhythm(y, sr)
+            S = S if S is not None else np.abs(librosa.stft(y, hop_length=rhythm.hop_length))
+            return sections(S, rhythm)
+        except Exception as e:
+            logger.error(f"Error analyzing sections: {str(e)}")
+            return []
+
+    def _classify(self, feature_vectors: List[np.ndarray]) -> List[Tuple[str, str]]:
+        """Classify (genre, mood) of tracks from their feature vectors, in batches"""
+        try:
+            classifier = get_track_classifier()
+            if classifier is None or not len(feature_vectors):
+                return [("unknown", "unknown")] * len(feature_vectors)
+            return classifier.classify(np.stack([np.asarray(v, dtype=np.float32) for v in feature_vectors]))
+        except Exception as e:
+            logger.error(f"Error classifying tracks: {str(e)}")
+            return [("unknown", "unknown")] * len(feature_vectors)
+
+    def _calculate_danceability(self, y: np.ndarray, sr: int, rhythm: Optional[Rhythm] = None,
+                                spectral_centroid: Optional[float] = None) -> float:
+        """Calculate track danceability"""
+        try:
+            rhythm = rhythm if rhythm is not None else analyze_rhythm(y, sr)
+            if spectral_centroid is None:
+                spectral_centroid = float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)))
+            return danceability(rhythm, spectral_centroid)
+        except Exception as e:
+            logger.error(f"Error calculating danceability: {str(e)}")
+            return 0.0
+
+    def _get_key_name(self, key_features: np.ndarray) -> str:
+        """Convert key features to musical key name"""
+        try:
+            # Map key features to musical keys
+            key_map = {
+                0: "C", 1: "C#", 2: "D", 3: "D#",
+                4: "E", 5: "F", 6: "F#", 7: "G",
+                8: "G#", 9: "A", 10: "A#", 11: "B"
+            }
+            
+            # Get most prominent key
+            key_idx = np.argmax(np.mean(key_features, axis=1))
+            return key_map[key_idx % 12]
+        except Exception as e:
+            logger.error(f"Error getting key name: {str(e)}")
+            return "unknown"
+
+    @staticmethod
+    def _track_record(track: TrackInfo) -> Dict[str, Any]:
+        """A track as stored in the track database, with a waveform overview instead of its PCM"""
+        record = vars(track).copy()
+        record["bpm"] = float(np.atleast_1d(track.bpm)[0])
+        record["waveform"] = waveform_overview(track.waveform)
+        record["features"] = list(track.features)
+        return record
+
+    @staticmethod
+    def _track_from_record(record: Dict[str, Any]) -> TrackInfo:
+        fields = TrackInfo.__dataclass_fields__
+        return TrackInfo(**{name: value for name, value in record.items() if name in fields})
+
+class TrackAnalyzer(TrackAnalysis):
+    """Stand-alone track analysis for library analysis worker processes.
+
+    It has none of the agent's models: genre and mood are classified by
+    the parent.
+    """
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+
+_worker_analyzer: Optional[TrackAnalyzer] = None
+
+def _init_analysis_worker(sample_rate: int) -> None:
+    global _worker_analyzer
+    _worker_analyzer = TrackAnalyzer(sample_rate)
+
+def _analyze_in_worker(file_path: str) -> Dict[str, Any]:
+    # Workers return the stored form, so the full PCM never crosses the pipe. Genre and
+    # mood are left to the parent, which classifies finished tracks in batches
+    return TrackAnalysis._track_record(_worker_analyzer._analyze_file(file_path, classify=False))
+
+class DJAgent(TrackAnalysis, BaseAgent):
     def __init__(self):
         super().__init__("dj")
         self.current_playlist: List[TrackInfo] = []
+        self.current_mix: Optional[LiveMix] = None
         self.current_track_index = 0
         self.is_mixing = False
         self.mix_queue: List[Tuple[TrackInfo, float]] = []  # (track, start_time)
+        self.crossfade_duration = 8  # seconds
         
         # Effects processing
         self.effects = {
@@ -140,8 +313,6 @@ class DJAgent(BaseAgent):
         
         # Recording setup
         self.recording = False
-        self.record_buffer = queue.Queue()
-        self.record_thread = None
         
         # Load AI models
         self.load_models()
@@ -154,8 +325,27 @@ class DJAgent(BaseAgent):
         # Initialize audio output
         sd.default.samplerate = self.sample_rate
         sd.default.channels = 2
+
+        # Block-based playback engine; effects run live inside it
+        self.engine = AudioEngine(self.sample_rate, block_size=self.buffer_size, channels=2,
+                                  processors=effect_chain(self.effects, self.sample_rate))
+
+        # Analysed tracks persist between runs; the library is loaded from them on start
+        self.track_db = TrackDatabase()
+        self.library: Dict[str, TrackInfo] = {}
+        self.analysis_pool: Optional[AnalysisPool] = None
+        self.analysis_progress: Dict[str, Any] = {}
+        # Bumped whenever self.library changes; the playlist graph is rebuilt for a new version
+        self.library_version = 0
+        self._playlist_planner: Optional[Tuple[int, PlaylistPlanner, List[TrackInfo]]] = None
+        self._planner_lock = threading.Lock()
+
+        # Decoded PCM shared with the mix preparation workers
+        self.pcm_cache = get_pcm_cache()
         
         # Beat matching
+        self._onset_envelopes: Dict[str, np.ndarray] = {}  # by file path, oldest first
+        self._onset_envelopes_lock = threading.Lock()  # mixes are planned in worker threads
         self.beat_grid = []
         self.current_beat = 0
         self.beat_sync = False
@@ -179,6 +369,9 @@ class DJAgent(BaseAgent):
         
         # Initialize stem separator
         self.separator = Separator('spleeter:6stems')
+        # Stems of whole tracks are separated in the background and cached on disk
+        self.stem_queue = StemQueue('spleeter:6stems')
+        self.prefetch_stems = os.getenv('DJ_STEM_PREFETCH', 'true').lower() == 'true'
         
         # Initialize audio processing
         self.setup_audio_processing()
@@ -204,6 +397,24 @@ class DJAgent(BaseAgent):
         # Initialize advanced features
         self.setup_advanced_features()
 
+    async def start(self):
+        """Start the agent and warm up the mix preparation workers"""
+        await super().start()
+        self.library = await asyncio.to_thread(self._load_library)
+        self.library_version += 1
+        logger.info(f"Loaded {len(self.library)} analysed tracks from {self.track_db.path}")
+        self.tasks.append(asyncio.create_task(asyncio.to_thread(self._get_playlist_planner)))
+        self.tasks.append(asyncio.create_task(asyncio.to_thread(warm_up)))
+
+    async def stop(self):
+        """Stop playback and the worker processes, then the agent"""
+        self.engine.stop()
+        shutdown_workers()
+        if self.analysis_pool is not None:
+            self.analysis_pool.close()
+        self.stem_queue.close()
+        await super().stop()
+
     def setup_midi(self):
         """Setup MIDI controllers"""
         try:
@@ -228,16 +439,26 @@ class DJAgent(BaseAgent):
             # Map MIDI controls to effects
             if msg_type == 176:  # Control Change
                 if data1 == 1:  # Mod wheel
-                    self.effects["filter"].parameters["cutoff"] = data2 * 20000.0 / 127.0
+                    self.set_effect_parameter("filter", "cutoff", data2 * 20000.0 / 127.0)
                 elif data1 == 2:  # Volume
                     self.current_volume = data2 / 127.0
+                    self.engine.set_parameter("master", "volume", self.current_volume)
                 elif data1 == 3:  # Reverb
-                    self.effects["reverb"].parameters["wet"] = data2 / 127.0
+                    self.set_effect_parameter("reverb", "wet", data2 / 127.0)
                 elif data1 == 4:  # Delay
-                    self.effects["delay"].parameters["mix"] = data2 / 127.0
+                    self.set_effect_parameter("delay", "mix", data2 / 127.0)
         except Exception as e:
             logger.error(f"Error in MIDI callback: {str(e)}")
 
+    def set_effect_parameter(self, name: str, parameter: str, value: Any):
+        """Change an effect parameter (or "enabled"), live if audio is playing"""
+        effect = self.effects[name]
+        if parameter == "enabled":
+            effect.enabled = bool(value)
+        else:
+            effect.parameters[parameter] = float(value)
+        self.engine.set_parameter(name, parameter, value)
+
     def apply_effects(self, audio: np.ndarray) -> np.ndarray:
         """Apply audio effects to the input signal"""
         try:
@@ -265,89 +486,14 @@ class DJAgent(BaseAgent):
             return audio
 
     def _apply_reverb(self, audio: np.ndarray, params: Dict[str, float]) -> np.ndarray:
-        """Apply reverb effect with improved room simulation and performance optimizations"""
+        """Apply convolution reverb, with the IR in DJ_REVERB_IR or a room built from the parameters"""
         try:
-            # Performance optimization: Use smaller buffer for short audio
-            if len(audio) < self.sample_rate:  # Less than 1 second
-                return self._apply_reverb_fast(audio, params)
-            
-            # Calculate room size in samples (optimized for CPU)
-            room_size = int(params["room_size"] * self.sample_rate)
-            
-            # Create multiple delay lines with optimized sizes
-            delays = [
-                int(room_size * 0.8),  # Main reflection
-                int(room_size * 0.5),  # Early reflection
-                int(room_size * 0.3),  # Secondary reflection
-                int(room_size * 0.2)   # Quick reflection
-            ]
-            
-            # Create damping coefficients with smooth transitions
-            damping = params["damping"]
-            damping_coeffs = [
-                damping * 0.8,  # Main reflection
-                damping * 0.6,  # Early reflection
-                damping * 0.4,  # Secondary reflection
-                damping * 0.2   # Quick reflection
-            ]
-            
-            # Initialize output with pre-allocated array for better performance
-            reverb = np.zeros_like(audio)
-            
-            # Process in chunks for better memory management
-            chunk_size = min(1024 * 64, len(audio))  # 64KB chunks
-            for i in range(0, len(audio), chunk_size):
-                chunk_end = min(i + chunk_size, len(audio))
-                chunk = audio[i:chunk_end]
-                chunk_reverb = np.zeros_like(chunk)
-                
-                # Apply multiple delay lines to chunk
-                for delay, damp in zip(delays, damping_coeffs):
-                    if i + delay < len(audio):
-                        delayed = np.zeros_like(chunk)
-                        delayed[delay:] = chunk[:-delay]
-                        damped = delayed * (1 - damp)
-                        chunk_reverb += damped
-                
-                # Normalize chunk
-                chunk_reverb = chunk_reverb / len(delays)
-                reverb[i:chunk_end] = chunk_reverb
-            
-            # Apply smooth crossfade to prevent artifacts
-            fade_samples = min(256, len(audio) // 10)
-            fade_in = np.linspace(0, 1, fade_samples)
-            fade_out = np.linspace(1, 0, fade_samples)
-            
-            reverb[:fade_samples] *= fade_in
-            reverb[-fade_samples:] *= fade_out
-            
-            # Mix with original signal using smooth transition
-            wet = params["wet"]
-            return wet * reverb + (1 - wet) * audio
-            
+            ir = reverb_impulse_response(self.sample_rate, params["room_size"], params["damping"])
+            return convolution_reverb(audio, ir, params["wet"])
         except Exception as e:
             logger.error(f"Error applying reverb: {str(e)}")
             return audio
 
-    def _apply_reverb_fast(self, audio: np.ndarray, params: Dict[str, float]) -> np.ndarray:
-        """Fast reverb implementation for short audio segments"""
-        try:
-            # Simplified reverb for short audio
-            room_size = int(params["room_size"] * self.sample_rate * 0.5)  # Reduced size
-            delay = np.zeros_like(audio)
-            delay[room_size:] = audio[:-room_size]
-            
-            # Simple damping
-            damped = delay * (1 - params["damping"])
-            
-            # Mix with original
-            wet = params["wet"]
-            return wet * damped + (1 - wet) * audio
-            
-        except Exception as e:
-            logger.error(f"Error applying fast reverb: {str(e)}")
-            return audio
-
     def _apply_delay(self, audio: np.ndarray, params: Dict[str, float]) -> np.ndarray:
         """Apply delay effect"""
         try:
@@ -373,24 +519,7 @@ class DJAgent(BaseAgent):
     def _apply_flanger(self, audio: np.ndarray, params: Dict[str, float]) -> np.ndarray:
         """Apply flanger effect"""
         try:
-            delay = int(0.002 * self.sample_rate)  # 2ms delay
-            rate = params["rate"] * 2  # Hz
-            depth = params["depth"] * 0.002 * self.sample_rate  # samples
-            
-            # Create LFO
-            t = np.arange(len(audio)) / self.sample_rate
-            lfo = depth * np.sin(2 * np.pi * rate * t)
-            
-            # Apply variable delay
-            output = np.zeros_like(audio)
-            for i in range(len(audio)):
-                delay_samples = int(delay + lfo[i])
-                if i >= delay_samples:
-                    output[i] = audio[i] + params["mix"] * audio[i - delay_samples]
-                else:
-                    output[i] = audio[i]
-            
-            return output
+            return flanger(audio, self.sample_rate, params["rate"], params["depth"], params["mix"])
         except Exception as e:
             logger.error(f"Error applying flanger: {str(e)}")
             return audio
@@ -398,22 +527,7 @@ class DJAgent(BaseAgent):
     def _apply_phaser(self, audio: np.ndarray, params: Dict[str, float]) -> np.ndarray:
         """Apply phaser effect"""
         try:
-            rate = params["rate"] * 2  # Hz
-            depth = params["depth"]
-            
-            # Create LFO
-            t = np.arange(len(audio)) / self.sample_rate
-            lfo = depth * np.sin(2 * np.pi * rate * t)
-            
-            # Apply all-pass filter
-            output = np.zeros_like(audio)
-            for i in range(len(audio)):
-                if i > 0:
-                    output[i] = audio[i] + params["mix"] * (audio[i] - output[i-1] * lfo[i])
-                else:
-                    output[i] = audio[i]
-            
-            return output
+            return phaser(audio, self.sample_rate, params["rate"], params["depth"], params["mix"])
         except Exception as e:
             logger.error(f"Error applying phaser: {str(e)}")
             return audio
@@ -421,30 +535,7 @@ class DJAgent(BaseAgent):
     def _apply_compressor(self, audio: np.ndarray, params: Dict[str, float]) -> np.ndarray:
         """Apply compressor effect"""
         try:
-            threshold = params["threshold"]
-            ratio = params["ratio"]
-            attack = params["attack"]
-            release = params["release"]
-            
-            # Calculate gain reduction
-            gain_reduction = np.zeros_like(audio)
-            for i in range(len(audio)):
-                if abs(audio[i]) > threshold:
-                    gain_reduction[i] = (abs(audio[i]) - threshold) * (1 - 1/ratio)
-            
-            # Apply attack and release
-            smoothed_reduction = np.zeros_like(gain_reduction)
-            for i in range(len(gain_reduction)):
-                if i > 0:
-                    if gain_reduction[i] > smoothed_reduction[i-1]:
-                        smoothed_reduction[i] = smoothed_reduction[i-1] + (gain_reduction[i] - smoothed_reduction[i-1]) * attack
-                    else:
-                        smoothed_reduction[i] = smoothed_reduction[i-1] + (gain_reduction[i] - smoothed_reduction[i-1]) * release
-                else:
-                    smoothed_reduction[i] = gain_reduction[i]
-            
-            # Apply gain reduction
-            return audio * (1 - smoothed_reduction)
+            return compressor(audio, params["threshold"], params["ratio"], params["attack"], params["release"])
         except Exception as e:
             logger.error(f"Error applying compressor: {str(e)}")
             return audio
@@ -452,9 +543,9 @@ class DJAgent(BaseAgent):
     def start_recording(self):
         """Start recording the mix"""
         try:
+            # The engine keeps every block it plays from here on
+            self.engine.recorded = deque()
             self.recording = True
-            self.record_thread = threading.Thread(target=self._record_loop)
-            self.record_thread.start()
             logger.info("Recording started")
         except Exception as e:
             logger.error(f"Error starting recording: {str(e)}")
@@ -463,16 +554,12 @@ class DJAgent(BaseAgent):
         """Stop recording and save the mix"""
         try:
             self.recording = False
-            if self.record_thread:
-                self.record_thread.join()
-            
-            # Combine recorded chunks
-            recorded_audio = []
-            while not self.record_buffer.empty():
-                recorded_audio.append(self.record_buffer.get())
-            
+            recorded_audio, self.engine.recorded = self.engine.recorded, None
+
             if recorded_audio:
-                final_audio = np.concatenate(recorded_audio)
+                # Combine recorded blocks
+                final_audio = np.concatenate(list(recorded_audio))
+                os.makedirs("mixes", exist_ok=True)
                 output_path = f"mixes/mix_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
                 sf.write(output_path, final_audio, self.sample_rate)
                 logger.info(f"Recording saved to {output_path}")
@@ -482,17 +569,6 @@ class DJAgent(BaseAgent):
             logger.error(f"Error stopping recording: {str(e)}")
             return ""
 
-    def _record_loop(self):
-        """Recording loop"""
-        try:
-            while self.recording:
-                # Get current audio output
-                if hasattr(self, 'current_audio'):
-                    self.record_buffer.put(self.current_audio)
-                time.sleep(0.1)
-        except Exception as e:
-            logger.error(f"Error in record loop: {str(e)}")
-
     def analyze_harmonic_mix(self, track: TrackInfo) -> str:
         """Analyze track for harmonic mixing"""
         try:
@@ -543,74 +619,134 @@ class DJAgent(BaseAgent):
             return ""
 
     def beat_match(self, track1: TrackInfo, track2: TrackInfo) -> Tuple[float, float]:
-        """Match beats between two tracks"""
+        """Match beats between two tracks: (tempo ratio, offset in seconds)"""
+        alignment = self.align_beats(track1, track2)
+        return alignment.tempo_ratio, alignment.offset
+
+    def align_beats(self, track1: TrackInfo, track2: TrackInfo, max_offset: float = 2.0) -> BeatAlignment:
+        """Align track2 with track1 by cross-correlating their onset envelopes.
+
+        Starts from the BPM ratio and refines it; the offset is accurate to
+        a fraction of an analysis frame. Tracks whose audio cannot be read
+        are aligned on pulses at their detected beats instead; that offset
+        is often a beat or more off, so it is reported with no confidence.
+        """
         try:
-            # Get beat positions
-            beats1 = librosa.frames_to_time(track1.beat_frames, sr=self.sample_rate)
-            beats2 = librosa.frames_to_time(track2.beat_frames, sr=self.sample_rate)
-            
-            # Calculate tempo ratio
-            tempo_ratio = track2.bpm / track1.bpm
-            
-            # Find best alignment
-            best_offset = 0
-            best_score = float('inf')
-            
-            for offset in np.arange(-2, 2, 0.25):
-                aligned_beats2 = beats2 * tempo_ratio + offset
-                score = np.mean(np.abs(beats1 - aligned_beats2[:len(beats1)]))
-                if score < best_score:
-                    best_score = score
-                    best_offset = offset
-            
-            return tempo_ratio, best_offset
+            frame_rate = self.sample_rate / ONSET_HOP
+            tempo_ratio = track2.bpm / track1.bpm if track1.bpm and track2.bpm else 1.0
+            envelopes = [self._onset_envelope(track) for track in (track1, track2)]
+            if any(envelope is None for envelope in envelopes):
+                logger.warning(f"Aligning {track2.file_path} on detected beats, offset not reliable")
+                envelopes = [beat_envelope(librosa.frames_to_time(track.beat_frames, sr=self.sample_rate,
+                                                                  hop_length=ONSET_HOP), frame_rate)
+                             for track in (track1, track2)]
+                alignment = align_envelopes(*envelopes, frame_rate, tempo_ratio, max_offset=max_offset)
+                return replace(alignment, confidence=0.0)
+            return align_envelopes(*envelopes, frame_rate, tempo_ratio, max_offset=max_offset)
         except Exception as e:
             logger.error(f"Error beat matching: {str(e)}")
-            return 1.0, 0.0
-
-    async def _perform_mix(self, track1: TrackInfo, track2: TrackInfo):
-        """Perform a smooth mix between two tracks"""
+            return BeatAlignment(offset=0.0, tempo_ratio=1.0, confidence=0.0)
+
+    def _onset_envelope(self, track: TrackInfo) -> Optional[np.ndarray]:
+        """A track's onset strength per analysis frame, kept for the most recently aligned tracks"""
+        with self._onset_envelopes_lock:
+            envelope = self._onset_envelopes.pop(track.file_path, None)
+        if envelope is None:
+            try:
+                envelope = onset_envelope(self.pcm_cache.load(track.file_path, self.sample_rate), self.sample_rate)
+            except Exception as e:
+                logger.warning(f"No audio to align {track.file_path}: {str(e)}")
+                return None
+        with self._onset_envelopes_lock:
+            self._onset_envelopes[track.file_path] = envelope
+            while len(self._onset_envelopes) > ONSET_ENVELOPES_KEPT:
+                self._onset_envelopes.pop(next(iter(self._onset_envelopes)))
+        return envelope
+
+    async def _perform_mix(self, track1: TrackInfo, track2: TrackInfo, output_path: Optional[str] = None):
+        """Perform a smooth mix between two tracks, or render it to `output_path`"""
+        return await self._mix_tracks([track1, track2], output_path)
+
+    def _plan_mix(self, tracks: List[TrackInfo]) -> List[MixEntry]:
+        """Place tracks on a timeline, each crossfading into the next at its mix point"""
+        return list(self._plan_entries(tracks))
+
+    def _plan_entries(self, tracks: List[TrackInfo]) -> Iterator[MixEntry]:
+        """`_plan_mix` one entry at a time, so a live mix can plan as it plays.
+
+        Each entry is yielded once the next track is placed, since placing
+        it moves the entry's fade-out onto the beat.
+        """
+        previous: Optional[MixEntry] = None
+        for i, track in enumerate(tracks):
+            start, rate = 0.0, 1.0
+            if previous is not None:
+                ratio = self._place_on_beat(tracks[i - 1], track, previous)
+                if ratio is None:
+                    ratio = track.bpm / tracks[i - 1].bpm if track.bpm and tracks[i - 1].bpm else 1.0
+                start = previous.fade_out_start
+                # Time t of this track lands at t * ratio on the previous one, so it is stretched
+                # at 1 / ratio of the previous track's rate; every track plays at the first one's tempo
+                rate = previous.tempo_ratio / ratio
+                yield previous
+            entry = MixEntry(track.file_path, start=start, tempo_ratio=rate,
+                             fade_in=self.crossfade_duration if i else 0.0)
+            if i + 1 < len(tracks):
+                # Stretched at rate r, time t of the track plays at t / r
+                entry.fade_out_start = start + self._find_mix_point(track) / rate
+                entry.fade_out = self.crossfade_duration
+            previous = entry
+        if previous is not None:
+            yield previous
+
+    def _place_on_beat(self, outgoing: TrackInfo, track: TrackInfo, entry: MixEntry) -> Optional[float]:
+        """Move `entry`'s fade-out (where `track` starts) onto a beat the two tracks share.
+
+        Returns the tempo ratio of the alignment, or None when it is not
+        confident enough to use.
+        """
+        alignment = self.align_beats(outgoing, track)
+        if alignment.confidence < ALIGN_MIN_CONFIDENCE:
+            logger.warning(f"Beat alignment of {track.file_path} not confident ({alignment.confidence:.2f}), "
+                           f"mixing on tempo only")
+            return None
+        beats = librosa.frames_to_time(outgoing.beat_frames, sr=self.sample_rate, hop_length=ONSET_HOP)
+        if len(beats) > 1:
+            # Started `offset` seconds into the outgoing track, the track's beats fall `phase` after
+            # the outgoing beats; keep that phase against the detected beat nearest the mix point
+            phase = (alignment.offset - beats[0]) % float(np.median(np.diff(beats[:16])))
+            mix_point = (entry.fade_out_start - entry.start) * entry.tempo_ratio
+            start = beats[int(np.argmin(np.abs(beats + phase - mix_point)))] + phase
+            entry.fade_out_start = entry.start + start / entry.tempo_ratio
+        return alignment.tempo_ratio
+
+    async def _mix_tracks(self, tracks: List[TrackInfo], output_path: Optional[str] = None):
+        """Play a mix of `tracks` through the engine, or render it offline to a WAV/FLAC file.
+
+        Both go through the current effect chain; tracks are decoded and
+        time-stretched in parallel worker processes. Live, playback starts
+        once the first two tracks are ready and the rest are prepared one
+        transition ahead.
+        """
         try:
-            # Calculate mix points
-            mix_start = self._find_mix_point(track1)
-            mix_end = self._find_mix_point(track2)
-            
-            # Load audio data
-            y1, _ = librosa.load(track1.file_path, sr=self.sample_rate)
-            y2, _ = librosa.load(track2.file_path, sr=self.sample_rate)
-            
-            # Beat match
-            tempo_ratio, offset = self.beat_match(track1, track2)
-            y2 = librosa.effects.time_stretch(y2, tempo_ratio)
-            
-            # Create crossfade
-            crossfade_duration = 8  # seconds
-            crossfade_samples = int(crossfade_duration * self.sample_rate)
-            
-            # Apply effects
-            y1 = self.apply_effects(y1)
-            y2 = self.apply_effects(y2)
-            
-            # Apply crossfade
-            mix = np.zeros(max(len(y1), len(y2)))
-            mix[:len(y1)] = y1
-            
-            # Create crossfade window
-            fade_out = np.linspace(1, 0, crossfade_samples)
-            fade_in = np.linspace(0, 1, crossfade_samples)
-            
-            # Apply crossfade
-            mix_start_idx = int(mix_start * self.sample_rate)
-            mix[mix_start_idx:mix_start_idx + crossfade_samples] *= fade_out
-            mix[mix_start_idx:mix_start_idx + crossfade_samples] += y2[:crossfade_samples] * fade_in
-            
-            # Store current audio for recording
-            self.current_audio = mix
-            
-            # Play mixed audio
-            sd.play(mix, self.sample_rate)
-            sd.wait()
-            
+            if output_path:
+                # Beat matching reads the tracks' audio, so plan off the event loop
+                entries = await asyncio.to_thread(self._plan_mix, tracks)
+                # A separate engine, so rendering leaves the live effect state alone
+                engine = AudioEngine(self.sample_rate, channels=2,
+                                     processors=effect_chain(self.effects, self.sample_rate))
+                engine.set_parameter("master", "volume", getattr(self, "current_volume", 1.0))
+                return await asyncio.to_thread(render_mix, entries, output_path, engine)
+
+            with tempfile.TemporaryDirectory(prefix="dj_mix_") as work_dir:
+                mix = LiveMix(self._plan_entries(tracks), self.sample_rate, self.engine.channels, work_dir)
+                self.current_mix = mix
+                try:
+                    # Effects are applied live by the engine
+                    await self.engine.play_stream(mix.blocks(self.buffer_size))
+                finally:
+                    if self.current_mix is mix:
+                        self.current_mix = None
         except Exception as e:
             logger.error(f"Error performing mix: {str(e)}")
             raise
@@ -624,7 +760,7 @@ class DJAgent(BaseAgent):
                     return section["start_time"]
             
             # If no suitable section found, use the middle of the track
-            return librosa.get_duration(filename=track.file_path) / 2
+            return self._track_duration(track) / 2
         except Exception as e:
             logger.error(f"Error finding mix point: {str(e)}")
             return 0.0
@@ -639,6 +775,8 @@ class DJAgent(BaseAgent):
             return await self._start_mixing(task_data)
         elif task_type == "stop_mixing":
             return await self._stop_mixing()
+        elif task_type == "render_mix":
+            return await self._render_mix(task_data)
         elif task_type == "adjust_mix":
             return await self._adjust_mix(task_data)
         elif task_type == "separate_stems":
@@ -653,242 +791,168 @@ class DJAgent(BaseAgent):
             raise ValueError(f"Unknown task type: {task_type}")
 
     async def _analyze_music_library(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze a music library for DJ mixing"""
+        """Analyze the new and changed tracks of a music library for DJ mixing"""
         try:
             library_path = task_data["library_path"]
+            started = time.perf_counter()
+            plan = await asyncio.to_thread(self.track_db.plan_scan, library_path, AUDIO_EXTENSIONS)
+
+            # Identical contents under another path keep their analysis
+            for state, source in plan.reuse:
+                record = self.track_db.reuse(state, source)
+                if record is not None:
+                    self.library[state.path] = self._track_from_record(record)
+
+            self.track_db.remove(plan.removed)
+            for path in plan.removed:
+                self.library.pop(path, None)
+
             tracks = []
-            
-            for root, _, files in os.walk(library_path):
-                for file in files:
-                    if file.endswith((".mp3", ".wav", ".flac")):
-                        file_path = os.path.join(root, file)
-                        track_info = await self._analyze_track(file_path)
-                        tracks.append(track_info)
-            
+            failed = []
+            states = {state.path: state for state in plan.analyze}
+
+            unclassified: List[Tuple[str, Dict[str, Any]]] = []
+
+            def classify_and_store():
+                # One forward pass for the whole batch, then each result is stored, so an
+                # interrupted scan keeps its progress
+                labels = self._classify([record["feature_vector"] for _, record in unclassified])
+                for (path, record), (genre, mood) in zip(unclassified, labels):
+                    record["genre"], record["mood"] = genre, mood
+                    self.track_db.put(states[path], record)
+                    track_info = self._track_from_record(record)
+                    self.library[path] = track_info
+                    tracks.append(track_info)
+                unclassified.clear()
+
+            def store(outcome: AnalysisOutcome, progress: AnalysisProgress):
+                self.analysis_progress = progress.info()
+                if outcome.ok:
+                    unclassified.append((outcome.item, outcome.result))
+                    if len(unclassified) >= CLASSIFIER_BATCH:
+                        classify_and_store()
+                else:
+                    failed.append({"file_path": outcome.item, "status": outcome.status, "error": outcome.error})
+                if progress.done % 50 == 0 or progress.done == progress.total:
+                    logger.info(f"Analyzed {progress.done}/{progress.total} tracks "
+                                f"({progress.rate:.1f}/s, {progress.failed} failed)")
+
+            if states:
+                pool = self._get_analysis_pool(task_data.get("workers"))
+                try:
+                    await asyncio.to_thread(pool.run, list(states), store)
+                finally:
+                    classify_and_store()
+            if plan.reuse or plan.removed or tracks:
+                self.library_version += 1
+                self.tasks.append(asyncio.create_task(asyncio.to_thread(self._get_playlist_planner)))
+
             return {
                 "status": "success",
                 "timestamp": datetime.utcnow().isoformat(),
                 "tracks_analyzed": len(tracks),
+                "tracks_unchanged": len(plan.unchanged),
+                "tracks_reused": len(plan.reuse),
+                "tracks_removed": len(plan.removed),
+                "tracks_failed": failed,
+                "library_size": len(self.library),
+                "scan_seconds": time.perf_counter() - started,
                 "tracks": [vars(track) for track in tracks]
             }
         except Exception as e:
             logger.error(f"Error analyzing music library: {str(e)}")
             raise
 
-    async def _analyze_track(self, file_path: str) -> TrackInfo:
-        """Analyze a single track for DJ mixing"""
-        try:
-            # Load audio file
-            y, sr = librosa.load(file_path, sr=self.sample_rate)
-            
-            # Extract basic features
-            tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
-            key = librosa.feature.tonnetz(y=y, sr=sr)
-            
-            # Extract advanced features using Essentia
-            pool = Pool()
-            w = es.Windowing(type='blackmanharris62')
-            spectrum = es.Spectrum()
-            mfcc = es.MFCC()
-            
-            for frame in es.FrameGenerator(y, frameSize=2048, hopSize=512):
-                spec = spectrum(w(frame))
-                mfcc_bands, mfcc_coeffs = mfcc(spec)
-                pool.add('lowlevel.mfcc', mfcc_coeffs)
-            
-            # Analyze sections
-            sections = self._analyze_sections(y, sr)
-            
-            # Get genre and mood
-            genre = self._classify_genre(y)
-            mood = self._classify_mood(y)
-            
-            # Calculate energy and danceability
-            energy = np.mean(librosa.feature.rms(y=y))
-            danceability = self._calculate_danceability(y, sr)
-            
-            return TrackInfo(
-                file_path=file_path,
-                title=os.path.basename(file_path),
-                artist="Unknown",  # Would need metadata extraction
-                bpm=tempo,
-                key=self._get_key_name(key),
-                energy=float(energy),
-                danceability=float(danceability),
-                mood=mood,
-                genre=genre,
-                waveform=y,
-                beat_frames=beat_frames,
-                sections=sections,
-                features=pool.descriptorNames()
-            )
-        except Exception as e:
-            logger.error(f"Error analyzing track {file_path}: {str(e)}")
-            raise
-
-    def _analyze_sections(self, y: np.ndarray, sr: int) -> List[Dict[str, Any]]:
-        """Analyze track sections (intro, verse, chorus, etc.)"""
-        try:
-            # Use librosa's structural segmentation
-            S = np.abs(librosa.stft(y))
-            boundaries = librosa.segment.agglomerative(S, 100)
-            
-            sections = []
-            for i in range(len(boundaries) - 1):
-                start = librosa.frames_to_time(boundaries[i], sr=sr)
-                end = librosa.frames_to_time(boundaries[i + 1], sr=sr)
-                
-                # Analyze section characteristics
-                section = y[int(start * sr):int(end * sr)]
-                energy = np.mean(librosa.feature.rms(y=section))
-                tempo = librosa.beat.tempo(y=section, sr=sr)[0]
-                
-                sections.append({
-                    "start_time": float(start),
-                    "end_time": float(end),
-                    "energy": float(energy),
-                    "tempo": float(tempo)
-                })
-            
-            return sections
-        except Exception as e:
-            logger.error(f"Error analyzing sections: {str(e)}")
-            return []
-
-    def _classify_genre(self, y: np.ndarray) -> str:
-        """Classify track genre using AI model"""
-        try:
-            # Extract features for genre classification
-            mfcc = librosa.feature.mfcc(y=y, sr=self.sample_rate, n_mfcc=13)
-            features = np.mean(mfcc, axis=1)
-            
-            # Use genre classification model
-            inputs = self.genre_tokenizer(
-                str(features),
-                return_tensors="pt",
-                truncation=True,
-                max_length=512
-            )
-            outputs = self.genre_model(**inputs)
-            genre_id = torch.argmax(outputs.logits).item()
-            
-            # Map genre ID to name
-            genres = ["house", "techno", "trance", "dubstep", "drum_and_bass"]
-            return genres[genre_id]
-        except Exception as e:
-            logger.error(f"Error classifying genre: {str(e)}")
-            return "unknown"
-
-    def _classify_mood(self, y: np.ndarray) -> str:
-        """Classify track mood using AI model"""
-        try:
-            # Extract features for mood classification
-            spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=self.sample_rate)
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=self.sample_rate)
-            features = np.concatenate([
-                np.mean(spectral_centroid),
-                np.mean(spectral_rolloff)
-            ])
-            
-            # Use mood classification model
-            inputs = self.mood_tokenizer(
-                str(features),
-                return_tensors="pt",
-                truncation=True,
-                max_length=512
-            )
-            outputs = self.mood_model(**inputs)
-            mood_id = torch.argmax(outputs.logits).item()
-            
-            # Map mood ID to name
-            moods = ["energetic", "calm", "happy", "sad", "dark"]
-            return moods[mood_id]
-        except Exception as e:
-            logger.error(f"Error classifying mood: {str(e)}")
-            return "unknown"
-
-    def _calculate_danceability(self, y: np.ndarray, sr: int) -> float:
-        """Calculate track danceability"""
+    def _get_analysis_pool(self, workers: Optional[int] = None) -> AnalysisPool:
+        """Persistent analysis workers, so later scans skip spawning processes and importing librosa again"""
+        if self.analysis_pool is None or (workers and workers != self.analysis_pool.workers):
+            if self.analysis_pool is not None:
+                self.analysis_pool.close()
+            self.analysis_pool = AnalysisPool(_analyze_in_worker, workers=workers,
+                                              initializer=_init_analysis_worker, initargs=(self.sample_rate,))
+        return self.analysis_pool
+
+    def _load_library(self) -> Dict[str, TrackInfo]:
+        """Every analysed track in the track database, keyed by path"""
         try:
-            # Extract features for danceability
-            tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-            spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
-            
-            # Calculate danceability score
-            tempo_score = min(tempo / 180.0, 1.0)  # Normalize tempo
-            energy_score = np.mean(librosa.feature.rms(y=y))
-            spectral_score = np.mean(spectral_centroid) / (sr / 2)
-            
-            danceability = (tempo_score * 0.4 + energy_score * 0.3 + spectral_score * 0.3)
-            return float(danceability)
+            return {record["file_path"]: self._track_from_record(record) for record in self.track_db.load()}
         except Exception as e:
-            logger.error(f"Error calculating danceability: {str(e)}")
-            return 0.0
+            logger.error(f"Error loading track database: {str(e)}")
+            return {}
 
-    def _get_key_name(self, key_features: np.ndarray) -> str:
-        """Convert key features to musical key name"""
-        try:
-            # Map key features to musical keys
-            key_map = {
-                0: "C", 1: "C#", 2: "D", 3: "D#",
-                4: "E", 5: "F", 6: "F#", 7: "G",
-                8: "G#", 9: "A", 10: "A#", 11: "B"
-            }
-            
-            # Get most prominent key
-            key_idx = np.argmax(np.mean(key_features, axis=1))
-            return key_map[key_idx % 12]
-        except Exception as e:
-            logger.error(f"Error getting key name: {str(e)}")
-            return "unknown"
+    def _resolve_tracks(self, playlist: List[Any]) -> List[TrackInfo]:
+        """Analysed tracks for playlist entries given as TrackInfo, track dicts or paths"""
+        tracks = []
+        for item in playlist:
+            if isinstance(item, TrackInfo):
+                tracks.append(item)
+                continue
+            path = item.get("file_path") if isinstance(item, dict) else item
+            track = self.library.get(path)
+            if track is None:
+                record = self.track_db.get(path) if isinstance(path, str) else None
+                if record is None:
+                    raise ValueError(f"Track not in the analysed library: {path}")
+                track = self.library[path] = self._track_from_record(record)
+            tracks.append(track)
+        return tracks
 
     async def _create_playlist(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create an AI-curated playlist"""
         try:
-            library = task_data["library"]
+            planner, library = await asyncio.to_thread(self._get_playlist_planner, task_data.get("library"))
             target_duration = task_data.get("duration", 3600)  # Default 1 hour
             target_energy = task_data.get("energy", 0.7)
             target_genre = task_data.get("genre", None)
-            
-            # Filter and sort tracks
-            filtered_tracks = [
-                track for track in library
-                if (target_genre is None or track.genre == target_genre) and
-                abs(track.energy - target_energy) < 0.2
-            ]
-            
-            # Sort by compatibility
-            filtered_tracks.sort(key=lambda x: x.danceability, reverse=True)
-            
-            # Create playlist
-            playlist = []
-            current_duration = 0
-            
-            for track in filtered_tracks:
-                if current_duration >= target_duration:
-                    break
-                    
-                # Check compatibility with previous track
-                if playlist:
-                    prev_track = playlist[-1]
-                    if self._are_tracks_compatible(prev_track, track):
-                        playlist.append(track)
-                        current_duration += librosa.get_duration(filename=track.file_path)
-                else:
-                    playlist.append(track)
-                    current_duration += librosa.get_duration(filename=track.file_path)
+            # Target energy over the set, e.g. [0.5, 0.9, 0.6] to build up and come down
+            energy_curve = task_data.get("energy_curve", target_energy)
+
+            allowed = None
+            if target_genre is not None:
+                allowed = np.array([track.genre == target_genre for track in library], dtype=bool)
+            plan = await asyncio.to_thread(planner.plan, target_duration, energy_curve, allowed)
+            playlist = [library[i] for i in plan.indices]
             
             return {
                 "status": "success",
                 "timestamp": datetime.utcnow().isoformat(),
                 "playlist": [vars(track) for track in playlist],
-                "duration": current_duration
+                "duration": plan.duration,
+                "planning": {**plan.info(), "graph_seconds": planner.build_seconds}
             }
         except Exception as e:
             logger.error(f"Error creating playlist: {str(e)}")
             raise
 
+    def _get_playlist_planner(self, library: Optional[List[TrackInfo]] = None) -> Tuple[PlaylistPlanner, List[TrackInfo]]:
+        """Compatibility graph of `library`, or of the agent's library (built once per library change)"""
+        if library is not None:
+            return self._build_playlist_planner(library), library
+        with self._planner_lock:
+            if self._playlist_planner is None or self._playlist_planner[0] != self.library_version:
+                tracks = list(self.library.values())
+                self._playlist_planner = (self.library_version, self._build_playlist_planner(tracks), tracks)
+                logger.info(f"Built playlist graph of {len(tracks)} tracks in "
+                            f"{self._playlist_planner[1].build_seconds:.2f}s")
+            return self._playlist_planner[1], self._playlist_planner[2]
+
+    def _build_playlist_planner(self, tracks: List[TrackInfo]) -> PlaylistPlanner:
+        return PlaylistPlanner(
+            bpm=[float(np.atleast_1d(track.bpm)[0]) for track in tracks],
+            keys=[track.key for track in tracks],
+            energy=[track.energy for track in tracks],
+            durations=[self._track_duration(track) for track in tracks]
+        )
+
+    def _track_duration(self, track: TrackInfo) -> float:
+        """Length of a track in seconds, from its analysis or decoded PCM when available"""
+        if track.duration is not None:
+            return track.duration
+        duration = self.pcm_cache.duration(track.file_path, self.sample_rate)
+        if duration is not None:
+            return duration
+        return librosa.get_duration(path=track.file_path)
+
     def _are_tracks_compatible(self, track1: TrackInfo, track2: TrackInfo) -> bool:
         """Check if two tracks are compatible for mixing"""
         try:
@@ -941,10 +1005,15 @@ class DJAgent(BaseAgent):
     async def _start_mixing(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """Start AI-powered DJ mixing"""
         try:
-            playlist = task_data["playlist"]
+            playlist = self._resolve_tracks(task_data["playlist"])
             self.current_playlist = playlist
             self.current_track_index = 0
             self.is_mixing = True
+
+            # Upcoming tracks' stems are ready before the set reaches them
+            if task_data.get("prefetch_stems", self.prefetch_stems):
+                # Hashing the files and probing the stem cache reads from disk; keep it off the event loop
+                await asyncio.to_thread(self.stem_queue.prefetch, [track.file_path for track in playlist])
             
             # Start mixing loop
             asyncio.create_task(self._mixing_loop())
@@ -961,21 +1030,11 @@ class DJAgent(BaseAgent):
     async def _mixing_loop(self):
         """Main mixing loop"""
         try:
-            while self.is_mixing and self.current_track_index < len(self.current_playlist):
-                current_track = self.current_playlist[self.current_track_index]
-                
-                # Load next track if available
-                next_track = None
-                if self.current_track_index + 1 < len(self.current_playlist):
-                    next_track = self.current_playlist[self.current_track_index + 1]
-                
-                # Perform mix
-                if next_track:
-                    await self._perform_mix(current_track, next_track)
-                else:
-                    await self._play_track(current_track)
-                
-                self.current_track_index += 1
+            if self.is_mixing and self.current_track_index < len(self.current_playlist):
+                # The rest of the playlist plays as one timeline of crossfades,
+                # so no track is restarted after mixing into it
+                await self._mix_tracks(self.current_playlist[self.current_track_index:])
+                self.current_track_index = len(self.current_playlist)
         except Exception as e:
             logger.error(f"Error in mixing loop: {str(e)}")
             self.is_mixing = False
@@ -983,9 +1042,8 @@ class DJAgent(BaseAgent):
     async def _play_track(self, track: TrackInfo):
         """Play a single track"""
         try:
-            y, _ = librosa.load(track.file_path, sr=self.sample_rate)
-            sd.play(y, self.sample_rate)
-            sd.wait()
+            y = await asyncio.to_thread(self.pcm_cache.load, track.file_path, self.sample_rate)
+            await self.engine.play(y)
         except Exception as e:
             logger.error(f"Error playing track: {str(e)}")
             raise
@@ -994,7 +1052,7 @@ class DJAgent(BaseAgent):
         """Stop DJ mixing"""
         try:
             self.is_mixing = False
-            sd.stop()
+            self.engine.stop_playback()
             
             return {
                 "status": "success",
@@ -1005,6 +1063,23 @@ class DJAgent(BaseAgent):
             logger.error(f"Error stopping mixing: {str(e)}")
             raise
 
+    async def _render_mix(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Render a playlist's mix to a WAV/FLAC file faster than real time"""
+        try:
+            playlist = self._resolve_tracks(task_data.get("playlist") or self.current_playlist)
+            output_path = task_data.get("output_path") or f"mixes/mix_{datetime.now().strftime('%Y%m%d_%H%M%S')}.flac"
+            result = await self._mix_tracks(playlist, output_path)
+
+            return {
+                "status": "success",
+                "timestamp": datetime.utcnow().isoformat(),
+                "render": result.info(),
+                "pcm_cache": self.pcm_cache.stats()
+            }
+        except Exception as e:
+            logger.error(f"Error rendering mix: {str(e)}")
+            raise
+
     async def _adjust_mix(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """Adjust mixing parameters"""
         try:
@@ -1017,11 +1092,17 @@ class DJAgent(BaseAgent):
             
             if "bpm_threshold" in task_data:
                 self.bpm_threshold = task_data["bpm_threshold"]
+
+            # e.g. {"flanger": {"enabled": True, "mix": 0.5}}, applied while playing
+            for name, parameters in task_data.get("effects", {}).items():
+                for parameter, value in parameters.items():
+                    self.set_effect_parameter(name, parameter, value)
             
             return {
                 "status": "success",
                 "timestamp": datetime.utcnow().isoformat(),
-                "message": "Mixing parameters updated"
+                "message": "Mixing parameters updated",
+                "engine": self.engine.status()
             }
         except Exception as e:
             logger.error(f"Error adjusting mix: {str(e)}")
@@ -1104,30 +1185,8 @@ class DJAgent(BaseAgent):
     def apply_multi_band_compression(self, audio: np.ndarray) -> np.ndarray:
         """Apply multi-band compression"""
         try:
-            # Split into frequency bands
-            nyquist = self.sample_rate / 2
-            low_cutoff = 200 / nyquist
-            high_cutoff = 2000 / nyquist
-            
-            # Low band
-            b_low, a_low = butter(4, low_cutoff, btype='low')
-            low_band = filtfilt(b_low, a_low, audio)
-            
-            # Mid band
-            b_mid, a_mid = butter(4, [low_cutoff, high_cutoff], btype='band')
-            mid_band = filtfilt(b_mid, a_mid, audio)
-            
-            # High band
-            b_high, a_high = butter(4, high_cutoff, btype='high')
-            high_band = filtfilt(b_high, a_high, audio)
-            
-            # Apply compression to each band
-            low_compressed = self._apply_compressor(low_band, self.compressor["low"])
-            mid_compressed = self._apply_compressor(mid_band, self.compressor["mid"])
-            high_compressed = self._apply_compressor(high_band, self.compressor["high"])
-            
-            # Combine bands
-            return low_compressed + mid_compressed + high_compressed
+            # Linkwitz-Riley split at 200 Hz and 2 kHz in one causal pass, a compressor per band
+            return multiband_compress(audio, self.sample_rate, [self.compressor[band] for band in BANDS])
         except Exception as e:
             logger.error(f"Error applying multi-band compression: {str(e)}")
             return audio
@@ -1255,8 +1314,7 @@ class DJAgent(BaseAgent):
     def load_sample(self, name: str, file_path: str):
         """Load a sample for triggering"""
         try:
-            audio, _ = librosa.load(file_path, sr=self.sample_rate)
-            self.samples[name] = audio
+            self.samples[name] = np.array(self.pcm_cache.load(file_path, self.sample_rate))
             return True
         except Exception as e:
             logger.error(f"Error loading sample: {str(e)}")
@@ -1277,13 +1335,16 @@ class DJAgent(BaseAgent):
     def _jump_to_position(self, position: float):
         """Jump to a specific position in the track"""
         try:
-            if hasattr(self, 'current_track'):
-                # Calculate new position
-                new_position = position * self.sample_rate
-                
-                # Update playback position
-                if hasattr(self, 'current_audio'):
-                    self.current_audio = self.current_audio[int(new_position):]
+            mix = self.current_mix
+            if mix is None:
+                return
+            timeline = mix.timeline
+            entry = timeline.entry_at(timeline.position)
+            if entry is not None:
+                # `position` is in the original track; stretched at rate tempo_ratio it plays at position / tempo_ratio
+                timeline.seek(round((entry.start + position / entry.tempo_ratio) * self.sample_rate))
+                # Drop the audio already buffered from before the jump
+                self.engine.flush()
         except Exception as e:
             logger.error(f"Error jumping to position: {str(e)}")
 
@@ -1303,14 +1364,13 @@ class DJAgent(BaseAgent):
         """Separate audio into stems"""
         try:
             file_path = task_data["file_path"]
-            audio, _ = librosa.load(file_path, sr=self.sample_rate)
-            
-            stems = self.separate_stems(audio)
+            stems = await self.load_stems(file_path)
             
             return {
                 "status": "success",
                 "timestamp": datetime.utcnow().isoformat(),
-                "stems": {name: stem.tolist() for name, stem in stems.items()}
+                "stems": {name: stem.audio.tolist() for name, stem in stems.items()},
+                "stem_queue": self.stem_queue.status()
             }
         except Exception as e:
             logger.error(f"Error separating stems: {str(e)}")
@@ -1397,21 +1457,20 @@ class DJAgent(BaseAgent):
     def analyze_beat_grid(self, audio: np.ndarray) -> BeatGrid:
         """Analyze and create detailed beat grid"""
         try:
-            # Get tempo and beat frames
-            tempo, beat_frames = librosa.beat.beat_track(y=audio, sr=self.sample_rate)
+            # Tempo, beats and onset strength in one pass, shared by sections and markers
+            rhythm = analyze_rhythm(audio, self.sample_rate)
             
             # Calculate confidence
-            onset_env = librosa.onset.onset_strength(y=audio, sr=self.sample_rate)
-            confidence = np.mean(onset_env[beat_frames])
+            confidence = np.mean(rhythm.beat_strength) if len(rhythm.beat_frames) else 0.0
             
             # Analyze sections
-            sections = self._analyze_sections(audio)
+            sections = self._analyze_sections(audio, self.sample_rate, rhythm)
             
             # Create markers
-            markers = self._create_markers(audio, beat_frames)
+            markers = self._create_markers(audio, rhythm.beat_frames, rhythm)
             
             return BeatGrid(
-                bpm=tempo,
+                bpm=rhythm.tempo,
                 offset=0.0,
                 confidence=float(confidence),
                 sections=sections,
@@ -1422,34 +1481,16 @@ class DJAgent(BaseAgent):
             logger.error(f"Error analyzing beat grid: {str(e)}")
             return None
 
-    def _create_markers(self, audio: np.ndarray, beat_frames: np.ndarray) -> List[Dict[str, Any]]:
+    def _create_markers(self, audio: np.ndarray, beat_frames: np.ndarray,
+                        rhythm: Optional[Rhythm] = None) -> List[Dict[str, Any]]:
         """Create detailed markers for the track"""
         try:
-            markers = []
-            
-            # Convert beat frames to time
-            beat_times = librosa.frames_to_time(beat_frames, sr=self.sample_rate)
-            
-            # Analyze energy
-            energy = librosa.feature.rms(y=audio)[0]
-            energy_times = librosa.times_like(energy, sr=self.sample_rate)
-            
-            # Find significant points
-            for i in range(len(beat_times)):
-                # Find nearest energy point
-                energy_idx = np.argmin(np.abs(energy_times - beat_times[i]))
-                current_energy = energy[energy_idx]
-                
-                # Create marker
-                marker = {
-                    "time": float(beat_times[i]),
-                    "type": "beat",
-                    "energy": float(current_energy),
-                    "confidence": float(confidence[i]) if 'confidence' in locals() else 1.0
-                }
-                markers.append(marker)
-            
-            return markers
+            if rhythm is None or not np.array_equal(rhythm.beat_frames, beat_frames):
+                rhythm = analyze_rhythm(audio, self.sample_rate)
+                rhythm.beat_frames = np.asarray(beat_frames, dtype=np.int64)
+                rhythm.downbeat_frames = rhythm.beat_frames[::4]
+            # One marker per beat, energy looked up with a sorted search
+            return beat_markers(rhythm)
         except Exception as e:
             logger.error(f"Error creating markers: {str(e)}")
             return []
@@ -1475,6 +1516,19 @@ class DJAgent(BaseAgent):
             logger.error(f"Error processing stems: {str(e)}")
             return {}
 
+    async def load_stems(self, file_path: str, prefetch: bool = False) -> Dict[str, Stem]:
+        """Stems of a track file, from the stem cache or the background separation queue"""
+        try:
+            priority = PREFETCH if prefetch else ON_DEMAND
+            separated = await asyncio.wrap_future(await asyncio.to_thread(self.stem_queue.request, file_path, priority))
+            return {
+                name: Stem(name=name, audio=np.array(stem_audio), effects={}, automation=[])
+                for name, stem_audio in separated.items()
+            }
+        except Exception as e:
+            logger.error(f"Error loading stems: {str(e)}")
+            raise
+
     def apply_stem_effects(self, stem: Stem) -> np.ndarray:
         """Apply effects to a stem with automation"""
         try:
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Supervised worker processes for analysing a music library in parallel.
+
+Each worker analyses one file at a time and is watched by the parent: a
+file that raises, hangs past the timeout or takes its worker down with it
+(a crashing decoder, say) is reported as failed, the worker is replaced,
+and the scan carries on with the remaining files.
+"""
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = int(os.getenv('DJ_ANALYSIS_WORKERS', '0')) or os.cpu_count() or 1
+ANALYSIS_TIMEOUT = float(os.getenv('DJ_ANALYSIS_TIMEOUT', '300'))
+# Workers dying before they are ready this many times in a row fail the run
+START_ATTEMPTS = 3
+
+@dataclass
+class AnalysisOutcome:
+    item: Any
+    status: str  # 'ok', 'error', 'timeout' or 'crashed'
+    result: Any = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'ok'
+
+@dataclass
+class AnalysisProgress:
+    total: int
+    started: float
+    done: int = 0
+    failed: int = 0
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Files finished per second"""
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        return (self.total - self.done) / self.rate if self.rate else None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'done': self.done,
+            'failed': self.failed,
+            'elapsed': self.elapsed,
+            'files_per_second': self.rate,
+            'eta': self.eta,
+        }
+
+def _worker_main(conn, analyze: Callable, initializer: Optional[Callable], initargs: tuple) -> None:
+    try:
+        if initializer is not None:
+            initializer(*initargs)
+    except Exception as e:
+        conn.send(('init_error', None, repr(e)))
+        return
+    conn.send(('ready', None, None))
+    while True:
+        item = conn.recv()
+        if item is None:
+            return
+        try:
+            conn.send(('ok', item, analyze(item)))
+        except Exception as e:
+            conn.send(('error', item, f"{type(e).__name__}: {e}"))
+
+class _Worker:
+    def __init__(self, context, analyze: Callable, initializer: Optional[Callable], initargs: tuple):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, analyze, initializer, initargs),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.task: Optional[Tuple[Any, float]] = None  # (item, start time)
+
+    def assign(self, item: Any) -> None:
+        self.conn.send(item)
+        self.task = (item, time.perf_counter())
+
+    def stop(self, timeout: float = 1.0) -> None:
+        if self.process.is_alive():
+            try:
+                if self.task is None:
+                    self.conn.send(None)
+                    self.process.join(timeout)
+            except OSError:
+                pass
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class AnalysisPool:
+    """Runs `analyze(item)` over many items in supervised worker processes.
+
+    `analyze` and `initializer` must be picklable module-level functions;
+    the initializer runs once per worker (loading models, say) and does
+    not count against the per-item timeout. Workers persist between runs
+    until `close()`.
+    """
+
+    def __init__(self, analyze: Callable[[Any], Any], workers: Optional[int] = None,
+                 timeout: float = ANALYSIS_TIMEOUT, initializer: Optional[Callable] = None, initargs: tuple = ()):
+        self.analyze = analyze
+        self.workers = max(1, workers or ANALYSIS_WORKERS)
+        self.timeout = timeout
+        self.initializer = initializer
+        self.initargs = initargs
+        # Spawned workers do not inherit the agent's model-laden process state
+        self._context = multiprocessing.get_context('spawn')
+        self._workers: List[_Worker] = []
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, self.analyze, self.initializer, self.initargs)
+
+    def run(self, items: Iterable[Any],
+            on_result: Optional[Callable[[AnalysisOutcome, AnalysisProgress], None]] = None) -> List[AnalysisOutcome]:
+        """Analyse every item, calling `on_result` in this thread as each one finishes.
+
+        Outcomes are returned in completion order; failures never raise.
+        Workers that cannot start (the initializer raises, or they keep
+        dying before they are ready) raise RuntimeError.
+        """
+        pending: Deque[Any] = deque(items)
+        progress = AnalysisProgress(total=len(pending), started=time.perf_counter())
+        outcomes: List[AnalysisOutcome] = []
+        start_failures = 0  # consecutive workers that died before they were ready
+        while len(self._workers) < min(self.workers, len(pending)):
+            self._workers.append(self._spawn())
+
+        def finish(worker: _Worker, status: str, result: Any = None, error: Optional[str] = None) -> None:
+            item, started = worker.task
+            worker.task = None
+            outcome = AnalysisOutcome(item, status, result, error, time.perf_counter() - started)
+            progress.done += 1
+            progress.failed += not outcome.ok
+            if not outcome.ok:
+                logger.warning(f"Analysis of {item} {status}: {error}")
+            outcomes.append(outcome)
+            if on_result is not None:
+                on_result(outcome, progress)
+
+        def replace(worker: _Worker) -> None:
+            worker.stop(timeout=0)
+            self._workers[self._workers.index(worker)] = self._spawn()
+
+        while pending or any(worker.task for worker in self._workers):
+            for worker in self._workers:
+                if worker.ready and worker.task is None and pending:
+                    worker.assign(pending.popleft())
+
+            deadlines = [worker.task[1] + self.timeout for worker in self._workers if worker.task]
+            wait_for = max(min(deadlines) - time.perf_counter(), 0) if deadlines else None
+            ready = set(wait([worker.conn for worker in self._workers] +
+                             [worker.process.sentinel for worker in self._workers], wait_for))
+
+            for worker in list(self._workers):
+                message = None
+                if worker.conn in ready:
+                    try:
+                        message = worker.conn.recv()
+                    except (EOFError, OSError):
+                        pass
+                if message is not None:
+                    status, _, payload = message
+                    if status == 'ready':
+                        worker.ready = True
+                        start_failures = 0
+                    elif status == 'init_error':
+                        self.close()
+                        raise RuntimeError(f"Analysis worker failed to start: {payload}")
+                    elif status == 'ok':
+                        finish(worker, 'ok', result=payload)
+                    else:
+                        finish(worker, 'error', error=payload)
+                elif worker.conn in ready or worker.process.sentinel in ready:
+                    worker.process.join(1.0)
+                    if worker.task is not None:
+                        finish(worker, 'crashed', error=f"worker exited with code {worker.process.exitcode}")
+                    elif not worker.ready:
+                        start_failures += 1
+                        if start_failures >= START_ATTEMPTS:
+                            exitcode = worker.process.exitcode
+                            self.close()
+                            raise RuntimeError(f"Analysis worker exited with code {exitcode} before it was ready, "
+                                               f"{start_failures} times in a row")
+                    replace(worker)
+                elif worker.task is not None and time.perf_counter() - worker.task[1] > self.timeout:
+                    finish(worker, 'timeout', error=f"no result after {self.timeout:g}s")
+                    replace(worker)
+        return outcomes
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.stop()
+        self._workers.clear()
+
+    def __enter__(self) -> 'AnalysisPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
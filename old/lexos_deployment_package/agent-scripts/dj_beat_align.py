@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Beat alignment of two tracks by FFT cross-correlation.
+
+Each track is reduced to an envelope sampled once per analysis frame:
+its onset strength, or a pulse train built from its detected beats. The
+second envelope is rescaled by a candidate tempo ratio and
+cross-correlated with the first in one FFT pass, which scores every
+offset at once; the best peak is then refined to a fraction of a frame
+by fitting a parabola through it and its neighbours.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import fft
+from scipy.ndimage import gaussian_filter1d
+
+# Analysis hop of librosa's onset and beat tracking, in samples
+ONSET_HOP = 512
+
+@dataclass
+class BeatAlignment:
+    """Places track 2 on track 1's timeline: time t of track 2 lands at t * tempo_ratio + offset."""
+    offset: float  # seconds
+    tempo_ratio: float
+    confidence: float  # normalized correlation at the peak, 0 (unrelated) to 1 (identical)
+
+    def info(self) -> Dict[str, Any]:
+        return {'offset': self.offset, 'tempo_ratio': self.tempo_ratio, 'confidence': self.confidence}
+
+def onset_envelope(y: np.ndarray, sample_rate: int, hop_length: int = ONSET_HOP) -> np.ndarray:
+    import librosa
+    return librosa.onset.onset_strength(y=np.asarray(y, dtype=np.float32), sr=sample_rate, hop_length=hop_length)
+
+def beat_envelope(beat_times: Sequence[float], frame_rate: float, length: Optional[int] = None,
+                  width: float = 1.0) -> np.ndarray:
+    """Pulse train with a Gaussian of `width` frames at every beat time (fractional frames allowed)."""
+    positions = np.asarray(beat_times, dtype=np.float64) * frame_rate
+    positions = positions[positions >= 0]
+    if length is None:
+        length = int(positions.max()) + 4 * int(np.ceil(width)) + 2 if len(positions) else 1
+    positions = positions[positions < length - 1]
+    envelope = np.zeros(length)
+    # Split each pulse between its two nearest frames, then smooth
+    below = np.floor(positions).astype(np.int64)
+    fraction = positions - below
+    np.add.at(envelope, below, 1 - fraction)
+    np.add.at(envelope, below + 1, fraction)
+    return gaussian_filter1d(envelope, width) if width > 0 else envelope
+
+def rescale(envelope: np.ndarray, tempo_ratio: float) -> np.ndarray:
+    """An envelope on a timeline stretched by `tempo_ratio`: frame n reads frame n / tempo_ratio."""
+    length = max(int(np.ceil(len(envelope) * tempo_ratio)), 1)
+    return np.interp(np.arange(length) / tempo_ratio, np.arange(len(envelope)), envelope)
+
+class _Correlator:
+    """Cross-correlation of a fixed reference with other envelopes, reusing the reference's FFT."""
+
+    def __init__(self, reference: np.ndarray, max_other: int):
+        self.reference = reference - reference.mean()
+        self.size = fft.next_fast_len(len(reference) + max_other)
+        self.spectrum = fft.rfft(self.reference, self.size)
+        self.energy = float(np.dot(self.reference, self.reference))
+
+    def peak(self, other: np.ndarray, max_lag: Optional[int]) -> Tuple[float, float]:
+        """(Lag in fractional frames, normalized correlation) of the best match of `other`."""
+        b = other - other.mean()
+        norm = np.sqrt(self.energy * np.dot(b, b))
+        if norm == 0:
+            return 0.0, 0.0
+        circular = fft.irfft(self.spectrum * np.conj(fft.rfft(b, self.size)), self.size)
+        # Lag l >= 0 sits at index l, lag -l at size - l
+        ahead = len(self.reference) - 1 if max_lag is None else min(max_lag, len(self.reference) - 1)
+        behind = len(b) - 1 if max_lag is None else min(max_lag, len(b) - 1)
+        correlation = np.concatenate([circular[self.size - behind:], circular[:ahead + 1]])
+        best = int(np.argmax(correlation))
+        lag, value = float(best - behind), correlation[best]
+        if 0 < best < len(correlation) - 1:
+            before, after = correlation[best - 1], correlation[best + 1]
+            curvature = before - 2 * value + after
+            if curvature < 0:
+                shift = 0.5 * (before - after) / curvature
+                lag += float(shift)
+                value -= 0.25 * (before - after) * shift
+        return lag, float(value / norm)
+
+def align_envelopes(reference: np.ndarray, other: np.ndarray, frame_rate: float, tempo_ratio: float = 1.0,
+                    max_offset: Optional[float] = None, ratio_range: float = 0.02, ratio_steps: int = 9,
+                    refinements: int = 3) -> BeatAlignment:
+    """Offset and tempo ratio that best line `other` up with `reference`.
+
+    Tempo ratios within `ratio_range` (relative) of `tempo_ratio` are
+    tried on a grid of `ratio_steps`, which then narrows around the best
+    one `refinements` times. Offsets are limited to `max_offset` seconds
+    either way when given.
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    other = np.asarray(other, dtype=np.float64)
+    max_lag = None if max_offset is None else int(np.ceil(max_offset * frame_rate)) + 1
+    correlator = _Correlator(reference, len(rescale(other, tempo_ratio * (1 + ratio_range))) + 1)
+    best = (-np.inf, 0.0, tempo_ratio)  # (correlation, lag, ratio)
+    center, span = tempo_ratio, tempo_ratio * ratio_range
+    for _ in range(refinements + 1):
+        ratios = center + np.linspace(-span, span, ratio_steps) if span > 0 else np.array([center])
+        peaks = [correlator.peak(rescale(other, ratio), max_lag) for ratio in ratios]
+        i = int(np.argmax([value for _, value in peaks]))
+        if peaks[i][1] > best[0]:
+            best = (peaks[i][1], peaks[i][0], ratios[i])
+        center = best[2]
+        span = 2 * span / max(ratio_steps - 1, 1)
+    value, lag, ratio = best
+    if 0 < i < len(ratios) - 1 and ratios[i] == ratio:
+        # Parabola through the last grid's best ratio and its neighbours
+        before, after = peaks[i - 1][1], peaks[i + 1][1]
+        curvature = before - 2 * value + after
+        if curvature < 0:
+            shift = 0.5 * (before - after) / curvature
+            ratio += shift * (ratios[1] - ratios[0])
+            lag += shift * ((peaks[i + 1][0] if shift > 0 else lag) - (lag if shift > 0 else peaks[i - 1][0]))
+    if max_offset is not None:
+        lag = float(np.clip(lag, -max_offset * frame_rate, max_offset * frame_rate))
+    return BeatAlignment(offset=float(lag / frame_rate), tempo_ratio=float(ratio), confidence=float(max(value, 0.0)))
+
+def align_beats(beats1: Sequence[float], beats2: Sequence[float], frame_rate: float, tempo_ratio: float = 1.0,
+                **options) -> BeatAlignment:
+    """align_envelopes on pulse trains of two lists of beat times (seconds)."""
+    return align_envelopes(beat_envelope(beats1, frame_rate), beat_envelope(beats2, frame_rate), frame_rate,
+                           tempo_ratio, **options)
@@ -0,0 +1,1290 @@
+#!/usr/bin/env python3
+"""Golden-output checks and benchmarks for the DJ agent's audio processing.
+
+Runs on synthetic audio, so it needs neither a music library nor the DJ
+agent's heavier dependencies. Each command exits non-zero if an output
+drifts from its reference.
+
+Usage: python dj_benchmarks.py effects [--seconds 60]
+       python dj_benchmarks.py engine [--seconds 5] [--block-size 512]
+       python dj_benchmarks.py render [--tracks 4] [--seconds 60] [--workers N]
+       python dj_benchmarks.py library [--tracks 20000]
+       python dj_benchmarks.py analysis [--files 16] [--seconds 30] [--workers N]
+       python dj_benchmarks.py pcm-cache [--seconds 120] [--repeat 5]
+       python dj_benchmarks.py playlist [--tracks 50000]
+       python dj_benchmarks.py stems [--seconds 30] [--separation-seconds 1]
+       python dj_benchmarks.py reverb [--seconds 10] [--block-size 512]
+       python dj_benchmarks.py beat-align [--seconds 60] [--trials 5]
+       python dj_benchmarks.py classify [--tracks 4096] [--seconds 30]
+       python dj_benchmarks.py rhythm [--seconds 60]
+       python dj_benchmarks.py multiband [--seconds 60] [--block-size 512]
+"""
+import os
+import tempfile
+
+# Benchmarks measure one core
+for _var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(_var, '1')
+# Decoded PCM goes to a scratch cache, shared with the worker processes
+os.environ.setdefault('DJ_PCM_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'dj_benchmarks_pcm'))
+
+import sys
+import time
+import asyncio
+import shutil
+import argparse
+from types import SimpleNamespace
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict
+
+import numpy as np
+
+import dj_dsp
+import dj_engine
+import dj_render
+import dj_track_db
+import dj_analysis_pool
+import dj_pcm_cache
+import dj_playlist_planner
+import dj_stem_queue
+import dj_convolution
+import dj_beat_align
+import dj_classify
+import dj_rhythm
+import dj_multiband
+
+SAMPLE_RATE = 44100
+
+def synthetic_track(seconds: float, channels: int = 2, seed: int = 0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Kick-like pulses over a chord and noise, shaped like a loud mastered track."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    kick = np.sin(2 * np.pi * 55 * t) * np.exp(-(t % 0.5) * 8)
+    chord = sum(np.sin(2 * np.pi * f * t + rng.uniform(0, np.pi)) for f in (220.0, 277.2, 329.6)) / 3
+    mono = 0.6 * kick + 0.25 * chord
+    audio = np.stack([mono + 0.05 * rng.standard_normal(len(t)) for _ in range(channels)], axis=1)
+    return audio[:, 0] if channels == 1 else audio
+
+def timed(fn: Callable, *args, repeat: int = 3) -> float:
+    """Best wall time of `repeat` calls"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+class Report:
+    """Collects golden check results and prints aligned rows."""
+
+    def __init__(self):
+        self.failed = False
+
+    def check(self, name: str, actual: np.ndarray, expected: np.ndarray, tolerance: float) -> None:
+        error = float(np.max(np.abs(np.asarray(actual, dtype=np.float64) - expected))) if len(expected) else 0.0
+        ok = error <= tolerance and actual.shape == expected.shape
+        self.failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<48} max error {error:.2e} (tolerance {tolerance:.0e})")
+
+    def expect(self, name: str, ok: bool, detail: str = "") -> None:
+        self.failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name:<48} {detail}")
+
+    def row(self, name: str, seconds_of_audio: float, elapsed: float, reference: float = None) -> None:
+        line = f"     {name:<32} {elapsed * 1000:9.1f} ms  {seconds_of_audio / elapsed:8.0f}x real time"
+        if reference is not None:
+            line += f"  {reference / elapsed:6.0f}x faster than reference"
+        print(line)
+
+# Reference implementations: the original per-sample loops, kept verbatim
+# (mono input) as golden models for the vectorized versions.
+
+def reference_flanger(audio, sample_rate, rate, depth, mix):
+    delay = int(0.002 * sample_rate)
+    rate = rate * 2
+    depth = depth * 0.002 * sample_rate
+    t = np.arange(len(audio)) / sample_rate
+    lfo = depth * np.sin(2 * np.pi * rate * t)
+    output = np.zeros_like(audio)
+    for i in range(len(audio)):
+        delay_samples = int(delay + lfo[i])
+        if i >= delay_samples:
+            output[i] = audio[i] + mix * audio[i - delay_samples]
+        else:
+            output[i] = audio[i]
+    return output
+
+def reference_phaser(audio, sample_rate, rate, depth, mix):
+    rate = rate * 2
+    t = np.arange(len(audio)) / sample_rate
+    lfo = depth * np.sin(2 * np.pi * rate * t)
+    output = np.zeros_like(audio)
+    for i in range(len(audio)):
+        if i > 0:
+            output[i] = audio[i] + mix * (audio[i] - output[i-1] * lfo[i])
+        else:
+            output[i] = audio[i]
+    return output
+
+def reference_compressor(audio, threshold, ratio, attack, release):
+    gain_reduction = np.zeros_like(audio)
+    for i in range(len(audio)):
+        if abs(audio[i]) > threshold:
+            gain_reduction[i] = (abs(audio[i]) - threshold) * (1 - 1/ratio)
+    smoothed_reduction = np.zeros_like(gain_reduction)
+    for i in range(len(gain_reduction)):
+        if i > 0:
+            if gain_reduction[i] > smoothed_reduction[i-1]:
+                smoothed_reduction[i] = smoothed_reduction[i-1] + (gain_reduction[i] - smoothed_reduction[i-1]) * attack
+            else:
+                smoothed_reduction[i] = smoothed_reduction[i-1] + (gain_reduction[i] - smoothed_reduction[i-1]) * release
+        else:
+            smoothed_reduction[i] = gain_reduction[i]
+    return audio * (1 - smoothed_reduction)
+
+def per_channel(reference: Callable, audio: np.ndarray, *args) -> np.ndarray:
+    """Run a mono reference over each channel of `audio`."""
+    if audio.ndim == 1:
+        return reference(audio, *args)
+    return np.stack([reference(audio[:, c], *args) for c in range(audio.shape[1])], axis=1)
+
+EFFECT_CASES = {
+    'flanger': (dj_dsp.flanger, reference_flanger, [
+        (SAMPLE_RATE, 0.25, 0.5, 0.5), (SAMPLE_RATE, 1.0, 1.0, 1.0), (SAMPLE_RATE, 0.0, 0.0, 0.3)]),
+    'phaser': (dj_dsp.phaser, reference_phaser, [
+        (SAMPLE_RATE, 0.25, 0.5, 0.5), (SAMPLE_RATE, 1.0, 1.0, 1.0), (SAMPLE_RATE, 0.1, 0.9, 0.7)]),
+    'compressor': (dj_dsp.compressor, reference_compressor, [
+        (0.3, 4.0, 0.01, 0.0005), (0.5, 2.0, 0.5, 0.01), (0.1, 10.0, 1.0, 0.0), (0.2, 3.0, 0.2, 0.2)]),
+}
+
+def bench_effects(args: argparse.Namespace) -> bool:
+    report = Report()
+    golden = synthetic_track(2.0, channels=2, seed=1)
+
+    print("Golden outputs against the original per-sample loops")
+    for name, (effect, reference, cases) in EFFECT_CASES.items():
+        for params in cases:
+            label = f"{name}{params[1:] if params[0] == SAMPLE_RATE else params}"
+            report.check(label, effect(golden, *params), per_channel(reference, golden, *params), 1e-9)
+            report.check(label + " mono", effect(golden[:, 0], *params), reference(golden[:, 0], *params), 1e-9)
+        report.check(f"{name} empty", effect(golden[:0], *cases[0]), golden[:0], 0.0)
+
+    track = synthetic_track(args.seconds, channels=2)
+    excerpt = golden[:SAMPLE_RATE // 2, 0]
+    print(f"\nOne core, {args.seconds:g} s stereo track "
+          f"(reference timed on a {len(excerpt) / SAMPLE_RATE:g} s mono excerpt and scaled)")
+    for name, (effect, reference, cases) in EFFECT_CASES.items():
+        params = cases[0]
+        elapsed = timed(effect, track, *params)
+        reference_elapsed = timed(reference, excerpt, *params, repeat=1) * track.size / len(excerpt)
+        report.row(name, args.seconds, elapsed, reference_elapsed)
+    return not report.failed
+
+ENGINE_PARAMETERS = {
+    "reverb": {"wet": 0.3, "room_size": 0.05, "damping": 0.5},
+    "delay": {"time": 0.01, "feedback": 0.0, "mix": 0.4},
+    "filter": {"cutoff": 5000.0, "resonance": 0.0},
+    "flanger": {"rate": 0.25, "depth": 0.5, "mix": 0.5},
+    "phaser": {"rate": 0.25, "depth": 0.5, "mix": 0.5},
+    "compressor": {"threshold": 0.3, "ratio": 4.0, "attack": 0.01, "release": 0.0005},
+}
+
+def in_blocks(processor: "dj_engine.Processor", audio: np.ndarray, seed: int = 0) -> np.ndarray:
+    """Run a processor over `audio` split into irregular blocks."""
+    rng = np.random.default_rng(seed)
+    outputs, position = [], 0
+    while position < len(audio):
+        size = int(rng.integers(1, 1500))
+        outputs.append(processor.process(audio[position:position + size]))
+        position += size
+    return np.concatenate(outputs)
+
+def engine_chain(enabled: bool = True):
+    effects = {name: SimpleNamespace(parameters=params, enabled=enabled)
+               for name, params in ENGINE_PARAMETERS.items()}
+    return dj_engine.effect_chain(effects, SAMPLE_RATE)
+
+async def _play_with_ticker(engine: "dj_engine.AudioEngine", audio: np.ndarray) -> float:
+    """Play through the engine; returns the event loop's worst scheduling lag."""
+    worst = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            worst = max(worst, time.perf_counter() - start - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await engine.play(audio)
+    done.set()
+    await tick
+    return worst
+
+async def _stop_then_play() -> bool:
+    """stop_playback while a mix plays, then an immediate new playback: only the old audio is dropped."""
+    engine = dj_engine.AudioEngine(SAMPLE_RATE, block_size=512)
+    output = dj_engine.NullOutput(realtime=True, keep=True)
+    engine.start(output)
+    old = asyncio.create_task(engine.play(np.full((SAMPLE_RATE, 2), 0.5)))
+    await asyncio.sleep(0.05)
+    engine.stop_playback()
+    await engine.play(np.full((SAMPLE_RATE // 4, 2), 0.25))
+    await old
+    engine.stop()
+    played = output.audio()[:, 0]
+    return bool(np.sum(played == 0.25) == SAMPLE_RATE // 4 and np.sum(played == 0.5) < SAMPLE_RATE // 2)
+
+async def _idle_output_closes() -> bool:
+    idle = dj_engine.IDLE_STOP_SECONDS
+    dj_engine.IDLE_STOP_SECONDS = 0.05
+    try:
+        engine = dj_engine.AudioEngine(SAMPLE_RATE, block_size=512)
+        engine.start(dj_engine.NullOutput(realtime=True), stop_when_idle=True)
+        await engine.play(np.zeros((4096, 2)))
+        still_open = engine.output is not None
+        await asyncio.sleep(0.2)
+        return still_open and engine.output is None
+    finally:
+        dj_engine.IDLE_STOP_SECONDS = idle
+
+async def _records_what_plays() -> bool:
+    engine = dj_engine.AudioEngine(SAMPLE_RATE, block_size=512)
+    engine.set_parameter("master", "volume", 0.5)
+    engine.start(dj_engine.NullOutput(realtime=True))
+    engine.recorded = deque()
+    audio = synthetic_track(0.5, channels=2, seed=5)
+    await engine.play(audio)
+    engine.stop()
+    recorded = np.concatenate(list(engine.recorded))
+    start = int(np.argmax(np.any(recorded != 0, axis=1)))
+    return bool(np.allclose(recorded[start:start + len(audio)], audio * 0.5, atol=1e-6))
+
+def bench_engine(args: argparse.Namespace) -> bool:
+    report = Report()
+    audio = synthetic_track(3.0, channels=2, seed=2)
+
+    print("Streaming processors against whole-signal processing")
+    offline = {
+        "flanger": lambda x, p: dj_dsp.flanger(x, SAMPLE_RATE, p["rate"], p["depth"], p["mix"]),
+        "phaser": lambda x, p: dj_dsp.phaser(x, SAMPLE_RATE, p["rate"], p["depth"], p["mix"]),
+        "compressor": lambda x, p: dj_dsp.compressor(x, p["threshold"], p["ratio"], p["attack"], p["release"]),
+    }
+    for processor in engine_chain():
+        params = ENGINE_PARAMETERS[processor.name]
+        streamed = in_blocks(processor, audio)
+        if processor.name in offline:
+            expected = offline[processor.name](audio, params)
+        else:
+            processor.reset()
+            expected = processor.process(audio)
+        report.check(f"{processor.name} in irregular blocks", streamed, expected, 1e-9)
+
+    # A change scheduled mid-block lands on its exact frame
+    engine = dj_engine.AudioEngine(SAMPLE_RATE, block_size=512)
+    engine.buffer.write(np.ones((4096, 2)))
+    engine.set_parameter("master", "volume", 0.5, at_frame=1000)
+    engine.set_parameter("master", "volume", 0.25, at_frame=2048)
+    out = np.zeros((4096, 2))
+    for start in range(0, 4096, 512):
+        engine.process_block(out[start:start + 512])
+    expected = np.ones((4096, 2))
+    expected[1000:] = 0.5
+    expected[2048:] = 0.25
+    report.check("sample-accurate parameter changes", out, expected, 0.0)
+
+    ring = dj_engine.RingBuffer(1000, 2)
+    written, read = [], []
+    for size in (700, 500, 900, 300, 1000):
+        chunk = np.arange(len(written), len(written) + size, dtype=float)[:, None].repeat(2, axis=1)
+        count = ring.write(chunk)
+        written.extend(chunk[:count, 0])
+        out = np.zeros((int(size * 0.8), 2))
+        read.extend(out[:ring.read(out), 0])
+    report.check("ring buffer wrap-around", np.array(read), np.array(written[:len(read)]), 0.0)
+
+    report.expect("stop racing a new playback keeps the new audio", asyncio.run(_stop_then_play()))
+    report.expect("output closes once playback is idle", asyncio.run(_idle_output_closes()))
+    report.expect("recording keeps the rendered output", asyncio.run(_records_what_plays()))
+
+    track = synthetic_track(args.seconds, channels=2)
+    engine = dj_engine.AudioEngine(SAMPLE_RATE, block_size=args.block_size, processors=engine_chain())
+    output = dj_engine.NullOutput(realtime=True)
+    engine.start(output)
+    lag = asyncio.run(_play_with_ticker(engine, track))
+    engine.stop()
+    status = engine.status()
+    print(f"\nAll six effects, {args.seconds:g} s played in real time through the null output, "
+          f"{args.block_size}-frame blocks ({status['block_ms']:.1f} ms)")
+    print(f"     underruns {status['underruns']}, overruns {status['overruns']}, "
+          f"process time mean {status['mean_process_ms']:.2f} ms / max {status['max_process_ms']:.2f} ms, "
+          f"load {status['load']:.0%}, worst event loop lag {lag * 1000:.1f} ms")
+    report.failed |= status['underruns'] > 0
+
+    engine = dj_engine.AudioEngine(SAMPLE_RATE, block_size=args.block_size, processors=engine_chain())
+    block = np.zeros((args.block_size, 2))
+    blocks = len(track) // args.block_size
+    start = time.perf_counter()
+    for i in range(blocks):
+        engine.buffer.write(track[i * args.block_size:(i + 1) * args.block_size])
+        engine.process_block(block)
+    report.row("engine, unpaced", blocks * args.block_size / SAMPLE_RATE, time.perf_counter() - start)
+    return not report.failed
+
+def write_tracks(directory: str, count: int, seconds: float) -> list:
+    """Synthetic tracks as WAV files, so rendering decodes real files."""
+    import soundfile as sf
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"track_{i}.wav")
+        sf.write(path, synthetic_track(seconds, channels=1, seed=10 + i), SAMPLE_RATE)
+        paths.append(path)
+    return paths
+
+def bench_render(args: argparse.Namespace) -> bool:
+    import soundfile as sf
+    report = Report()
+    crossfade = 8.0
+    with tempfile.TemporaryDirectory(prefix='dj_bench_') as directory:
+        paths = write_tracks(directory, args.tracks, args.seconds)
+        ratios = [1.0] + [1.0 + 0.02 * (-1) ** i for i in range(1, args.tracks)]
+        entries, position = [], 0.0
+        for i, (path, ratio) in enumerate(zip(paths, ratios)):
+            entry = dj_render.MixEntry(path, position, ratio, fade_in=crossfade if i else 0.0)
+            if i + 1 < len(paths):
+                entry.fade_out_start, entry.fade_out = position + args.seconds / 2 / ratio, crossfade
+                position = entry.fade_out_start
+            entries.append(entry)
+
+        results = {}
+        for workers in sorted({1, args.workers or os.cpu_count() or 1}):
+            dj_render.warm_up(workers)
+            dj_pcm_cache.get_pcm_cache().clear()  # measure decoding, not the cache
+            output = os.path.join(directory, f"mix_{workers}.flac")
+            engine = dj_engine.AudioEngine(SAMPLE_RATE, processors=engine_chain())
+            results[workers] = dj_render.render_mix(entries, output, engine, workers=workers)
+        rendered, _ = sf.read(results[1].path)
+
+        # The same timeline through a fresh chain in playback-sized blocks
+        tracks = dj_render.prepare_tracks(entries, SAMPLE_RATE, directory, workers=1)
+        timeline = dj_render.MixTimeline(entries, tracks, SAMPLE_RATE)
+        engine = dj_engine.AudioEngine(SAMPLE_RATE, processors=engine_chain())
+        played = np.concatenate([np.clip(engine.render(block), -1.0, 1.0) for block in timeline.blocks(512)])
+        # FLAC stores 16-bit samples
+        report.check("offline render matches playback chain", rendered, played, 2.0 ** -14)
+        mixed = np.concatenate(list(dj_render.MixTimeline(entries, tracks, SAMPLE_RATE).blocks(512)))
+        del tracks
+
+        # Live: the plan is pulled lazily and playback starts after two tracks
+        planned = []
+        def plan():
+            for entry in entries:
+                planned.append(entry)
+                yield entry
+        async def play_live():
+            mix = dj_render.LiveMix(plan(), SAMPLE_RATE, 2, directory, workers=1)
+            blocks, planned_at_start = [], None
+            async for block in mix.blocks(512):
+                if planned_at_start is None:
+                    planned_at_start = len(planned)
+                blocks.append(block)
+            return np.concatenate(blocks), planned_at_start
+        live, planned_at_start = asyncio.run(play_live())
+        report.expect("live mix starts with two tracks prepared", planned_at_start == min(2, len(entries)),
+                      f"{planned_at_start} of {len(entries)} planned")
+        report.check("live mix matches the prepared timeline", live, mixed, 1e-6)
+    dj_render.shutdown_workers()
+
+    print(f"\n{args.tracks} x {args.seconds:g} s tracks, {timeline.seconds:.0f} s mix, all six effects, FLAC output")
+    for workers, result in results.items():
+        print(f"     {workers} worker(s): decode+stretch {result.prepare_seconds:6.2f} s, "
+              f"mix+effects+encode {result.render_seconds:6.2f} s, {result.speed:6.1f}x real time")
+    return not report.failed
+
+def fake_track_record(path: str, seed: int) -> dict:
+    """A record shaped like an analysed four-minute track, without analysing anything."""
+    rng = np.random.default_rng(seed)
+    return {
+        'file_path': path, 'title': os.path.basename(path), 'artist': "Unknown",
+        'bpm': float(rng.uniform(80, 170)), 'key': "C major", 'energy': float(rng.uniform()),
+        'danceability': float(rng.uniform()), 'mood': "happy", 'genre': "house",
+        'waveform': rng.uniform(size=dj_track_db.WAVEFORM_POINTS),
+        'beat_frames': np.cumsum(rng.integers(40, 50, size=480)),
+        'sections': [{'start': 30.0 * i, 'end': 30.0 * (i + 1), 'energy': float(rng.uniform()), 'tempo': 128.0}
+                     for i in range(8)],
+        'features': ['lowlevel.mfcc'], 'harmonic_mix_key': None, 'duration': 240.0,
+    }
+
+def apply_scan(db: "dj_track_db.TrackDatabase", plan: "dj_track_db.ScanPlan") -> None:
+    """What DJAgent._analyze_music_library does with a plan, with fake analysis."""
+    for state, source in plan.reuse:
+        db.reuse(state, source)
+    db.remove(plan.removed)
+    for state in plan.analyze:
+        db.put(state, fake_track_record(state.path, hash(state.path) & 0xffff))
+
+def bench_library(args: argparse.Namespace) -> bool:
+    report = Report()
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory(prefix='dj_library_') as directory:
+        library = os.path.join(directory, 'music')
+        paths = [os.path.join(library, f"artist_{i // 100:04d}", f"track_{i:06d}.mp3") for i in range(args.tracks)]
+        for path in paths:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(rng.bytes(256))
+        db = dj_track_db.TrackDatabase(os.path.join(directory, 'tracks.sqlite3'))
+
+        start = time.perf_counter()
+        apply_scan(db, db.plan_scan(library))
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        plan = db.plan_scan(library)
+        rescan = time.perf_counter() - start
+        report.expect("rescan of an unchanged library", plan.summary() == {
+            'unchanged': args.tracks, 'analyze': 0, 'reused': 0, 'removed': 0}, str(plan.summary()))
+
+        start = time.perf_counter()
+        records = db.load(library)
+        load = time.perf_counter() - start
+        report.expect("library loads from the database", len(records) == args.tracks and
+                      len(records[0]['beat_frames']) == 480, f"{len(records)} tracks")
+
+        # 10 edited, 5 touched, 5 deleted, 3 moved, 5 added
+        for path in paths[:10]:
+            with open(path, 'wb') as f:
+                f.write(rng.bytes(256))
+        for path in paths[10:15]:
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        for path in paths[15:20]:
+            os.remove(path)
+        for path in paths[20:23]:
+            os.rename(path, path.replace('track_', 'moved_'))
+        for i in range(5):
+            with open(os.path.join(library, 'artist_0000', f"new_{i}.flac"), 'wb') as f:
+                f.write(rng.bytes(256))
+
+        start = time.perf_counter()
+        plan = db.plan_scan(library)
+        incremental = time.perf_counter() - start
+        expected = {'unchanged': args.tracks - 23, 'analyze': 15, 'reused': 8, 'removed': 8}
+        report.expect("rescan finds only the changes", plan.summary() == expected, str(plan.summary()))
+        apply_scan(db, plan)
+        moved = db.get(paths[20].replace('track_', 'moved_'))
+        report.expect("moved track keeps its analysis", moved is not None and moved['title'].startswith('moved_'))
+        plan = db.plan_scan(library)
+        report.expect("rescan after applying the changes", plan.summary()['unchanged'] == args.tracks and
+                      len(db.load(library)) == args.tracks, str(plan.summary()))
+
+    print(f"\n{args.tracks} tracks")
+    print(f"     first scan, hashing and storing   {first:8.2f} s (analysis not included)")
+    print(f"     rescan, nothing changed           {rescan:8.2f} s")
+    print(f"     rescan, 28 files changed          {incremental:8.2f} s (plus analysis of 15 files)")
+    print(f"     load library from database        {load:8.2f} s")
+    return not report.failed
+
+def init_test_analysis_worker() -> None:
+    dj_render._warm_up_worker()
+
+def init_crashing_analysis_worker() -> None:
+    os._exit(3)
+
+def analyze_test_file(path: str) -> dict:
+    """The librosa part of DJAgent's track analysis; essentia and the models are not needed here."""
+    import librosa
+    name = os.path.basename(path)
+    if name.startswith('crash'):
+        os._exit(3)
+    if name.startswith('hang'):
+        time.sleep(3600)
+    y, sr = librosa.load(path, sr=22050)
+    tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
+    return {
+        'bpm': float(np.atleast_1d(tempo)[0]),
+        'beat_frames': beats,
+        'energy': float(np.mean(librosa.feature.rms(y=y))),
+        'centroid': float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))),
+    }
+
+def bench_analysis(args: argparse.Namespace) -> bool:
+    report = Report()
+    workers = args.workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(prefix='dj_analysis_') as directory:
+        paths = write_tracks(directory, args.files, args.seconds)
+
+        throughput = {}
+        for count in sorted({1, workers}):
+            with dj_analysis_pool.AnalysisPool(analyze_test_file, workers=count,
+                                               initializer=init_test_analysis_worker) as pool:
+                pool.run(paths[:count])  # start the workers
+                start = time.perf_counter()
+                outcomes = pool.run(paths)
+                throughput[count] = len(paths) / (time.perf_counter() - start)
+            report.expect(f"{count} worker(s) analyse every file", all(o.ok for o in outcomes) and
+                          len(outcomes) == len(paths), f"{sum(o.ok for o in outcomes)}/{len(paths)}")
+
+        # One corrupt, one crashing and one hanging file among good ones
+        corrupt = os.path.join(directory, 'corrupt.wav')
+        with open(corrupt, 'wb') as f:
+            f.write(b'RIFF' + os.urandom(4096))
+        faulty = {corrupt: 'error', os.path.join(directory, 'crash.wav'): 'crashed',
+                  os.path.join(directory, 'hang.wav'): 'timeout'}
+        progress = []
+        with dj_analysis_pool.AnalysisPool(analyze_test_file, workers=workers, timeout=5.0,
+                                           initializer=init_test_analysis_worker) as pool:
+            outcomes = pool.run(list(faulty) + paths[:4], lambda outcome, p: progress.append(p.done))
+        statuses = {outcome.item: outcome.status for outcome in outcomes}
+        report.expect("failures are isolated per file", all(statuses[path] == status for path, status in faulty.items())
+                      and all(statuses[path] == 'ok' for path in paths[:4]), str(sorted(statuses.values())))
+        report.expect("progress reported for every file", progress == list(range(1, len(faulty) + 5)))
+
+        # Workers that die while starting fail the run instead of respawning forever
+        try:
+            with dj_analysis_pool.AnalysisPool(analyze_test_file, workers=2,
+                                               initializer=init_crashing_analysis_worker) as pool:
+                pool.run(paths[:4])
+            error = "no error"
+        except RuntimeError as e:
+            error = str(e)
+        report.expect("workers dying at start fail the run", "before it was ready" in error, error)
+
+    print(f"\n{args.files} x {args.seconds:g} s tracks, {os.cpu_count()} CPU(s)")
+    for count, rate in throughput.items():
+        print(f"     {count:3d} worker(s) {rate:8.2f} files/s  {rate / throughput[1]:5.2f}x one worker")
+    return not report.failed
+
+def decode_and_stretch(file_path: str, sample_rate: int, tempo_ratio: float) -> np.ndarray:
+    """The uncached loader: every mix decodes and stretches again."""
+    y = dj_pcm_cache.decode(file_path, sample_rate)
+    return dj_pcm_cache.stretch(y, tempo_ratio) if tempo_ratio != 1.0 else y
+
+def bench_pcm_cache(args: argparse.Namespace) -> bool:
+    import soundfile as sf
+    report = Report()
+    cache = dj_pcm_cache.get_pcm_cache()
+    cache.clear()
+    dj_render.warm_up(1)
+    with tempfile.TemporaryDirectory(prefix='dj_pcm_') as directory:
+        # FLAC, so that decoding costs what it does for a real library
+        paths = []
+        for i in range(2):
+            paths.append(os.path.join(directory, f"track_{i}.flac"))
+            sf.write(paths[-1], synthetic_track(args.seconds, channels=1, seed=20 + i), SAMPLE_RATE)
+        half = args.seconds / 2
+        entries = [dj_render.MixEntry(paths[0], 0.0, 1.0, fade_out_start=half, fade_out=8.0),
+                   dj_render.MixEntry(paths[1], half, 1.03, fade_in=8.0)]
+
+        def mix(name: str, loader: Callable) -> "dj_render.RenderResult":
+            engine = dj_engine.AudioEngine(SAMPLE_RATE, processors=engine_chain())
+            return dj_render.render_mix(entries, os.path.join(directory, name), engine, workers=1, loader=loader)
+
+        uncached = [mix(f"uncached_{i}.wav", decode_and_stretch) for i in range(args.repeat)]
+        cached = [mix(f"cached_{i}.wav", dj_render.load_track) for i in range(args.repeat)]
+        expected, _ = sf.read(uncached[0].path)
+        for i, result in enumerate(cached):
+            report.check(f"cached mix {i + 1} matches uncached", sf.read(result.path)[0], expected, 0.0)
+        stats = cache.stats()
+        # The first mix misses both tracks; every later one hits both
+        report.expect("hit rate", stats['hits'] == 2 * (args.repeat - 1) and stats['misses'] == 2,
+                      f"{stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses)")
+    cache.clear()
+
+    print(f"\nMixing the same two {args.seconds:g} s FLAC tracks {args.repeat} times, second one stretched")
+    for name, results in (('uncached', uncached), ('cached', cached)):
+        for i, result in enumerate(results):
+            print(f"     {name:<9} mix {i + 1}: decode+stretch {result.prepare_seconds * 1000:8.1f} ms, "
+                  f"total {result.total_seconds:6.2f} s")
+    return not report.failed
+
+def reference_playlist(library, durations, target_duration, target_energy):
+    """The original greedy _create_playlist, with durations looked up instead of decoded."""
+    key_map = {"C": 0, "C#": 1, "D": 2, "D#": 3, "E": 4, "F": 5, "F#": 6, "G": 7, "G#": 8, "A": 9, "A#": 10, "B": 11}
+
+    def compatible(track1, track2):
+        if abs(track1['bpm'] - track2['bpm']) > 10:
+            return False
+        key1, key2 = key_map.get(track1['key'], 0), key_map.get(track2['key'], 0)
+        if not (abs(key1 - key2) in [3, 9, 5, 7] or key1 == key2):
+            return False
+        return abs(track1['energy'] - track2['energy']) <= 0.3
+
+    filtered = [track for track in library if abs(track['energy'] - target_energy) < 0.2]
+    filtered.sort(key=lambda x: x['danceability'], reverse=True)
+    playlist, current = [], 0
+    for track in filtered:
+        if current >= target_duration:
+            break
+        if not playlist or compatible(playlist[-1], track):
+            playlist.append(track)
+            current += durations[track['index']]
+    return playlist
+
+def transition_cost(planner: "dj_playlist_planner.PlaylistPlanner", i: int, j: int) -> float:
+    """Cost of mixing track i into track j, inf when they are not compatible."""
+    key_cost = dj_playlist_planner.compatible_codes(int(planner.codes[i])).get(int(planner.codes[j]), np.inf)
+    bpm_diff = abs(float(planner.bpm[i]) - float(planner.bpm[j])) / planner.max_bpm_diff
+    energy_diff = abs(float(planner.energy[i]) - float(planner.energy[j])) / planner.max_energy_jump
+    return np.inf if bpm_diff > 1 or energy_diff > 1 else bpm_diff + energy_diff + key_cost
+
+def bench_playlist(args: argparse.Namespace) -> bool:
+    report = Report()
+    rng = np.random.default_rng(0)
+    n = args.tracks
+    keys = rng.choice(list(dj_playlist_planner.CAMELOT) + ["unknown"], n)
+    bpm = rng.uniform(70, 180, n).astype(np.float32)
+    energy = rng.uniform(0, 1, n).astype(np.float32)
+    durations = rng.uniform(150, 420, n)
+
+    planner = dj_playlist_planner.PlaylistPlanner(bpm, keys, energy, durations)
+    # Neighbour rows against a brute-force scan of the whole library
+    worst = 0.0
+    for i in rng.choice(n, 200, replace=False):
+        key_costs = np.full(n, np.inf, dtype=np.float32)
+        for code, key_cost in dj_playlist_planner.compatible_codes(int(planner.codes[i])).items():
+            key_costs[planner.codes == code] = key_cost
+        bpm_diff = np.abs(planner.bpm[i] - planner.bpm) / np.float32(planner.max_bpm_diff)
+        energy_diff = np.abs(planner.energy[i] - planner.energy) / np.float32(planner.max_energy_jump)
+        costs = bpm_diff + energy_diff + key_costs
+        costs[(bpm_diff > 1) | (energy_diff > 1)] = np.inf
+        costs[i] = np.inf
+        expected = np.sort(costs)[:planner.neighbors.shape[1]]
+        worst = max(worst, float(np.max(np.abs(np.nan_to_num(expected - planner.costs[i], nan=0.0, posinf=1e9)))))
+    report.expect("neighbours are the cheapest transitions", worst <= 1e-5, f"max error {worst:.1e} on 200 rows")
+
+    curve = [0.4, 0.9, 0.6]
+    start = time.perf_counter()
+    plan = planner.plan(3600, curve)
+    plan_seconds = time.perf_counter() - start
+    steps = [transition_cost(planner, i, j) for i, j in zip(plan.indices, plan.indices[1:])]
+    report.expect("playlist fills the hour", plan.complete and plan.duration >= 3600, f"{plan.duration:.0f} s")
+    report.expect("every transition is compatible", all(np.isfinite(steps)) and
+                  len(set(plan.indices)) == len(plan.indices), f"{len(plan.indices)} tracks")
+    elapsed = np.cumsum(durations[plan.indices]) - durations[plan.indices] / 2
+    tracking = np.abs(energy[plan.indices] - dj_playlist_planner.energy_targets(curve, elapsed / 3600))
+    report.expect("energy follows the curve", float(tracking.mean()) < 0.1, f"mean error {tracking.mean():.3f}")
+
+    library = [{'index': i, 'bpm': float(bpm[i]), 'key': keys[i], 'energy': float(energy[i]),
+                'danceability': float(rng.uniform())} for i in range(n)]
+    start = time.perf_counter()
+    greedy = reference_playlist(library, durations, 3600, 0.7)
+    greedy_seconds = time.perf_counter() - start
+    greedy_steps = [transition_cost(planner, a['index'], b['index']) for a, b in zip(greedy, greedy[1:])]
+
+    print(f"\n{n} tracks, one-hour set")
+    print(f"     graph build                {planner.build_seconds * 1000:8.1f} ms (once per library change)")
+    print(f"     plan                       {plan_seconds * 1000:8.1f} ms, {len(plan.indices)} tracks, "
+          f"{len(steps)}/{len(steps)} transitions Camelot-compatible, mean cost {np.mean(steps):.2f}")
+    print(f"     greedy reference           {greedy_seconds * 1000:8.1f} ms, {len(greedy)} tracks, "
+          f"{np.isfinite(greedy_steps).sum()}/{len(greedy_steps)} transitions Camelot-compatible "
+          f"(durations precomputed)")
+    return not report.failed
+
+def load_test_separator(model: str) -> Callable:
+    """Stands in for spleeter: splits a file into frequency bands, then waits as long as a model would."""
+    import soundfile as sf
+    seconds = float(os.environ.get('DJ_BENCH_SEPARATION_SECONDS', '1'))
+
+    def separate(file_path: str) -> Dict[str, np.ndarray]:
+        if os.path.basename(file_path).startswith('crash'):
+            os._exit(3)
+        audio, sample_rate = sf.read(file_path, dtype='float32')
+        spectrum = np.fft.rfft(audio)
+        edges = np.r_[0, np.geomspace(100, sample_rate / 2, dj_stem_queue.stem_count(model))]
+        freqs = np.fft.rfftfreq(len(audio), 1 / sample_rate)
+        time.sleep(seconds)
+        return {f"band_{i}": np.fft.irfft(spectrum * ((freqs >= lo) & (freqs < hi)), len(audio))
+                for i, (lo, hi) in enumerate(zip(edges[:-1], edges[1:]))}
+    return separate
+
+def bench_stems(args: argparse.Namespace) -> bool:
+    report = Report()
+    os.environ['DJ_BENCH_SEPARATION_SECONDS'] = str(args.separation_seconds)
+    with tempfile.TemporaryDirectory(prefix='dj_stems_') as directory:
+        paths = write_tracks(directory, 5, args.seconds)
+        track_bytes = int(args.seconds * SAMPLE_RATE) * 4 * 4  # four float32 stems
+        cache = dj_stem_queue.StemCache(os.path.join(directory, 'stems'), max_bytes=int(3.5 * track_bytes))
+        queue = dj_stem_queue.StemQueue('test:4stems', workers=1, cache=cache,
+                                        load_separator=load_test_separator)
+
+        start = time.perf_counter()
+        first = queue.get(paths[0])
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        again = queue.get(paths[0])
+        warm = time.perf_counter() - start
+        report.check("repeat request returns the stored stems", again['band_1'], first['band_1'], 0.0)
+        report.expect("cached request is immediate", warm < 0.05, f"{warm * 1000:.1f} ms")
+
+        # Prefetch the rest, then ask for the last one: it overtakes the queue
+        finished = []
+        for path, future in zip(paths[1:], queue.prefetch(paths[1:])):
+            future.add_done_callback(lambda f, p=path: finished.append(p))
+        joined = queue.request(paths[4])
+        report.expect("request joins the queued job", joined is queue.prefetch([paths[4]])[0])
+        joined.result()
+        report.expect("on-demand request overtakes prefetches", finished.index(paths[4]) <= 1,
+                      f"finished {finished.index(paths[4]) + 1} of 4")
+        for future in queue.prefetch(paths[1:]):
+            future.result()
+        report.expect("prefetched stems are cached", all(cache.get(queue.content_hash(p), queue.model, 4) is not None
+                                                          for p in paths[2:]))
+        kept = cache.get(queue.content_hash(paths[0]), queue.model, 4)
+        report.expect("least recently used stems evicted", kept is None and cache.stats()['entries'] == 3,
+                      f"{cache.stats()['entries']} separations cached")
+        queue.close()
+        stored = cache.get(queue.content_hash(paths[3]), queue.model, 4)
+        reference = load_test_separator(queue.model)(paths[3])
+        report.check("stored stems match the separator", stored['band_0'], reference['band_0'], 1e-6)
+
+        # A worker dying fails its job; the queue restarts the pool for the next ones
+        crash = os.path.join(directory, 'crash.wav')
+        shutil.copy(paths[0], crash)
+        with open(crash, 'ab') as f:
+            f.write(b'\0')  # different contents, so not a cache hit
+        queue = dj_stem_queue.StemQueue('test:4stems', workers=1, cache=cache, load_separator=load_test_separator)
+        crashed = queue.request(crash)
+        after = queue.request(paths[0])
+        try:
+            crashed.result(60)
+            error = None
+        except Exception as e:
+            error = e
+        report.expect("worker crash fails its job", isinstance(error, BrokenProcessPool), repr(error))
+        try:
+            recovered = after.result(60) is not None and queue.get(paths[1], 60) is not None
+        except Exception as e:
+            recovered = False
+        report.expect("queue recovers from a worker crash", recovered and queue.status()['running'] == 0)
+        queue.close()
+
+    print(f"\n{args.seconds:g} s tracks, {args.separation_seconds:g} s per separation")
+    print(f"     first request (separates)  {cold * 1000:9.1f} ms")
+    print(f"     cached request             {warm * 1000:9.1f} ms")
+    return not report.failed
+
+def bench_reverb(args: argparse.Namespace) -> bool:
+    import soundfile as sf
+    from scipy import signal
+    report = Report()
+    audio = synthetic_track(3.0, channels=2, seed=3)
+    rng = np.random.default_rng(3)
+    ir = rng.standard_normal((20000, 2)) * np.exp(-np.arange(20000) / 4000)[:, None]
+
+    expected = signal.fftconvolve(audio, ir, axes=0)[:len(audio)]
+    report.check("offline convolution", dj_convolution.convolve(audio, ir), expected, 1e-9)
+    convolver = dj_convolution.PartitionedConvolver(ir, 2, args.block_size)
+    report.check("partitioned convolution in irregular blocks", in_blocks(convolver, audio), expected, 1e-9)
+    report.check("mono audio, mono IR", dj_convolution.convolve(audio[:, 0], ir[:, :1]),
+                 signal.fftconvolve(audio[:, 0], ir[:, 0])[:len(audio)], 1e-9)
+
+    # Shrinking the room mid-stream keeps the input history: after the change the
+    # output is the whole stream through the new IR
+    params = {"wet": 1.0, "room_size": 0.3, "damping": 0.5}
+    processor = dj_engine.ReverbProcessor("reverb", SAMPLE_RATE, 2, params)
+    first = processor.process(audio[:SAMPLE_RATE])
+    processor.set("room_size", 0.2)
+    second = processor.process(audio[SAMPLE_RATE:])
+    room = dj_convolution.reverb_impulse_response(SAMPLE_RATE, 0.2, 0.5)
+    report.check("room change keeps the tail", second,
+                 dj_convolution.convolve(audio, room)[SAMPLE_RATE:], 1e-9)
+    report.check("offline reverb matches the stream", first, dj_convolution.convolution_reverb(
+        audio[:SAMPLE_RATE], dj_convolution.reverb_impulse_response(SAMPLE_RATE, 0.3, 0.5), 1.0), 1e-9)
+
+    with tempfile.TemporaryDirectory(prefix='dj_reverb_') as directory:
+        path = os.path.join(directory, 'ir.wav')
+        sf.write(path, ir[:, 0] * 0.1, 48000, subtype='FLOAT')
+        loaded = dj_convolution.load_impulse_response(path, SAMPLE_RATE)
+        report.expect("IR file resampled to the track rate", loaded.shape == (round(20000 * 44100 / 48000), 1),
+                      f"{len(loaded)} frames")
+        report.check("IR file scaled to unit energy", np.array([np.sum(loaded ** 2)]), np.array([1.0]), 1e-9)
+
+    track = synthetic_track(args.seconds, channels=2)
+    print(f"\nOne core, {args.seconds:g} s stereo track, CPU time per second of audio")
+    print(f"     {'IR length':<10} {'partitions':>10} {'offline':>12} {'streaming':>12}")
+    for ir_seconds in (0.25, 0.5, 1.0, 2.0, 4.0, 8.0):
+        ir = dj_convolution.room_impulse_response(SAMPLE_RATE, ir_seconds / dj_convolution.RT60_PER_ROOM_SIZE, 0.5)
+        offline = timed(dj_convolution.convolve, track, ir) / args.seconds
+        convolver = dj_convolution.PartitionedConvolver(ir, 2, args.block_size)
+
+        def stream():
+            for start in range(0, len(track), args.block_size):
+                convolver.process(track[start:start + args.block_size])
+        streaming = timed(stream, repeat=1) / args.seconds
+        print(f"     {len(ir) / SAMPLE_RATE:<8.2f} s {convolver.partitions:>10} "
+              f"{offline * 1000:9.2f} ms {streaming * 1000:9.2f} ms")
+    print(f"     streaming latency: none added; block of {args.block_size} frames "
+          f"= {args.block_size / SAMPLE_RATE * 1000:.1f} ms")
+    return not report.failed
+
+def reference_beat_match(beats1, beats2, tempo_ratio, step=0.25):
+    """DJAgent.beat_match's original grid search, on beat times; `step` was 0.25 s.
+
+    Compares beats index by index as the original did, over the beats both
+    tracks have (the original raised when the second track had fewer).
+    """
+    best_offset = 0
+    best_score = float('inf')
+    count = min(len(beats1), len(beats2))
+    for offset in np.arange(-2, 2, step):
+        aligned_beats2 = beats2[:count] * tempo_ratio + offset
+        score = np.mean(np.abs(beats1[:count] - aligned_beats2))
+        if score < best_score:
+            best_score = score
+            best_offset = offset
+    return tempo_ratio, best_offset
+
+def rhythm_events(seconds: float, bpm: float, seed: int):
+    """Kick on every beat and randomly placed accented sixteenths: (times, amplitudes)."""
+    rng = np.random.default_rng(seed)
+    beats = np.arange(0, seconds, 60 / bpm)
+    sixteenths = np.arange(0, seconds, 15 / bpm)
+    extra = np.sort(rng.choice(sixteenths, len(sixteenths) // 6, replace=False))
+    times = np.r_[beats, extra]
+    amplitudes = np.r_[np.ones(len(beats)), rng.uniform(0.3, 0.8, len(extra))]
+    order = np.argsort(times)
+    return times[order], amplitudes[order]
+
+def render_events(times: np.ndarray, amplitudes: np.ndarray, seconds: float) -> np.ndarray:
+    from scipy import signal
+    pulses = np.zeros(int(seconds * SAMPLE_RATE))
+    positions = np.round(times * SAMPLE_RATE).astype(np.int64)
+    inside = (positions >= 0) & (positions < len(pulses))
+    np.add.at(pulses, positions[inside], amplitudes[inside])
+    t = np.arange(int(0.05 * SAMPLE_RATE)) / SAMPLE_RATE
+    hit = np.sin(2 * np.pi * 60 * t) * np.exp(-t * 60) + 0.3 * np.random.default_rng(0).standard_normal(len(t)) * np.exp(-t * 200)
+    return signal.fftconvolve(pulses, hit)[:len(pulses)]
+
+def bench_beat_align(args: argparse.Namespace) -> bool:
+    import librosa
+    report = Report()
+    hop = dj_beat_align.ONSET_HOP
+    frame_rate = SAMPLE_RATE / hop
+    rng = np.random.default_rng(7)
+    methods = ("original grid, 0.25 s steps", "original grid, 1 ms steps", "cross-correlation, beats",
+               "cross-correlation, onsets")
+    errors = {name: [] for name in methods}
+    phase_errors = {name: [] for name in methods}
+    ratio_errors = {name: [] for name in methods}
+    times = {name: 0.0 for name in methods}
+    confidences = []
+
+    for trial in range(args.trials):
+        bpm1, bpm2 = rng.uniform(118, 130), rng.uniform(118, 130)
+        offset = rng.uniform(-1.8, 1.8)
+        ratio = bpm2 / bpm1
+        events, amplitudes = rhythm_events(args.seconds + 4, bpm1, seed=trial)
+        audio1 = render_events(events, amplitudes, args.seconds)
+        # Track 2 plays the same events at its own tempo: time t lands at t * ratio + offset
+        audio2 = render_events((events - offset) / ratio, amplitudes, args.seconds)
+
+        tracked = []
+        for audio in (audio1, audio2):
+            tempo, frames = librosa.beat.beat_track(y=audio, sr=SAMPLE_RATE, hop_length=hop)
+            tracked.append((float(np.atleast_1d(tempo)[0]),
+                            librosa.frames_to_time(frames, sr=SAMPLE_RATE, hop_length=hop),
+                            dj_beat_align.onset_envelope(audio, SAMPLE_RATE)))
+        (tempo1, beats1, onsets1), (tempo2, beats2, onsets2) = tracked
+        nominal = tempo2 / tempo1
+
+        runs = {
+            methods[0]: lambda: reference_beat_match(beats1, beats2, nominal),
+            methods[1]: lambda: reference_beat_match(beats1, beats2, nominal, step=0.001),
+            methods[2]: lambda: dj_beat_align.align_beats(beats1, beats2, frame_rate, nominal, max_offset=2.0),
+            methods[3]: lambda: dj_beat_align.align_envelopes(onsets1, onsets2, frame_rate, nominal, max_offset=2.0),
+        }
+        for name, run in runs.items():
+            start = time.perf_counter()
+            result = run()
+            times[name] += time.perf_counter() - start
+            if isinstance(result, dj_beat_align.BeatAlignment):
+                found_ratio, found = result.tempo_ratio, result.offset
+            else:
+                found_ratio, found = result
+            if name == methods[3]:
+                confidences.append(result.confidence)
+                aligned = result
+            error = found - offset
+            period = 60 / bpm1
+            errors[name].append(abs(error))
+            phase_errors[name].append(abs((error + period / 2) % period - period / 2))
+            ratio_errors[name].append(abs(found_ratio / ratio - 1))
+
+    # Hits at random times, with no beat grid in common, should not look aligned
+    scattered = [render_events(np.sort(np.random.default_rng(seed).uniform(0, args.seconds, 200)),
+                               np.ones(200), args.seconds) for seed in (100, 101)]
+    unrelated = dj_beat_align.align_envelopes(*(dj_beat_align.onset_envelope(audio, SAMPLE_RATE)
+                                                for audio in scattered), frame_rate, 1.0, max_offset=2.0)
+
+    onset_errors = np.array(errors[methods[3]])
+    report.expect("onset alignment within a quarter frame", np.median(onset_errors) < 0.25 / frame_rate,
+                  f"median error {np.median(onset_errors) * 1000:.2f} ms, frame {1000 / frame_rate:.1f} ms")
+    report.expect("tempo ratio refined", np.median(ratio_errors[methods[3]]) < 0.001,
+                  f"median error {np.median(ratio_errors[methods[3]]) * 100:.3f}%")
+    report.expect("confident on matching tracks", min(confidences) > 0.5, f"lowest {min(confidences):.2f}")
+    report.expect("not confident on unrelated tracks", unrelated.confidence < 0.5 * min(confidences),
+                  f"{unrelated.confidence:.2f}")
+    # How a mix applies the ratio: stretched at 1 / ratio, track 2 plays at track 1's tempo
+    stretched = dj_pcm_cache.stretch(audio2, 1 / aligned.tempo_ratio)
+    restretched = dj_beat_align.align_envelopes(onsets1, dj_beat_align.onset_envelope(stretched, SAMPLE_RATE),
+                                                frame_rate, 1.0, max_offset=2.0)
+    report.expect("stretching at 1 / ratio matches the tempo", abs(restretched.tempo_ratio - 1) < 0.002,
+                  f"ratio after stretching {restretched.tempo_ratio:.4f}")
+    synthetic1 = dj_beat_align.beat_envelope(events, frame_rate)
+    synthetic2 = dj_beat_align.beat_envelope((events - 0.4321) / 1.0123, frame_rate)
+    exact = dj_beat_align.align_envelopes(synthetic1, synthetic2, frame_rate, 1.0, max_offset=2.0)
+    report.check("known sub-frame offset recovered", np.array([exact.offset]), np.array([0.4321]), 0.25 / frame_rate)
+
+    print(f"\n{args.trials} pairs of {args.seconds:g} s tracks, offsets within 1.8 s, tempo ratios 0.9-1.1; "
+          f"median errors")
+    print(f"     {'method':<30} {'offset':>10} {'beat phase':>11} {'tempo ratio':>12} {'time':>10}")
+    for name in methods:
+        print(f"     {name:<30} {np.median(errors[name]) * 1000:7.1f} ms {np.median(phase_errors[name]) * 1000:8.1f} ms "
+              f"{np.median(ratio_errors[name]) * 100:11.3f}% {times[name] / args.trials * 1000:7.2f} ms")
+    return not report.failed
+
+def bench_classify(args: argparse.Namespace) -> bool:
+    import librosa
+    report = Report()
+    rng = np.random.default_rng(11)
+    width = len(dj_classify.FEATURE_NAMES)
+    heads = len(dj_classify.GENRES) + len(dj_classify.MOODS)
+    hidden = args.hidden
+    features = rng.standard_normal((args.tracks, width)).astype(np.float32) * 3 + 1
+    classifier = dj_classify.TrackClassifier(dj_classify.MLP.random([width, hidden, hidden, heads]),
+                                             mean=np.ones(width), std=np.full(width, 3.0), threads=1)
+
+    batched = classifier.classify(features)
+    one_by_one = [classifier.classify(row)[0] for row in features[:256]]
+    report.expect("batches classify like single tracks", batched[:256] == one_by_one)
+    with tempfile.TemporaryDirectory(prefix='dj_classify_') as directory:
+        path = os.path.join(directory, 'classifier.npz')
+        classifier.save(path)
+        loaded = dj_classify.TrackClassifier.load(path, threads=1)
+        report.expect("saved classifier reloads", loaded.classify(features[:256]) == batched[:256])
+    audio = synthetic_track(args.seconds, channels=1)
+    vector = dj_classify.classification_features(audio, SAMPLE_RATE)
+    mfcc = librosa.feature.mfcc(y=audio, sr=SAMPLE_RATE, n_mfcc=dj_classify.N_MFCC).mean(axis=1)
+    centroid = librosa.feature.spectral_centroid(y=audio, sr=SAMPLE_RATE).mean()
+    report.check("features match separate librosa calls", vector,
+                 np.r_[mfcc, centroid, librosa.feature.spectral_rolloff(y=audio, sr=SAMPLE_RATE).mean()], 1e-2)
+
+    def separate_features():
+        librosa.feature.mfcc(y=audio, sr=SAMPLE_RATE, n_mfcc=13)
+        librosa.feature.spectral_centroid(y=audio, sr=SAMPLE_RATE)
+        librosa.feature.spectral_rolloff(y=audio, sr=SAMPLE_RATE)
+    print(f"\nFeature extraction, {args.seconds:g} s track")
+    print(f"     separate genre and mood features {timed(separate_features) * 1000:9.1f} ms")
+    print(f"     one shared STFT                  "
+          f"{timed(dj_classify.classification_features, audio, SAMPLE_RATE) * 1000:9.1f} ms")
+
+    # The per-track call pattern: a genre model and a mood model, one track per call
+    n_mfcc = dj_classify.N_MFCC
+    genre_model = dj_classify.MLP.random([n_mfcc, hidden, hidden, len(dj_classify.GENRES)])
+    mood_model = dj_classify.MLP.random([width - n_mfcc, hidden, hidden, len(dj_classify.MOODS)])
+
+    def per_track():
+        for row in features:
+            str(row[:n_mfcc])  # the text models were fed the printed features
+            int(genre_model(row[None, :n_mfcc]).argmax())
+            int(mood_model(row[None, n_mfcc:]).argmax())
+    print(f"\nClassification of {args.tracks} tracks, MLP {width}-{hidden}-{hidden}-{heads}, tracks per second")
+    with dj_classify.limited_threads(1):
+        reference = timed(per_track, repeat=1)
+    print(f"     {'per track, two models':<32} {args.tracks / reference:12.0f}")
+    for threads in sorted({1, os.cpu_count() or 1, dj_classify.CLASSIFIER_THREADS}):
+        classifier.threads = threads
+        for batch_size in (1, 8, 64, 256):
+            classifier.batch_size = batch_size
+            elapsed = timed(classifier.classify, features)
+            print(f"     {f'batch {batch_size}, {threads} thread(s)':<32} {args.tracks / elapsed:12.0f}"
+                  f"  {reference / elapsed:6.1f}x per track")
+    return not report.failed
+
+def reference_sections(y, sr):
+    """DJAgent._analyze_sections before the shared rhythm analysis."""
+    import librosa
+    S = np.abs(librosa.stft(y))
+    boundaries = librosa.segment.agglomerative(S, 100)
+    sections = []
+    for i in range(len(boundaries) - 1):
+        start = librosa.frames_to_time(boundaries[i], sr=sr)
+        end = librosa.frames_to_time(boundaries[i + 1], sr=sr)
+        section = y[int(start * sr):int(end * sr)]
+        energy = np.mean(librosa.feature.rms(y=section))
+        tempo = librosa.beat.tempo(y=section, sr=sr)[0]
+        sections.append({"start_time": float(start), "end_time": float(end), "energy": float(energy),
+                         "tempo": float(tempo)})
+    return sections
+
+def reference_danceability(y, sr):
+    import librosa
+    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+    spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
+    spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
+    tempo_score = min(tempo / 180.0, 1.0)
+    energy_score = np.mean(librosa.feature.rms(y=y))
+    spectral_score = np.mean(spectral_centroid) / (sr / 2)
+    return float(np.atleast_1d(tempo_score * 0.4 + energy_score * 0.3 + spectral_score * 0.3)[0])
+
+def reference_markers(audio, beat_frames, sr):
+    import librosa
+    markers = []
+    beat_times = librosa.frames_to_time(beat_frames, sr=sr)
+    energy = librosa.feature.rms(y=audio)[0]
+    energy_times = librosa.times_like(energy, sr=sr)
+    for i in range(len(beat_times)):
+        energy_idx = np.argmin(np.abs(energy_times - beat_times[i]))
+        markers.append({"time": float(beat_times[i]), "type": "beat", "energy": float(energy[energy_idx]),
+                        "confidence": 1.0})
+    return markers
+
+def reference_track_analysis(y, sr):
+    """The beat-dependent part of DJAgent's per-track analysis and beat grid, each re-tracking beats."""
+    import warnings
+    import librosa
+    warnings.filterwarnings('ignore', category=FutureWarning)  # librosa.beat.tempo, as originally called
+    tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
+    np.mean(librosa.feature.rms(y=y))
+    reference_sections(y, sr)
+    reference_danceability(y, sr)
+    # analyze_beat_grid
+    tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
+    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    np.mean(onset_env[beat_frames])
+    reference_sections(y, sr)
+    reference_markers(y, beat_frames, sr)
+
+def shared_track_analysis(y, sr):
+    import librosa
+    rhythm = dj_rhythm.analyze_rhythm(y, sr)
+    S = np.abs(librosa.stft(y, hop_length=rhythm.hop_length))
+    centroid = float(librosa.feature.spectral_centroid(S=S, sr=sr).mean())
+    dj_rhythm.sections(S, rhythm)
+    dj_rhythm.danceability(rhythm, centroid)
+    np.mean(rhythm.beat_strength)
+    dj_rhythm.beat_markers(rhythm)
+
+def bench_rhythm(args: argparse.Namespace) -> bool:
+    import librosa
+    report = Report()
+    rng = np.random.default_rng(5)
+    grid = np.sort(rng.uniform(0, 100, 5000))
+    values = np.r_[rng.uniform(-5, 105, 2000), grid[:50], (grid[:-1] + grid[1:])[:50] / 2]
+    report.check("nearest_index matches argmin", dj_rhythm.nearest_index(grid, values),
+                 np.array([np.argmin(np.abs(grid - v)) for v in values]), 0)
+
+    audio = synthetic_track(args.seconds, channels=1).astype(np.float32)
+    rhythm = dj_rhythm.analyze_rhythm(audio, SAMPLE_RATE)
+    tempo, beat_frames = librosa.beat.beat_track(y=audio, sr=SAMPLE_RATE)
+    report.check("beats match librosa beat tracking", rhythm.beat_frames, np.asarray(beat_frames), 0)
+    report.check("tempo matches librosa beat tracking", np.array([rhythm.tempo]), np.atleast_1d(tempo), 1e-9)
+    centroid = float(librosa.feature.spectral_centroid(y=audio, sr=SAMPLE_RATE).mean())
+    report.check("danceability unchanged", np.array([dj_rhythm.danceability(rhythm, centroid)]),
+                 np.array([reference_danceability(audio, SAMPLE_RATE)]), 1e-6)
+    markers = dj_rhythm.beat_markers(rhythm)
+    expected = reference_markers(audio, beat_frames, SAMPLE_RATE)
+    report.check("marker times unchanged", np.array([m["time"] for m in markers]),
+                 np.array([m["time"] for m in expected]), 1e-9)
+    report.check("marker energies unchanged", np.array([m["energy"] for m in markers]),
+                 np.array([m["energy"] for m in expected]), 1e-6)
+    report.expect("downbeats every fourth beat", np.array_equal(np.diff(rhythm.downbeat_frames),
+                                                                np.diff(rhythm.beat_frames[::4])[:len(rhythm.downbeat_frames) - 1]))
+    S = np.abs(librosa.stft(audio))
+    sections = dj_rhythm.sections(S, rhythm)
+    starts = np.array([section["start_time"] for section in sections])
+    ends = np.array([section["end_time"] for section in sections])
+    report.expect("sections tile the track", len(sections) > 0 and starts[0] == 0 and np.array_equal(starts[1:], ends[:-1])
+                  and abs(ends[-1] - S.shape[1] * dj_beat_align.ONSET_HOP / SAMPLE_RATE) < 1e-9,
+                  f"{len(sections)} sections")
+    on_beats = np.isin(np.round(starts[1:] * rhythm.frame_rate).astype(np.int64), rhythm.beat_frames)
+    report.expect("section boundaries fall on beats", bool(on_beats.all()))
+
+    # A track that speeds up from 120 to 128 BPM halfway through
+    half = args.seconds / 2
+    beats = np.r_[np.arange(0, half, 0.5), np.arange(half, args.seconds, 60 / 128)]
+    ramp = dj_rhythm.analyze_rhythm(render_events(beats, np.ones(len(beats)), args.seconds), SAMPLE_RATE)
+    first, second = ramp.tempo_between(2, half - 2), ramp.tempo_between(half + 2, args.seconds - 2)
+    report.expect("tempo curve follows a tempo change", abs(first - 120) < 2 and abs(second - 128) < 2,
+                  f"{first:.1f} then {second:.1f} BPM")
+
+    print(f"\nBeat-dependent analysis of one {args.seconds:g} s track "
+          f"(tempo, energy, sections, danceability, beat grid, markers)")
+    reference = timed(reference_track_analysis, audio, SAMPLE_RATE, repeat=1)
+    report.row("beat tracking per feature", args.seconds, reference)
+    report.row("shared rhythm analysis", args.seconds, timed(shared_track_analysis, audio, SAMPLE_RATE), reference)
+    return not report.failed
+
+MULTIBAND_SETTINGS = [
+    {"threshold": -20.0, "ratio": 4.0, "attack": 0.005, "release": 0.1},
+    {"threshold": -24.0, "ratio": 3.0, "attack": 0.002, "release": 0.05, "makeup": 2.0},
+    {"threshold": -30.0, "ratio": 6.0, "attack": 0.001, "release": 0.2},
+]
+
+def reference_multiband(audio, sample_rate, compress):
+    """DJAgent.apply_multi_band_compression before the crossover bank; `compress(band, settings)`."""
+    from scipy.signal import butter, filtfilt
+    nyquist = sample_rate / 2
+    low_cutoff = 200 / nyquist
+    high_cutoff = 2000 / nyquist
+    b_low, a_low = butter(4, low_cutoff, btype='low')
+    low_band = filtfilt(b_low, a_low, audio, axis=0)
+    b_mid, a_mid = butter(4, [low_cutoff, high_cutoff], btype='band')
+    mid_band = filtfilt(b_mid, a_mid, audio, axis=0)
+    b_high, a_high = butter(4, high_cutoff, btype='high')
+    high_band = filtfilt(b_high, a_high, audio, axis=0)
+    return sum(compress(band, settings) for band, settings in zip((low_band, mid_band, high_band), MULTIBAND_SETTINGS))
+
+def reference_band_gains(bands, sample_rate, settings):
+    """Per-sample loop of the multi-band gain computer: (bands, frames, channels) to (bands, frames)."""
+    gains = np.empty(bands.shape[:2])
+    for b, band in enumerate(settings):
+        attack = dj_multiband.time_constant(band["attack"], sample_rate)
+        release = dj_multiband.time_constant(band["release"], sample_rate)
+        smoothed = 0.0
+        for i in range(bands.shape[1]):
+            level = 20 * np.log10(max(np.max(np.abs(bands[b, i])), 1e-6))
+            target = max(level - band["threshold"], 0) * (1 - 1 / band["ratio"])
+            coefficient = attack if target > smoothed else release
+            smoothed += (target - smoothed) * coefficient
+            gains[b, i] = 10 ** ((band.get("makeup", 0.0) - smoothed) / 20)
+    return gains
+
+def bench_multiband(args: argparse.Namespace) -> bool:
+    from scipy import signal
+    report = Report()
+    frequencies = dj_multiband.CROSSOVER_FREQUENCIES
+    bank = dj_multiband.CrossoverBank(frequencies, SAMPLE_RATE, 1)
+    impulse = np.zeros((1 << 15, 1))
+    impulse[0] = 1
+    bands = bank.process(impulse)
+    report.check("bands sum to the crossover all-pass", bands.sum(axis=0),
+                 signal.sosfilt(bank.allpass(), impulse, axis=0), 1e-12)
+    response = np.abs(np.fft.rfft(bands.sum(axis=0)[:, 0]))
+    report.check("flat magnitude response", response, np.ones(len(response)), 1e-9)
+    bins = np.fft.rfftfreq(len(impulse), 1 / SAMPLE_RATE)
+    at_crossovers = [np.interp(f, bins, np.abs(np.fft.rfft(bands[i, :, 0]))) for i, f in enumerate(frequencies)]
+    report.check("bands at -6 dB at their crossovers", np.array(at_crossovers), np.full(len(frequencies), 0.5), 1e-3)
+
+    golden = synthetic_track(2.0, channels=2, seed=3)
+    compressor = dj_multiband.MultibandCompressor(SAMPLE_RATE, 2, MULTIBAND_SETTINGS)
+    split = compressor.bank.process(golden)
+    report.check("gains match the per-sample loop", compressor.gains(split),
+                 reference_band_gains(split, SAMPLE_RATE, MULTIBAND_SETTINGS), 1e-9)
+    whole = dj_multiband.multiband_compress(golden, SAMPLE_RATE, MULTIBAND_SETTINGS)
+    report.check("mono matches one channel of stereo",
+                 dj_multiband.multiband_compress(golden[:, 0], SAMPLE_RATE, MULTIBAND_SETTINGS),
+                 dj_multiband.multiband_compress(golden[:, :1], SAMPLE_RATE, MULTIBAND_SETTINGS)[:, 0], 1e-12)
+    parameters = dj_multiband.band_parameters(dict(zip(dj_multiband.BANDS, MULTIBAND_SETTINGS)))
+    processor = dj_engine.MultibandCompressorProcessor("multiband_compressor", SAMPLE_RATE, 2, parameters)
+    report.check("blocks match the whole signal", in_blocks(processor, golden), whole, 1e-9)
+    quiet = 0.01 * golden
+    report.check("below threshold is the all-pass",
+                 dj_multiband.multiband_compress(quiet, SAMPLE_RATE, [dict(s, makeup=0.0) for s in MULTIBAND_SETTINGS]),
+                 signal.sosfilt(bank.allpass(), quiet, axis=0), 1e-12)
+    loud = np.abs(whole).max() / np.abs(golden).max()
+    report.expect("loud input is compressed", loud < 0.8, f"peak ratio {loud:.2f}")
+
+    track = synthetic_track(args.seconds, channels=2)
+    excerpt = track[:SAMPLE_RATE // 2]
+    print(f"\nOne core, {args.seconds:g} s stereo track (per-sample compressors timed on a "
+          f"{len(excerpt) / SAMPLE_RATE:g} s excerpt and scaled)")
+    linear = [dict(threshold=10 ** (s["threshold"] / 20), ratio=s["ratio"],
+                   attack=dj_multiband.time_constant(s["attack"], SAMPLE_RATE),
+                   release=dj_multiband.time_constant(s["release"], SAMPLE_RATE)) for s in MULTIBAND_SETTINGS]
+    original = timed(reference_multiband, excerpt, SAMPLE_RATE,
+                     lambda band, _: per_channel(reference_compressor, band, *linear[0].values()),
+                     repeat=1) * len(track) / len(excerpt)
+    report.row("filtfilt bands, per-sample loop", args.seconds, original)
+    report.row("filtfilt bands, dj_dsp.compressor", args.seconds,
+               timed(reference_multiband, track, SAMPLE_RATE, lambda band, _: dj_dsp.compressor(band, *linear[0].values())),
+               original)
+    offline = timed(dj_multiband.multiband_compress, track, SAMPLE_RATE, MULTIBAND_SETTINGS)
+    report.row("crossover bank, whole track", args.seconds, offline, original)
+    processor.reset()
+    streamed = timed(lambda: [processor.process(track[i:i + args.block_size])
+                              for i in range(0, len(track), args.block_size)], repeat=1)
+    report.row(f"crossover bank, {args.block_size}-frame blocks", args.seconds, streamed, original)
+    report.expect("streaming faster than real time", streamed < args.seconds,
+                  f"{args.seconds / streamed:.0f}x real time")
+    return not report.failed
+
+COMMANDS: Dict[str, Callable[[argparse.Namespace], bool]] = {
+    'render': bench_render,
+    'effects': bench_effects,
+    'engine': bench_engine,
+    'library': bench_library,
+    'analysis': bench_analysis,
+    'pcm-cache': bench_pcm_cache,
+    'playlist': bench_playlist,
+    'stems': bench_stems,
+    'reverb': bench_reverb,
+    'beat-align': bench_beat_align,
+    'classify': bench_classify,
+    'rhythm': bench_rhythm,
+    'multiband': bench_multiband,
+}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    effects = subparsers.add_parser('effects', help="flanger, phaser and compressor")
+    effects.add_argument('--seconds', type=float, default=60.0, help="length of the benchmark track")
+
+    engine = subparsers.add_parser('engine', help="streaming engine: block equivalence, timing, underruns")
+    engine.add_argument('--seconds', type=float, default=5.0, help="length of the real-time playback")
+    engine.add_argument('--block-size', type=int, default=512)
+
+    render = subparsers.add_parser('render', help="offline mix rendering to FLAC")
+    render.add_argument('--tracks', type=int, default=4)
+    render.add_argument('--seconds', type=float, default=60.0, help="length of each track")
+    render.add_argument('--workers', type=int, default=None, help="defaults to the CPU count")
+
+    library = subparsers.add_parser('library', help="track database: incremental rescans and loading")
+    library.add_argument('--tracks', type=int, default=20000, help="size of the synthetic library")
+
+    analysis = subparsers.add_parser('analysis', help="parallel library analysis: throughput and failure isolation")
+    analysis.add_argument('--files', type=int, default=16)
+    analysis.add_argument('--seconds', type=float, default=30.0, help="length of each track")
+    analysis.add_argument('--workers', type=int, default=None, help="defaults to the CPU count")
+
+    pcm_cache = subparsers.add_parser('pcm-cache', help="decoded PCM cache: repeated mixes of one pair of tracks")
+    pcm_cache.add_argument('--seconds', type=float, default=120.0, help="length of each track")
+    pcm_cache.add_argument('--repeat', type=int, default=5)
+
+    playlist = subparsers.add_parser('playlist', help="playlist planner: graph build and planning time")
+    playlist.add_argument('--tracks', type=int, default=50000, help="size of the synthetic library")
+
+    stems = subparsers.add_parser('stems', help="stem cache and background separation queue")
+    stems.add_argument('--seconds', type=float, default=30.0, help="length of each track")
+    stems.add_argument('--separation-seconds', type=float, default=1.0, help="simulated model time per track")
+
+    reverb = subparsers.add_parser('reverb', help="convolution reverb: golden checks and CPU cost by IR length")
+    reverb.add_argument('--seconds', type=float, default=10.0, help="length of the benchmark track")
+    reverb.add_argument('--block-size', type=int, default=512, help="streaming block and IR partition size")
+
+    beat_align = subparsers.add_parser('beat-align', help="beat alignment: accuracy and speed against grid search")
+    beat_align.add_argument('--seconds', type=float, default=60.0, help="length of each track")
+    beat_align.add_argument('--trials', type=int, default=5)
+
+    classify = subparsers.add_parser('classify', help="batched genre and mood classification throughput")
+    classify.add_argument('--tracks', type=int, default=4096)
+    classify.add_argument('--seconds', type=float, default=30.0, help="length of the feature extraction track")
+    classify.add_argument('--hidden', type=int, default=256, help="hidden layer width of the test model")
+
+    rhythm = subparsers.add_parser('rhythm', help="shared rhythm analysis: golden checks and per-track analysis time")
+    rhythm.add_argument('--seconds', type=float, default=60.0, help="length of the benchmark track")
+
+    multiband = subparsers.add_parser('multiband', help="multi-band compressor: crossover and golden checks, speed")
+    multiband.add_argument('--seconds', type=float, default=60.0, help="length of the benchmark track")
+    multiband.add_argument('--block-size', type=int, default=512, help="streaming block size")
+
+    args = parser.parse_args()
+    if not COMMANDS[args.command](args):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Batched genre and mood classification of tracks from numeric features.
+
+Each track is summarised by a short feature vector (mean MFCCs, spectral
+centroid and rolloff). A classifier scores many vectors in one forward
+pass, with genre and mood as two heads of the same model, and is loaded
+once per process. Models are either a small MLP stored as `.npz` weights
+(run with numpy) or a TorchScript module (`.pt`).
+"""
+import os
+import json
+import contextlib
+import logging
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_PATH = os.getenv('DJ_CLASSIFIER_PATH', 'models/dj_track_classifier.npz')
+# Tracks per forward pass, and CPU threads a forward pass may use (0: up to 4 cores)
+CLASSIFIER_BATCH = int(os.getenv('DJ_CLASSIFIER_BATCH', '64'))
+CLASSIFIER_THREADS = int(os.getenv('DJ_CLASSIFIER_THREADS', '0')) or min(4, os.cpu_count() or 1)
+
+GENRES = ["house", "techno", "trance", "dubstep", "drum_and_bass"]
+MOODS = ["energetic", "calm", "happy", "sad", "dark"]
+
+N_MFCC = 13
+FEATURE_NAMES = [f"mfcc_{i}" for i in range(N_MFCC)] + ["spectral_centroid", "spectral_rolloff"]
+
+def classification_features(y: np.ndarray, sample_rate: int, S: Optional[np.ndarray] = None) -> np.ndarray:
+    """The feature vector the classifiers take, from one STFT of the track (`S`, if already computed)."""
+    import librosa
+    if S is None:
+        S = np.abs(librosa.stft(np.asarray(y, dtype=np.float32)))
+    mel = librosa.feature.melspectrogram(S=S ** 2, sr=sample_rate)
+    mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)
+    centroid = librosa.feature.spectral_centroid(S=S, sr=sample_rate)
+    rolloff = librosa.feature.spectral_rolloff(S=S, sr=sample_rate)
+    return np.concatenate([mfcc.mean(axis=1), [centroid.mean(), rolloff.mean()]]).astype(np.float32)
+
+def limited_threads(threads: int):
+    """Context limiting the BLAS thread pools of this process, where threadpoolctl is installed."""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return contextlib.nullcontext()
+    return threadpool_limits(threads)
+
+class MLP:
+    """Fully connected ReLU network in numpy: `layers` is [(weights, bias), ...]."""
+
+    def __init__(self, layers: Sequence[Tuple[np.ndarray, np.ndarray]]):
+        self.layers = [(np.asarray(w, dtype=np.float32), np.asarray(b, dtype=np.float32)) for w, b in layers]
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        for i, (w, b) in enumerate(self.layers):
+            x = x @ w
+            x += b
+            if i < len(self.layers) - 1:
+                np.maximum(x, 0, out=x)
+        return x
+
+    @classmethod
+    def random(cls, sizes: Sequence[int], seed: int = 0) -> 'MLP':
+        rng = np.random.default_rng(seed)
+        return cls([(rng.standard_normal((n_in, n_out)) / np.sqrt(n_in), np.zeros(n_out))
+                    for n_in, n_out in zip(sizes[:-1], sizes[1:])])
+
+class TrackClassifier:
+    """Genre and mood of many tracks at once.
+
+    `forward` maps a (tracks, features) float32 batch, already
+    standardised with `mean` and `std`, to (tracks, genres + moods) logits.
+    Forward passes use at most `threads` BLAS threads.
+    """
+
+    def __init__(self, forward: Callable[[np.ndarray], np.ndarray], mean: np.ndarray, std: np.ndarray,
+                 genres: Sequence[str] = GENRES, moods: Sequence[str] = MOODS, batch_size: int = CLASSIFIER_BATCH,
+                 threads: int = CLASSIFIER_THREADS):
+        self.forward = forward
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.std = np.asarray(std, dtype=np.float32)
+        self.genres = list(genres)
+        self.moods = list(moods)
+        self.batch_size = batch_size
+        self.threads = threads
+
+    def classify(self, features: np.ndarray) -> List[Tuple[str, str]]:
+        """(genre, mood) of every row of `features`, one forward pass per batch."""
+        x = (np.asarray(features, dtype=np.float32).reshape(-1, len(self.mean)) - self.mean) / self.std
+        labels = []
+        with limited_threads(self.threads):
+            batches = [self.forward(x[start:start + self.batch_size]) for start in range(0, len(x), self.batch_size)]
+        for logits in batches:
+            genre_ids = logits[:, :len(self.genres)].argmax(axis=1)
+            mood_ids = logits[:, len(self.genres):].argmax(axis=1)
+            labels += [(self.genres[g], self.moods[m]) for g, m in zip(genre_ids, mood_ids)]
+        return labels
+
+    def save(self, path: str) -> None:
+        """Store an MLP classifier as `.npz` weights."""
+        if not isinstance(self.forward, MLP):
+            raise TypeError("only MLP classifiers can be saved as .npz")
+        arrays = {f"w{i}": w for i, (w, _) in enumerate(self.forward.layers)}
+        arrays.update({f"b{i}": b for i, (_, b) in enumerate(self.forward.layers)})
+        np.savez(path, mean=self.mean, std=self.std, genres=np.array(self.genres), moods=np.array(self.moods),
+                 **arrays)
+
+    @classmethod
+    def load(cls, path: str = CLASSIFIER_PATH, threads: int = CLASSIFIER_THREADS) -> 'TrackClassifier':
+        """An `.npz` MLP (see save), or a TorchScript `.pt` module.
+
+        A TorchScript module's `classifier.json` extra file holds its mean,
+        std, genres and moods.
+        """
+        if path.endswith('.pt'):
+            import torch
+            torch.set_num_threads(threads)
+            extra = {'classifier.json': ''}
+            module = torch.jit.load(path, map_location='cpu', _extra_files=extra).eval()
+            meta = json.loads(extra['classifier.json'])
+
+            def forward(x: np.ndarray) -> np.ndarray:
+                with torch.inference_mode():
+                    return module(torch.from_numpy(np.ascontiguousarray(x))).numpy()
+            return cls(forward, meta['mean'], meta['std'], meta.get('genres', GENRES), meta.get('moods', MOODS),
+                       threads=threads)
+        with np.load(path) as data:
+            count = len([name for name in data.files if name.startswith('w')])
+            layers = [(data[f"w{i}"], data[f"b{i}"]) for i in range(count)]
+            return cls(MLP(layers), data['mean'], data['std'], data['genres'].tolist(), data['moods'].tolist(),
+                       threads=threads)
+
+_classifier: Optional[TrackClassifier] = None
+_classifier_lock = threading.Lock()
+_classifier_missing = False
+
+def get_track_classifier() -> Optional[TrackClassifier]:
+    """This process's classifier, loaded on first use; None if there is no model file."""
+    global _classifier, _classifier_missing
+    with _classifier_lock:
+        if _classifier is None and not _classifier_missing:
+            if os.path.exists(CLASSIFIER_PATH):
+                _classifier = TrackClassifier.load()
+            else:
+                _classifier_missing = True
+                logger.warning(f"No track classifier at {CLASSIFIER_PATH}; genre and mood will be unknown")
+    return _classifier
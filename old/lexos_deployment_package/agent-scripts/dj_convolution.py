@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Convolution reverb for the DJ agent.
+
+The reverb is the dry signal convolved with an impulse response (IR),
+either recorded in a real room and loaded from a WAV file or synthesised
+from the agent's `room_size` and `damping` parameters. Whole tracks are
+convolved in one FFT overlap-add pass; streams use uniformly partitioned
+convolution, which adds no latency and costs the same for every block.
+"""
+import os
+import math
+import functools
+from typing import Optional
+
+import numpy as np
+from scipy import fft, signal
+
+REVERB_IR_PATH = os.getenv('DJ_REVERB_IR', '')
+MAX_IR_SECONDS = float(os.getenv('DJ_REVERB_MAX_IR_SECONDS', '10'))
+
+# Early reflections of the synthetic room: (delay as a fraction of room_size, damping fraction)
+ROOM_TAPS = ((0.8, 0.8), (0.5, 0.6), (0.3, 0.4), (0.2, 0.2))
+# Decay time (RT60) of the synthetic room's diffuse tail per unit of room_size, in seconds
+RT60_PER_ROOM_SIZE = 2.0
+
+def _normalized(ir: np.ndarray) -> np.ndarray:
+    # Unit energy keeps the wet signal about as loud as the dry one
+    energy = np.sqrt(np.sum(ir ** 2) / ir.shape[1])
+    ir = ir / energy if energy > 0 else ir
+    ir.setflags(write=False)
+    return ir
+
+@functools.lru_cache(maxsize=8)
+def _load_impulse_response(path: str, mtime_ns: int, sample_rate: int, max_seconds: float) -> np.ndarray:
+    import soundfile as sf
+    ir, file_rate = sf.read(path, dtype='float64', always_2d=True)
+    if file_rate != sample_rate:
+        divisor = math.gcd(int(file_rate), int(sample_rate))
+        ir = signal.resample_poly(ir, sample_rate // divisor, file_rate // divisor, axis=0)
+    return _normalized(ir[:int(max_seconds * sample_rate)])
+
+def load_impulse_response(path: str, sample_rate: int, max_seconds: float = MAX_IR_SECONDS) -> np.ndarray:
+    """An IR from an audio file as (frames, channels), resampled and scaled to unit energy.
+
+    Results are cached until the file changes; the array is read-only.
+    """
+    return _load_impulse_response(os.path.abspath(path), os.stat(path).st_mtime_ns, sample_rate, max_seconds)
+
+@functools.lru_cache(maxsize=32)
+def room_impulse_response(sample_rate: int, room_size: float, damping: float, seed: int = 0) -> np.ndarray:
+    """Synthetic mono IR, (frames, 1): discrete early reflections and a diffuse tail.
+
+    The reflections sit where DJAgent's old delay-line reverb put its
+    taps. The tail is exponentially decaying noise, low-passed more the
+    higher `damping` is. Read-only.
+    """
+    rt60 = max(room_size, 0.0) * RT60_PER_ROOM_SIZE
+    length = max(int(min(rt60, MAX_IR_SECONDS) * sample_rate), 1)
+    ir = np.zeros(length)
+    for fraction, damping_fraction in ROOM_TAPS:
+        ir[min(int(room_size * fraction * sample_rate), length - 1)] += (1 - damping * damping_fraction) / len(ROOM_TAPS)
+    start = int(room_size * min(fraction for fraction, _ in ROOM_TAPS) * sample_rate)
+    if start < length:
+        t = np.arange(length - start) / sample_rate
+        tail = np.random.default_rng(seed).standard_normal(len(t)) * np.exp(-6.91 * t / rt60)
+        pole = 0.9 * min(max(damping, 0.0), 1.0)
+        tail = signal.lfilter([1 - pole], [1, -pole], tail)
+        # As much energy in the tail as in the reflections
+        tail *= np.sqrt(np.sum(ir ** 2) / np.sum(tail ** 2))
+        ir[start:] += tail
+    return _normalized(ir[:, None])
+
+def reverb_impulse_response(sample_rate: int, room_size: float, damping: float,
+                            ir_path: Optional[str] = None) -> np.ndarray:
+    """The IR the reverb uses: the file at `ir_path` (default DJ_REVERB_IR) if set, else a synthetic room."""
+    ir_path = REVERB_IR_PATH if ir_path is None else ir_path
+    if ir_path:
+        return load_impulse_response(ir_path, sample_rate)
+    return room_impulse_response(sample_rate, round(float(room_size), 4), round(float(damping), 4))
+
+def convolve(audio: np.ndarray, ir: np.ndarray) -> np.ndarray:
+    """`audio` convolved with `ir`, cut to the length of `audio`.
+
+    Audio is (frames,) or (frames, channels); the IR is (frames, 1) or
+    (frames, channels).
+    """
+    x = np.asarray(audio, dtype=np.float64)
+    if not len(x):
+        return x.copy()
+    x2 = x.reshape(len(x), -1)
+    wet = signal.oaconvolve(x2, ir, axes=0)[:len(x)]
+    if wet.shape[1] != x2.shape[1]:
+        wet = wet[:, :1]  # mono audio through a multichannel IR: first channel only
+    return wet.reshape(x.shape)
+
+def convolution_reverb(audio: np.ndarray, ir: np.ndarray, wet: float) -> np.ndarray:
+    """Whole-signal reverb: `wet` of the convolved signal and `1 - wet` of the dry one."""
+    return wet * convolve(audio, ir) + (1 - wet) * np.asarray(audio, dtype=np.float64)
+
+class PartitionedConvolver:
+    """Streaming convolution with the IR split into partitions of `partition_size` frames.
+
+    Uniformly partitioned overlap-save: every partition's spectrum is
+    computed once, and each block of input costs one FFT, one inverse FFT
+    and a multiply-add with the spectra of the previous input blocks (the
+    frequency-domain delay line). Blocks of any length are accepted with
+    no added latency. A block that ends inside a partition is convolved
+    with the rest of the partition zero-padded, which gives its outputs
+    exactly, and the partition is finished when the next block arrives.
+    """
+
+    def __init__(self, ir: np.ndarray, channels: int, partition_size: int = 512):
+        self.channels = channels
+        self.partition_size = partition_size
+        self.history = None
+        self.set_impulse_response(ir)
+        self.reset()
+
+    @property
+    def partitions(self) -> int:
+        return self.depth + 1
+
+    def set_impulse_response(self, ir: np.ndarray) -> None:
+        """Swap the IR, keeping as much input history as the old IR needed.
+
+        The tail of what was already played carries on through the new IR.
+        """
+        size = self.partition_size
+        ir = np.asarray(ir, dtype=np.float64).reshape(len(ir), -1)
+        partitions = max(-(-len(ir) // size), 1)
+        padded = np.zeros((partitions, 2 * size, self.channels))
+        padded[:, :size] = np.broadcast_to(
+            np.pad(ir, ((0, partitions * size - len(ir)), (0, 0))).reshape(partitions, size, -1),
+            (partitions, size, self.channels))
+        spectra = fft.rfft(padded, axis=1).reshape(partitions, -1)
+        previous = self._window() if self.history is not None else None
+        self.first = spectra[0].reshape(size + 1, self.channels)
+        # The other partitions, oldest input first, one row per (bin, channel)
+        self.filters = np.ascontiguousarray(spectra[:0:-1].T)[:, :, None]
+        if previous is not None and previous.shape[1] != self.depth:
+            kept = previous[:, previous.shape[1] - min(previous.shape[1], self.depth):]
+            self._allocate()
+            self.history[:, self.depth - kept.shape[1]:self.depth] = kept
+            self.history[:, 2 * self.depth - kept.shape[1]:] = kept
+        self._tail = None
+
+    @property
+    def depth(self) -> int:
+        """Past input spectra the delay line holds"""
+        return self.filters.shape[1]
+
+    def _allocate(self) -> None:
+        # Each spectrum is written twice, so the last `depth` always form one contiguous window
+        self.history = np.zeros(((self.partition_size + 1) * self.channels, 2 * self.depth), dtype=np.complex128)
+        self.newest = self.depth - 1
+
+    def _window(self) -> np.ndarray:
+        return self.history[:, self.newest + 1:self.newest + 1 + self.depth]
+
+    def reset(self) -> None:
+        self._allocate()
+        self.frame = np.zeros((2 * self.partition_size, self.channels))  # previous partition then the current one
+        self.filled = 0  # frames of the current partition received
+        self._tail = None
+
+    def _tail_spectrum(self) -> np.ndarray:
+        """Sum of every past input spectrum times its partition of the IR."""
+        if self._tail is None:
+            if self.depth:
+                tail = np.matmul(self._window()[:, None, :], self.filters)
+                self._tail = tail.reshape(self.partition_size + 1, self.channels)
+            else:
+                self._tail = 0
+        return self._tail
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Convolve the next (frames, channels) block of the stream."""
+        size = self.partition_size
+        output = np.empty((len(block), self.channels))
+        position = 0
+        while position < len(block):
+            start = self.filled
+            take = min(size - start, len(block) - position)
+            self.frame[size + start:size + start + take] = block[position:position + take]
+            self.filled += take
+            current = fft.rfft(self.frame, axis=0)
+            y = fft.irfft(self._tail_spectrum() + current * self.first, n=2 * size, axis=0)
+            output[position:position + take] = y[size + start:size + self.filled]
+            position += take
+            if self.filled == size:
+                if self.depth:
+                    self.newest = (self.newest + 1) % self.depth
+                    self.history[:, self.newest] = self.history[:, self.newest + self.depth] = current.ravel()
+                self.frame[:size] = self.frame[size:]
+                self.frame[size:] = 0
+                self.filled = 0
+                self._tail = None
+        return output
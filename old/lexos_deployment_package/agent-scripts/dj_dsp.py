@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Vectorized implementations of DJAgent's sample-by-sample effects.
+
+Audio is indexed by sample along axis 0, so mono `(n,)` and multi-channel
+`(n, channels)` arrays are both accepted. Results match the original
+per-sample loops up to floating point rounding.
+"""
+import numpy as np
+
+# Recurrences shorter than this are solved with a plain loop
+_RECURRENCE_BASE = 32
+
+def linear_recurrence(a: np.ndarray, b: np.ndarray, initial=0.0) -> np.ndarray:
+    """Solve y[i] = a[i] * y[i-1] + b[i] along axis 0, with y[-1] = initial.
+
+    Uses odd-even reduction: adjacent steps are composed pairwise into a
+    problem of half the length, solved recursively, and the skipped steps
+    are filled in afterwards. The total work stays linear in len(b).
+    """
+    b = np.asarray(b, dtype=np.float64)
+    a = np.broadcast_to(np.asarray(a, dtype=np.float64), b.shape)
+    initial = np.broadcast_to(np.asarray(initial, dtype=np.float64), b.shape[1:])
+    return _reduce(a, b, initial)
+
+def _reduce(a: np.ndarray, b: np.ndarray, initial: np.ndarray) -> np.ndarray:
+    n = len(b)
+    y = np.empty(b.shape)
+    if n <= _RECURRENCE_BASE:
+        previous = initial
+        for i in range(n):
+            previous = a[i] * previous + b[i]
+            y[i] = previous
+        return y
+
+    m = n // 2
+    a_even, a_odd = a[0:2 * m:2], a[1:2 * m:2]
+    b_even, b_odd = b[0:2 * m:2], b[1:2 * m:2]
+    # Steps 2k and 2k+1 composed map y[2k-1] straight to y[2k+1]
+    y_odd = _reduce(a_odd * a_even, a_odd * b_even + b_odd, initial)
+    y[1:2 * m:2] = y_odd
+    y[0] = a[0] * initial + b[0]
+    y[2:2 * m:2] = a_even[1:] * y_odd[:-1] + b_even[1:]
+    if n % 2:
+        y[-1] = a[-1] * y[-2] + b[-1]
+    return y
+
+def lfo(n: int, sample_rate: int, rate: float, depth: float) -> np.ndarray:
+    """Sine LFO of `n` samples"""
+    t = np.arange(n) / sample_rate
+    return depth * np.sin(2 * np.pi * rate * t)
+
+def _per_sample(values: np.ndarray, audio: np.ndarray) -> np.ndarray:
+    """Reshape a per-sample vector to broadcast against `audio`'s channels."""
+    return values.reshape((-1,) + (1,) * (audio.ndim - 1))
+
+def flanger(audio: np.ndarray, sample_rate: int, rate: float, depth: float, mix: float) -> np.ndarray:
+    """Add a copy of the signal behind a 2 ms delay swept by an LFO."""
+    n = len(audio)
+    delay = int(0.002 * sample_rate)
+    sweep = lfo(n, sample_rate, rate * 2, depth * 0.002 * sample_rate)
+
+    # int() of each delay truncates toward zero, as astype does
+    source = np.arange(n) - (delay + sweep).astype(np.int64)
+    output = audio + mix * np.take(audio, np.maximum(source, 0), axis=0)
+    # Samples before the delay line has filled pass through dry
+    early = source < 0
+    output[early] = audio[early]
+    return output.astype(audio.dtype, copy=False)
+
+def phaser(audio: np.ndarray, sample_rate: int, rate: float, depth: float, mix: float) -> np.ndarray:
+    """First-order all-pass style feedback modulated by an LFO.
+
+    out[i] = x[i] + mix * (x[i] - out[i-1] * lfo[i]), with out[0] = x[0],
+    solved as a linear recurrence instead of a per-sample loop.
+    """
+    if len(audio) == 0:
+        return audio.copy()
+    modulation = _per_sample(lfo(len(audio), sample_rate, rate * 2, depth), audio)
+    output = np.empty(audio.shape)
+    output[0] = audio[0]
+    output[1:] = linear_recurrence(-mix * modulation[1:], (1 + mix) * audio[1:], audio[0])
+    return output.astype(audio.dtype, copy=False)
+
+def compressor(audio: np.ndarray, threshold: float, ratio: float, attack: float, release: float) -> np.ndarray:
+    """Reduce gain above `threshold`, smoothed by attack/release coefficients."""
+    reduction = np.maximum(np.abs(audio) - threshold, 0) * (1 - 1 / ratio)
+    if reduction.ndim == 1:
+        smoothed = smooth_gain_reduction(reduction, attack, release)
+    else:
+        flat = reduction.reshape(len(reduction), int(np.prod(reduction.shape[1:])))
+        smoothed = np.stack([smooth_gain_reduction(flat[:, c], attack, release)
+                             for c in range(flat.shape[1])], axis=1).reshape(reduction.shape)
+    return (audio * (1 - smoothed)).astype(audio.dtype, copy=False)
+
+def smooth_gain_reduction(reduction: np.ndarray, attack: float, release: float, initial: float = None) -> np.ndarray:
+    """Attack/release smoothing of a 1-D gain reduction curve.
+
+    s[i] = s[i-1] + (g[i] - s[i-1]) * c[i], where c[i] is `attack` while the
+    reduction rises above s[i-1] and `release` otherwise. s[-1] is `initial`,
+    which defaults to g[0] (making s[0] = g[0]). For a fixed choice of
+    coefficients this is a linear recurrence, so the choices are guessed,
+    the recurrence solved, and the guesses corrected from the result. Values
+    up to the first wrong guess are final, so each round re-solves only the
+    remainder and the loop always terminates; on music it takes a handful
+    of rounds.
+    """
+    g = np.asarray(reduction, dtype=np.float64)
+    n = len(g)
+    smoothed = np.empty(n)
+    if n == 0:
+        return smoothed
+    if initial is None:
+        initial = g[0]
+    if attack == release:
+        return linear_recurrence(1 - attack, attack * g, initial)
+
+    # rising[i] is the coefficient choice for sample i
+    rising = np.empty(n, dtype=bool)
+    rising[0] = g[0] > initial
+    rising[1:] = g[1:] > g[:-1]
+    attacked, released = attack * g, release * g
+    previous = np.empty(n)
+    start = 0
+    while start < n:
+        choice = rising[start:]
+        previous[start] = smoothed[start - 1] if start else initial
+        smoothed[start:] = linear_recurrence(np.where(choice, 1 - attack, 1 - release),
+                                             np.where(choice, attacked[start:], released[start:]),
+                                             previous[start])
+        previous[start + 1:] = smoothed[start:-1]
+        actual = g[start:] > previous[start:]
+        wrong = np.flatnonzero(actual != choice)
+        if not len(wrong):
+            break
+        rising[start:] = actual
+        start += int(wrong[0])
+    return smoothed
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""Block-based real-time audio engine for the DJ agent.
+
+The control side (the agent's event loop) writes audio into a ring buffer
+and posts parameter changes; the audio side pulls fixed-size blocks from
+the buffer, runs them through a chain of stateful effect processors and
+hands them to an output. The two sides share only single-producer /
+single-consumer structures, so neither ever waits on a lock held by the
+other.
+"""
+import os
+import time
+import heapq
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Any, AsyncIterable, Iterable, List, Optional, Union
+
+import numpy as np
+from scipy import signal
+
+from dj_dsp import linear_recurrence, smooth_gain_reduction
+from dj_convolution import PartitionedConvolver, reverb_impulse_response
+from dj_multiband import BANDS, MultibandCompressor
+
+logger = logging.getLogger(__name__)
+
+# Frames per IR partition of the streaming reverb: smaller costs more CPU, never latency
+REVERB_PARTITION_SIZE = int(os.getenv('DJ_REVERB_PARTITION_SIZE', '512'))
+# Seconds an output opened for playback keeps running after the last playback (effect tails ring out)
+IDLE_STOP_SECONDS = float(os.getenv('DJ_ENGINE_IDLE_STOP_SECONDS', '2'))
+
+class RingBuffer:
+    """Single-producer, single-consumer ring buffer of audio frames.
+
+    The producer only advances the write counter and the consumer only the
+    read counter, each after copying its data, so no lock is needed.
+    """
+
+    def __init__(self, capacity: int, channels: int):
+        self.capacity = capacity
+        self.channels = channels
+        self._data = np.zeros((capacity, channels))
+        self._written = 0
+        self._read = 0
+
+    @property
+    def readable(self) -> int:
+        return self._written - self._read
+
+    @property
+    def writable(self) -> int:
+        return self.capacity - self.readable
+
+    @property
+    def written(self) -> int:
+        """Frames written since the buffer was created"""
+        return self._written
+
+    def write(self, frames: np.ndarray) -> int:
+        """Copy as many frames as fit; returns how many were written."""
+        count = min(len(frames), self.writable)
+        start = self._written % self.capacity
+        first = min(count, self.capacity - start)
+        self._data[start:start + first] = frames[:first]
+        self._data[:count - first] = frames[first:count]
+        self._written += count
+        return count
+
+    def read(self, out: np.ndarray) -> int:
+        """Fill `out` with up to len(out) frames; returns how many were read."""
+        count = min(len(out), self.readable)
+        start = self._read % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        out[first:count] = self._data[:count - first]
+        self._read += count
+        return count
+
+    def discard(self, until: Optional[int] = None) -> None:
+        """Drop what is readable, up to the `until`-th frame written if given (consumer side only)."""
+        self._read = self._written if until is None else max(self._read, min(until, self._written))
+
+class DelayLine:
+    """The most recent frames of a stream, for processors reading the past."""
+
+    def __init__(self, channels: int):
+        self.history = np.zeros((0, channels))
+
+    def extend(self, block: np.ndarray, keep: int) -> np.ndarray:
+        """History followed by `block`; afterwards the last `keep` frames are kept."""
+        combined = np.concatenate([self.history, block])
+        self.history = combined[max(len(combined) - keep, 0):].copy()
+        return combined
+
+    def reset(self) -> None:
+        self.history = self.history[:0]
+
+class Processor:
+    """Stateful effect working on (frames, channels) blocks.
+
+    Processing consecutive blocks gives the same result as processing their
+    concatenation, so a stream can be split anywhere, including at the
+    sample where a parameter changes.
+    """
+
+    def __init__(self, name: str, sample_rate: int, channels: int, parameters: Dict[str, float],
+                 enabled: bool = True):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.parameters = dict(parameters)
+        self.enabled = enabled
+        self.reset()
+
+    def set(self, parameter: str, value: Any) -> None:
+        if parameter == 'enabled':
+            if value and not self.enabled:
+                # Do not resume from state left over from before it was switched off
+                self.reset()
+            self.enabled = bool(value)
+        elif parameter in self.parameters:
+            self.parameters[parameter] = float(value)
+        else:
+            raise KeyError(f"{self.name} has no parameter {parameter}")
+
+    def reset(self) -> None:
+        pass
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+class GainProcessor(Processor):
+    def __init__(self, name: str, sample_rate: int, channels: int, volume: float = 1.0):
+        super().__init__(name, sample_rate, channels, {"volume": volume})
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        return block * self.parameters["volume"]
+
+class LFOProcessor(Processor):
+    """Processor modulated by a sine LFO whose phase runs on across blocks.
+
+    The phase is computed from the sample count since the rate last
+    changed, so it does not depend on how the stream is split into blocks.
+    """
+
+    def reset(self) -> None:
+        self.phase = 0.0  # phase when the rate last changed
+        self.count = 0  # samples since then
+
+    def set(self, parameter: str, value: Any) -> None:
+        if parameter == "rate" and self.enabled:
+            rate = self.parameters["rate"] * 2
+            self.phase = (self.phase + 2 * np.pi * rate * (self.count / self.sample_rate)) % (2 * np.pi)
+            self.count = 0
+        super().set(parameter, value)
+
+    def lfo(self, frames: int, rate: float, depth: float) -> np.ndarray:
+        t = np.arange(self.count, self.count + frames) / self.sample_rate
+        self.count += frames
+        return depth * np.sin(self.phase + 2 * np.pi * rate * t)
+
+class ReverbProcessor(Processor):
+    """Convolution reverb, the streaming form of DJAgent._apply_reverb.
+
+    The IR is rebuilt when `room_size` or `damping` changes, without
+    cutting off the tail already ringing.
+    """
+
+    def reset(self) -> None:
+        self.convolver = None
+        self.room = None
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        room = (self.parameters["room_size"], self.parameters["damping"])
+        if room != self.room:
+            ir = reverb_impulse_response(self.sample_rate, *room)
+            if self.convolver is None:
+                self.convolver = PartitionedConvolver(ir, self.channels, REVERB_PARTITION_SIZE)
+            else:
+                self.convolver.set_impulse_response(ir)
+            self.room = room
+        wet = self.parameters["wet"]
+        return wet * self.convolver.process(block) + (1 - wet) * block
+
+class DelayProcessor(Processor):
+    """Single echo `time` seconds behind the signal, as DJAgent._apply_delay."""
+
+    def reset(self) -> None:
+        self.line = DelayLine(self.channels)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        delay = int(self.parameters["time"] * self.sample_rate)
+        combined = self.line.extend(block, delay)
+        end = len(combined) - delay
+        if delay <= 0 or end <= 0:
+            return block
+        echo = combined[max(end - len(block), 0):end]
+        output = block.copy()
+        output[len(block) - len(echo):] += self.parameters["mix"] * echo
+        return output
+
+class FilterProcessor(Processor):
+    """Causal 4th order Butterworth low-pass.
+
+    DJAgent._apply_filter runs the same filter forwards and backwards
+    (zero phase), which needs the whole signal; streaming uses one pass.
+    """
+
+    def reset(self) -> None:
+        self.cutoff = None
+        self.sos = None
+        self.state = None
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        nyquist = self.sample_rate / 2
+        cutoff = self.parameters["cutoff"]
+        if not 0 < cutoff < nyquist:
+            return block
+        if cutoff != self.cutoff:
+            self.cutoff = cutoff
+            self.sos = signal.butter(4, cutoff / nyquist, btype='low', output='sos')
+            if self.state is None:
+                self.state = np.zeros((self.sos.shape[0], 2, self.channels))
+        output, self.state = signal.sosfilt(self.sos, block, axis=0, zi=self.state)
+        return output
+
+class FlangerProcessor(LFOProcessor):
+    """Streaming form of dj_dsp.flanger"""
+
+    def reset(self) -> None:
+        super().reset()
+        self.line = DelayLine(self.channels)
+        self.position = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        frames = len(block)
+        delay = int(0.002 * self.sample_rate)
+        sweep = self.lfo(frames, self.parameters["rate"] * 2, self.parameters["depth"] * 0.002 * self.sample_rate)
+        delays = (delay + sweep).astype(np.int64)
+        combined = self.line.extend(block, 2 * delay + 1)
+        source = np.arange(len(combined) - frames, len(combined)) - delays
+        output = block + self.parameters["mix"] * np.take(combined, np.clip(source, 0, len(combined) - 1), axis=0)
+        # Nothing to mix in before the stream reached the delay
+        early = self.position + np.arange(frames) < delays
+        output[early] = block[early]
+        self.position += frames
+        return output
+
+class PhaserProcessor(LFOProcessor):
+    """Streaming form of dj_dsp.phaser"""
+
+    def reset(self) -> None:
+        super().reset()
+        self.previous = None
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        if len(block) == 0:
+            return block
+        mix = self.parameters["mix"]
+        modulation = self.lfo(len(block), self.parameters["rate"] * 2, self.parameters["depth"])[:, None]
+        if self.previous is None:
+            # The first sample of the stream passes through
+            output = np.empty_like(block)
+            output[0] = block[0]
+            output[1:] = linear_recurrence(-mix * modulation[1:], (1 + mix) * block[1:], block[0])
+        else:
+            output = linear_recurrence(-mix * modulation, (1 + mix) * block, self.previous)
+        self.previous = output[-1].copy()
+        return output
+
+class CompressorProcessor(Processor):
+    """Streaming form of dj_dsp.compressor"""
+
+    def reset(self) -> None:
+        self.smoothed = None
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        if len(block) == 0:
+            return block
+        params = self.parameters
+        reduction = np.maximum(np.abs(block) - params["threshold"], 0) * (1 - 1 / params["ratio"])
+        initial = self.smoothed if self.smoothed is not None else [None] * block.shape[1]
+        smoothed = np.stack([smooth_gain_reduction(reduction[:, c], params["attack"], params["release"], initial[c])
+                             for c in range(block.shape[1])], axis=1)
+        self.smoothed = smoothed[-1].copy()
+        return block * (1 - smoothed)
+
+class MultibandCompressorProcessor(Processor):
+    """Streaming form of dj_multiband.multiband_compress.
+
+    Parameters are named `<band>_<setting>`, e.g. `low_threshold`; see
+    dj_multiband.band_parameters.
+    """
+
+    def reset(self) -> None:
+        self.compressor = None
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        settings = [{name[len(band) + 1:]: value for name, value in self.parameters.items()
+                     if name.startswith(band + "_")} for band in BANDS]
+        if self.compressor is None:
+            self.compressor = MultibandCompressor(self.sample_rate, self.channels, settings)
+        self.compressor.settings = settings
+        return self.compressor.process(block)
+
+EFFECT_PROCESSORS = {
+    "reverb": ReverbProcessor,
+    "delay": DelayProcessor,
+    "filter": FilterProcessor,
+    "flanger": FlangerProcessor,
+    "phaser": PhaserProcessor,
+    "compressor": CompressorProcessor,
+    "multiband_compressor": MultibandCompressorProcessor,
+}
+
+def effect_chain(effects: Dict[str, Any], sample_rate: int, channels: int = 2) -> List[Processor]:
+    """Processors mirroring DJAgent's `effects` table, in the same order."""
+    return [EFFECT_PROCESSORS[name](name, sample_rate, channels, effect.parameters, effect.enabled)
+            for name, effect in effects.items() if name in EFFECT_PROCESSORS]
+
+@dataclass(order=True)
+class ParameterChange:
+    frame: int
+    sequence: int
+    processor: str = field(compare=False)
+    parameter: str = field(compare=False)
+    value: Any = field(compare=False)
+
+@dataclass
+class EngineStats:
+    blocks: int = 0
+    underruns: int = 0
+    overruns: int = 0  # blocks that took longer to process than to play
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+async def _as_async(blocks):
+    if hasattr(blocks, '__aiter__'):
+        async for block in blocks:
+            yield block
+    else:
+        for block in blocks:
+            yield block
+
+class AudioEngine:
+    """Pulls fixed-size blocks from a ring buffer through an effect chain.
+
+    `process_block` is the audio callback and runs on the output's thread.
+    Everything else is the control side: `play` feeds audio without
+    blocking the event loop, and `set_parameter` schedules a change at an
+    exact frame (by default the start of the next block).
+    """
+
+    def __init__(self, sample_rate: int = 44100, block_size: int = 512, channels: int = 2,
+                 processors: Optional[List[Processor]] = None, buffer_seconds: float = 0.5):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.channels = channels
+        self.processors = list(processors or []) + [GainProcessor("master", sample_rate, channels)]
+        self.buffer = RingBuffer(max(int(buffer_seconds * sample_rate), 2 * block_size), channels)
+        self.stats = EngineStats()
+        self.frame = 0  # frames rendered so far
+        self.output = None
+        self._block = np.zeros((block_size, channels))
+        self._changes: deque = deque()  # control -> audio
+        self._pending: List[ParameterChange] = []  # audio side only
+        self._sequence = 0
+        self._feeding = False
+        # Playbacks are numbered; stop_playback stops every one up to _stopped
+        # and has the audio side drop the frames written before _discard_until
+        self._playback = 0
+        self._stopped = 0
+        self._discard_until = 0
+        # Rendered blocks are appended here while it is set, e.g. to record the mix
+        self.recorded: Optional[deque] = None
+        self.stop_when_idle = False
+        self._idle_stop: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def block_seconds(self) -> float:
+        return self.block_size / self.sample_rate
+
+    def processor(self, name: str) -> Processor:
+        for processor in self.processors:
+            if processor.name == name:
+                return processor
+        raise KeyError(f"No processor named {name}")
+
+    # Control side
+
+    def set_parameter(self, processor: str, parameter: str, value: Any, at_frame: Optional[int] = None) -> int:
+        """Schedule a parameter change; returns the frame it takes effect at."""
+        self.processor(processor)  # fail on the control side, not in the callback
+        frame = self.frame if at_frame is None else at_frame
+        self._sequence += 1
+        self._changes.append(ParameterChange(frame, self._sequence, processor, parameter, value))
+        return frame
+
+    def start(self, output=None, stop_when_idle: bool = False) -> None:
+        """Open the output; with `stop_when_idle` it closes again once playback has finished."""
+        if self.output is None:
+            self.output = output or SoundDeviceOutput()
+            self.stop_when_idle = stop_when_idle
+            self.output.start(self)
+
+    def stop(self) -> None:
+        if self._idle_stop is not None:
+            self._idle_stop.cancel()
+            self._idle_stop = None
+        if self.output is not None:
+            self.output.stop()
+            self.output = None
+
+    async def play(self, audio: np.ndarray) -> None:
+        """Stream `audio` into the engine and return once it has been rendered."""
+        await self.play_stream([audio])
+
+    async def play_stream(self, blocks: Union[Iterable[np.ndarray], AsyncIterable[np.ndarray]]) -> None:
+        """Stream consecutive blocks of any size, e.g. a mix produced on the fly.
+
+        Returns once the audio has been rendered, or when stop_playback is
+        called. An output opened here is closed IDLE_STOP_SECONDS after the
+        last playback ends.
+        """
+        self._playback += 1
+        token = self._playback
+        if self._idle_stop is not None:
+            self._idle_stop.cancel()
+            self._idle_stop = None
+        self.start(stop_when_idle=True)
+        self._feeding = True
+        stopped = lambda: token <= self._stopped
+        blocks = _as_async(blocks)
+        try:
+            async for audio in blocks:
+                if len(audio) == 0:
+                    continue
+                audio = audio.reshape(len(audio), -1)
+                if audio.shape[1] != self.channels:
+                    audio = np.broadcast_to(audio[:, :1], (len(audio), self.channels))
+                position = 0
+                while position < len(audio) and not stopped():
+                    position += self.buffer.write(audio[position:position + self.buffer.writable])
+                    if position < len(audio):
+                        await asyncio.sleep(self.block_seconds)
+                if stopped():
+                    return
+            self._feeding = False
+            while self.buffer.readable and not stopped():
+                await asyncio.sleep(self.block_seconds)
+        finally:
+            await blocks.aclose()
+            if token == self._playback:
+                # Nothing newer is feeding the buffer
+                self._feeding = False
+                if self.stop_when_idle and self.output is not None:
+                    self._idle_stop = asyncio.get_running_loop().call_later(
+                        IDLE_STOP_SECONDS, self._stop_if_idle, token)
+
+    def _stop_if_idle(self, token: int) -> None:
+        self._idle_stop = None
+        if token == self._playback and self.stop_when_idle:
+            self.stop()
+
+    def stop_playback(self) -> None:
+        """Stop the playbacks started so far and drop their buffered audio; effects and parameters are kept.
+
+        A playback started afterwards is not affected, even if the audio
+        side has not caught up with the stop yet.
+        """
+        self._stopped = self._playback
+        self.flush()
+
+    def flush(self) -> None:
+        """Drop the audio buffered so far, e.g. after seeking the source; playbacks go on."""
+        self._discard_until = self.buffer.written
+
+    def status(self) -> Dict[str, Any]:
+        stats = self.stats
+        mean = stats.total_seconds / stats.blocks if stats.blocks else 0.0
+        return {
+            'blocks': stats.blocks,
+            'underruns': stats.underruns,
+            'overruns': stats.overruns,
+            'block_ms': self.block_seconds * 1000,
+            'mean_process_ms': mean * 1000,
+            'max_process_ms': stats.max_seconds * 1000,
+            'load': mean / self.block_seconds,
+            'buffered_frames': self.buffer.readable,
+        }
+
+    # Audio side
+
+    def process_block(self, out: np.ndarray) -> None:
+        """Render len(out) frames into `out`."""
+        started = time.perf_counter()
+        frames = len(out)
+        block = self._block[:frames] if frames <= self.block_size else np.zeros((frames, self.channels))
+        self.buffer.discard(self._discard_until)
+        received = self.buffer.read(block)
+        if received < frames:
+            block[received:] = 0.0
+            if self._feeding:
+                self.stats.underruns += 1
+
+        out[:] = self.render(block)
+        recorded = self.recorded
+        if recorded is not None:
+            recorded.append(out.copy())
+        elapsed = time.perf_counter() - started
+        self.stats.blocks += 1
+        self.stats.total_seconds += elapsed
+        self.stats.max_seconds = max(self.stats.max_seconds, elapsed)
+        if elapsed > frames / self.sample_rate:
+            self.stats.overruns += 1
+
+    def render(self, block: np.ndarray) -> np.ndarray:
+        """Run the next `len(block)` frames through the chain, in place.
+
+        Used by `process_block`, and directly for offline rendering where
+        blocks can be as large as convenient.
+        """
+        frames = len(block)
+        while self._changes:
+            heapq.heappush(self._pending, self._changes.popleft())
+        position = 0
+        while self._pending and self._pending[0].frame < self.frame + frames:
+            change = heapq.heappop(self._pending)
+            offset = max(change.frame - self.frame, 0)
+            if offset > position:
+                self._run_chain(block, position, offset)
+                position = offset
+            try:
+                self.processor(change.processor).set(change.parameter, change.value)
+            except (KeyError, ValueError) as e:
+                logger.error(f"Error applying parameter change: {str(e)}")
+        self._run_chain(block, position, frames)
+        self.frame += frames
+        return block
+
+    def _run_chain(self, block: np.ndarray, start: int, end: int) -> None:
+        if end <= start:
+            return
+        segment = block[start:end]
+        for processor in self.processors:
+            if processor.enabled:
+                segment = processor.process(segment)
+        block[start:end] = segment
+
+class SoundDeviceOutput:
+    """Plays the engine through the default sound device."""
+
+    def start(self, engine: AudioEngine) -> None:
+        import sounddevice as sd
+
+        def callback(outdata, frames, time_info, status):
+            if status.output_underflow:
+                engine.stats.underruns += 1
+            engine.process_block(outdata)
+
+        self.stream = sd.OutputStream(samplerate=engine.sample_rate, blocksize=engine.block_size,
+                                      channels=engine.channels, dtype='float32', callback=callback)
+        self.stream.start()
+
+    def stop(self) -> None:
+        self.stream.stop()
+        self.stream.close()
+
+class NullOutput:
+    """Headless output: calls the engine from its own thread and discards
+    (or keeps) the audio.
+
+    With `realtime` the blocks are paced at the playback rate like a sound
+    card; without it they are pulled as fast as the engine can render.
+    """
+
+    def __init__(self, realtime: bool = True, keep: bool = False):
+        self.realtime = realtime
+        self.keep = keep
+        self.blocks: List[np.ndarray] = []
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, engine: AudioEngine) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(engine,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, engine: AudioEngine) -> None:
+        out = np.zeros((engine.block_size, engine.channels), dtype=np.float32)
+        deadline = time.perf_counter()
+        while self._running:
+            engine.process_block(out)
+            if self.keep:
+                self.blocks.append(out.copy())
+            if self.realtime:
+                deadline += engine.block_seconds
+                time.sleep(max(deadline - time.perf_counter(), 0))
+            else:
+                time.sleep(0)
+
+    def audio(self) -> np.ndarray:
+        return np.concatenate(self.blocks) if self.blocks else np.zeros((0, 2))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Multi-band dynamics for the DJ agent.
+
+A Linkwitz-Riley crossover bank splits the signal into bands in one
+causal pass: each crossover is a 4th order low-pass / high-pass pair
+(two cascaded Butterworth biquads each), applied as a tree, and every
+band but the top one is run through the all-pass of the crossovers above
+it. The bands then sum to an all-pass of the input, so with no gain
+change the output has the input's magnitude response exactly.
+
+Each band gets its own compressor. Levels, the static gain curve and the
+attack/release smoothing are computed for whole blocks with numpy (see
+dj_dsp.smooth_gain_reduction), and the filter and smoother state carries
+over between blocks, so streaming a signal block by block gives the same
+output as processing it whole.
+"""
+from typing import Any, Dict, Sequence
+
+import numpy as np
+from scipy import signal
+
+from dj_dsp import smooth_gain_reduction
+
+BANDS = ("low", "mid", "high")
+# Crossover frequencies between consecutive BANDS, in Hz
+CROSSOVER_FREQUENCIES = (200.0, 2000.0)
+# Level treated as silence by the level detector, in dB
+LEVEL_FLOOR_DB = -120.0
+
+def linkwitz_riley(cutoff: float, sample_rate: int, btype: str) -> np.ndarray:
+    """4th order Linkwitz-Riley low- or high-pass as second-order sections."""
+    butterworth = signal.butter(2, cutoff, btype=btype, fs=sample_rate, output='sos')
+    return np.vstack([butterworth, butterworth])
+
+def linkwitz_riley_allpass(cutoff: float, sample_rate: int) -> np.ndarray:
+    """The all-pass a 4th order Linkwitz-Riley low-pass and high-pass sum to, as one section."""
+    a = signal.butter(2, cutoff, fs=sample_rate, output='sos')[0, 3:]
+    return np.concatenate([a[::-1], a])[None, :]
+
+class CrossoverBank:
+    """Linkwitz-Riley band splitter over (frames, channels) blocks.
+
+    `frequencies` are the ascending crossover points; there is one band
+    more than there are crossovers.
+    """
+
+    def __init__(self, frequencies: Sequence[float], sample_rate: int, channels: int):
+        self.frequencies = list(frequencies)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        # Per crossover: the low side with the all-passes of every crossover above it, and the high side
+        self.low = [np.vstack([linkwitz_riley(f, sample_rate, 'lowpass')] +
+                              [linkwitz_riley_allpass(above, sample_rate) for above in self.frequencies[i + 1:]])
+                    for i, f in enumerate(self.frequencies)]
+        self.high = [linkwitz_riley(f, sample_rate, 'highpass') for f in self.frequencies]
+        self.reset()
+
+    @property
+    def bands(self) -> int:
+        return len(self.frequencies) + 1
+
+    def reset(self) -> None:
+        self.low_state = [np.zeros((len(sos), 2, self.channels)) for sos in self.low]
+        self.high_state = [np.zeros((len(sos), 2, self.channels)) for sos in self.high]
+
+    def allpass(self) -> np.ndarray:
+        """The sections the bands sum to (all-pass of every crossover)"""
+        return np.vstack([linkwitz_riley_allpass(f, self.sample_rate) for f in self.frequencies])
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Split the next block: (bands, frames, channels)."""
+        bands = np.empty((self.bands,) + block.shape)
+        rest = block
+        for i in range(len(self.frequencies)):
+            bands[i], self.low_state[i] = signal.sosfilt(self.low[i], rest, axis=0, zi=self.low_state[i])
+            rest, self.high_state[i] = signal.sosfilt(self.high[i], rest, axis=0, zi=self.high_state[i])
+        bands[-1] = rest
+        return bands
+
+def time_constant(seconds: float, sample_rate: int) -> float:
+    """One-pole smoothing coefficient reaching 1 - 1/e of a step in `seconds`; 1 (instant) for 0."""
+    return 1.0 if seconds <= 0 else float(1 - np.exp(-1.0 / (seconds * sample_rate)))
+
+def band_levels(bands: np.ndarray) -> np.ndarray:
+    """Peak level of each band and frame across channels, in dB: (bands, frames)."""
+    peak = np.abs(bands).max(axis=2)
+    return 20 * np.log10(np.maximum(peak, 10 ** (LEVEL_FLOOR_DB / 20)))
+
+def gain_reduction(levels: np.ndarray, thresholds: np.ndarray, ratios: np.ndarray) -> np.ndarray:
+    """Static compression curve: dB of gain reduction for (bands, frames) levels in dB."""
+    return np.maximum(levels - thresholds[:, None], 0) * (1 - 1 / ratios[:, None])
+
+class MultibandCompressor:
+    """Compressor per crossover band, stereo-linked within each band.
+
+    `settings` has a dict per band with `threshold` (dB), `ratio`,
+    `attack` and `release` (seconds) and an optional `makeup` (dB), as
+    DJAgent.compressor holds them.
+    """
+
+    def __init__(self, sample_rate: int, channels: int, settings: Sequence[Dict[str, float]],
+                 frequencies: Sequence[float] = CROSSOVER_FREQUENCIES):
+        if len(settings) != len(frequencies) + 1:
+            raise ValueError(f"{len(frequencies)} crossovers need {len(frequencies) + 1} band settings")
+        self.sample_rate = sample_rate
+        self.settings = [dict(band) for band in settings]
+        self.bank = CrossoverBank(frequencies, sample_rate, channels)
+        self.reset()
+
+    def reset(self) -> None:
+        self.bank.reset()
+        self.smoothed = np.zeros(self.bank.bands)  # gain reduction in dB, per band
+
+    def gains(self, bands: np.ndarray) -> np.ndarray:
+        """Linear gain per band and frame, (bands, frames), advancing the smoothers."""
+        thresholds = np.array([band["threshold"] for band in self.settings], dtype=np.float64)
+        ratios = np.array([band["ratio"] for band in self.settings], dtype=np.float64)
+        reduction = gain_reduction(band_levels(bands), thresholds, ratios)
+        smoothed = np.empty_like(reduction)
+        for i, band in enumerate(self.settings):
+            smoothed[i] = smooth_gain_reduction(reduction[i], time_constant(band["attack"], self.sample_rate),
+                                                time_constant(band["release"], self.sample_rate), self.smoothed[i])
+        if reduction.shape[1]:
+            self.smoothed = smoothed[:, -1].copy()
+        makeup = np.array([band.get("makeup", 0.0) for band in self.settings], dtype=np.float64)
+        return 10 ** ((makeup[:, None] - smoothed) / 20)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Compress the next (frames, channels) block."""
+        bands = self.bank.process(np.asarray(block, dtype=np.float64))
+        return np.einsum('bfc,bf->fc', bands, self.gains(bands))
+
+def multiband_compress(audio: np.ndarray, sample_rate: int, settings: Sequence[Dict[str, float]],
+                       frequencies: Sequence[float] = CROSSOVER_FREQUENCIES) -> np.ndarray:
+    """Whole-signal multi-band compression of (frames,) or (frames, channels) audio."""
+    x = np.asarray(audio, dtype=np.float64)
+    x2 = x.reshape(len(x), -1)
+    output = MultibandCompressor(sample_rate, x2.shape[1], settings, frequencies).process(x2)
+    return output.reshape(x.shape)
+
+def band_parameters(settings: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+    """DJAgent.compressor's per-band dicts flattened to `<band>_<setting>` processor parameters."""
+    return {f"{band}_{name}": float(value) for band in BANDS for name, value in settings[band].items()}
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Disk cache of decoded, resampled track PCM for the DJ agent.
+
+Decoding a compressed track (and time-stretching it for a mix) costs far
+more than reading it back, so each result is kept as a float32 `.npy`
+file and later requests memory-map it. Files are shared by every process
+using the same directory; the least recently used are deleted once the
+cache grows past its size cap.
+"""
+import os
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PCM_CACHE_DIR = os.getenv('DJ_PCM_CACHE_DIR', 'cache/dj_pcm')
+PCM_CACHE_MAX_BYTES = int(float(os.getenv('DJ_PCM_CACHE_MAX_GB', '4')) * 2 ** 30)
+
+def decode(file_path: str, sample_rate: int) -> np.ndarray:
+    """Decode a file to mono float32 PCM at `sample_rate`."""
+    import librosa
+    y, _ = librosa.load(file_path, sr=sample_rate)
+    return y
+
+def stretch(y: np.ndarray, tempo_ratio: float) -> np.ndarray:
+    import librosa
+    return librosa.effects.time_stretch(np.asarray(y), rate=tempo_ratio)
+
+class PCMCache:
+    """Decoded PCM keyed by file (path, size, mtime), sample rate and tempo ratio.
+
+    A hit touches the file's mtime, which is what eviction orders by.
+    Arrays are returned as read-only memory maps; evicting a file another
+    caller still maps is safe, the mapping outlives the directory entry.
+    """
+
+    def __init__(self, directory: str = PCM_CACHE_DIR, max_bytes: int = PCM_CACHE_MAX_BYTES,
+                 decoder: Callable[[str, int], np.ndarray] = decode):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.decoder = decoder
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, file_path: str, sample_rate: int, tempo_ratio: float = 1.0) -> str:
+        stat = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{sample_rate}\0{tempo_ratio!r}"
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest()[:32] + '.npy')
+
+    def lookup(self, file_path: str, sample_rate: int, tempo_ratio: float = 1.0) -> Optional[np.ndarray]:
+        """The cached PCM, memory-mapped, or None; counts towards the hit rate."""
+        mapped = self._map(self.path(file_path, sample_rate, tempo_ratio))
+        with self._lock:
+            if mapped is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return mapped
+
+    def load(self, file_path: str, sample_rate: int, tempo_ratio: float = 1.0, count: bool = True) -> np.ndarray:
+        """PCM of a file at `sample_rate`, time-stretched by `tempo_ratio`, decoding only on a miss.
+
+        `count=False` leaves the hit rate alone, for callers that already
+        looked the file up.
+        """
+        path = self.path(file_path, sample_rate, tempo_ratio)
+        mapped = self.lookup(file_path, sample_rate, tempo_ratio) if count else self._map(path)
+        if mapped is not None:
+            return mapped
+        if tempo_ratio == 1.0:
+            y = self.decoder(file_path, sample_rate)
+        else:
+            # The unstretched PCM is cached too; other mixes stretch the same track differently
+            base_path = self.path(file_path, sample_rate)
+            base = self._map(base_path)
+            if base is None:
+                base = self.store(base_path, self.decoder(file_path, sample_rate))
+            y = stretch(base, tempo_ratio)
+        return self.store(path, y)
+
+    def duration(self, file_path: str, sample_rate: int) -> Optional[float]:
+        """Length in seconds of an already cached file, read from the `.npy` header."""
+        mapped = self._map(self.path(file_path, sample_rate))
+        return None if mapped is None else len(mapped) / sample_rate
+
+    def store(self, path: str, y: np.ndarray) -> np.ndarray:
+        # Written under a unique name and renamed, so readers never map a partial file
+        partial = f"{path}.{uuid.uuid4().hex}.partial"
+        with open(partial, 'wb') as f:
+            np.save(f, np.asarray(y, dtype=np.float32))
+        os.replace(partial, path)
+        self.evict(keep=path)
+        return np.load(path, mmap_mode='r')
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete least recently used files until the cache fits its cap; returns how many."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} decoded tracks from {self.directory}")
+        return removed
+
+    def clear(self) -> None:
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                os.remove(entry.path)
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = [entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.npy')]
+        requests = self.hits + self.misses
+        return {
+            'directory': self.directory,
+            'entries': len(sizes),
+            'bytes': sum(sizes),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
+
+    @staticmethod
+    def _map(path: str) -> Optional[np.ndarray]:
+        try:
+            mapped = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return mapped
+
+_pcm_cache: Optional[PCMCache] = None
+
+def get_pcm_cache() -> PCMCache:
+    global _pcm_cache
+    if _pcm_cache is None:
+        _pcm_cache = PCMCache()
+    return _pcm_cache
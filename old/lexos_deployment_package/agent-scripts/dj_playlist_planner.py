@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Playlist planning over a precomputed track compatibility graph.
+
+Tracks are indexed by Camelot key, energy and BPM, so each track is only
+compared with the few tracks it could mix into; the cheapest transitions
+of each track are kept as a sparse neighbour table. Planning is then a
+beam search over that table towards a target duration and energy curve,
+cut off after a fixed time budget.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Camelot wheel positions: (number, ring), ring 0 for minor keys and 1 for major
+CAMELOT = {
+    "Am": (8, 0), "Em": (9, 0), "Bm": (10, 0), "F#m": (11, 0), "C#m": (12, 0),
+    "G#m": (1, 0), "D#m": (2, 0), "A#m": (3, 0), "Fm": (4, 0), "Cm": (5, 0),
+    "Gm": (6, 0), "Dm": (7, 0),
+    "C": (8, 1), "G": (9, 1), "D": (10, 1), "A": (11, 1), "E": (12, 1),
+    "B": (1, 1), "F#": (2, 1), "C#": (3, 1), "G#": (4, 1), "D#": (5, 1),
+    "A#": (6, 1), "F": (7, 1)
+}
+UNKNOWN_KEY = 24
+
+# Graph build: energy bins per `max_energy_jump` in the index, and tracks compared per chunk
+ENERGY_BINS_PER_JUMP = 1
+BUILD_CHUNK = 32
+
+# Transition costs between Camelot codes
+SAME_KEY_COST = 0.0
+ADJACENT_KEY_COST = 0.5  # one step round the wheel, or the relative major/minor
+UNKNOWN_KEY_COST = 1.0
+
+def camelot_code(key: str) -> int:
+    """0-23 for a key name like "A#" or "F#m" (12 * ring + number - 1), UNKNOWN_KEY otherwise."""
+    position = CAMELOT.get(key) or CAMELOT.get(key.replace("minor", "m").replace("major", "").replace(" ", ""))
+    if position is None:
+        return UNKNOWN_KEY
+    number, ring = position
+    return 12 * ring + number - 1
+
+def compatible_codes(code: int) -> Dict[int, float]:
+    """Camelot codes that mix harmonically with `code`, with their transition cost."""
+    if code == UNKNOWN_KEY:
+        return {UNKNOWN_KEY: UNKNOWN_KEY_COST}
+    ring, number = divmod(code, 12)
+    return {
+        code: SAME_KEY_COST,
+        12 * ring + (number + 1) % 12: ADJACENT_KEY_COST,
+        12 * ring + (number - 1) % 12: ADJACENT_KEY_COST,
+        12 * (1 - ring) + number: ADJACENT_KEY_COST,
+    }
+
+def energy_targets(curve: Union[float, Sequence[float], Callable[[np.ndarray], np.ndarray]],
+                   progress: np.ndarray) -> np.ndarray:
+    """Target energy at each `progress` (0 at the start of the set, 1 at the end)."""
+    if callable(curve):
+        return np.asarray(curve(progress), dtype=np.float64)
+    points = np.atleast_1d(np.asarray(curve, dtype=np.float64))
+    return np.interp(progress, np.linspace(0.0, 1.0, len(points)), points)
+
+@dataclass
+class PlannedPlaylist:
+    indices: List[int]
+    duration: float
+    cost: float
+    complete: bool  # reached the target duration
+    seconds: float  # time spent solving
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'tracks': len(self.indices),
+            'duration': self.duration,
+            'cost': self.cost,
+            'complete': self.complete,
+            'seconds': self.seconds,
+        }
+
+class PlaylistPlanner:
+    """Sparse compatibility graph of a library, and path search over it.
+
+    A transition i -> j is allowed when the BPMs differ by at most
+    `max_bpm_diff`, the keys are Camelot-compatible and the energies
+    differ by at most `max_energy_jump`. Its cost adds the three
+    differences, each scaled to its limit, and only the `neighbors`
+    cheapest transitions of each track are kept.
+    """
+
+    def __init__(self, bpm: Sequence[float], keys: Sequence[str], energy: Sequence[float],
+                 durations: Sequence[float], max_bpm_diff: float = 10.0, max_energy_jump: float = 0.3,
+                 neighbors: int = 32):
+        started = time.perf_counter()
+        self.bpm = np.asarray(bpm, dtype=np.float32)
+        self.codes = np.array([camelot_code(key) for key in keys], dtype=np.int64)
+        self.energy = np.asarray(energy, dtype=np.float32)
+        self.durations = np.asarray(durations, dtype=np.float64)
+        self.max_bpm_diff = max_bpm_diff
+        self.max_energy_jump = max_energy_jump
+        self.neighbors = np.full((len(self.bpm), neighbors), -1, dtype=np.int64)
+        self.costs = np.full((len(self.bpm), neighbors), np.inf, dtype=np.float32)
+        self._build()
+        self.build_seconds = time.perf_counter() - started
+
+    def __len__(self) -> int:
+        return len(self.bpm)
+
+    def _build(self) -> None:
+        """Fill the neighbour table from an index of the library.
+
+        The index groups tracks by (Camelot code, energy bin), each group
+        sorted by BPM, so a chunk of tracks close in BPM only compares
+        against a contiguous BPM slice of each compatible group in reach.
+        """
+        if not len(self):
+            return
+        k = self.neighbors.shape[1]
+        energy_bins = np.floor(self.energy * (ENERGY_BINS_PER_JUMP / self.max_energy_jump)).astype(np.int64)
+        order = np.lexsort((self.bpm, energy_bins, self.codes))
+        group_ids = self.codes[order] * (energy_bins.max() - energy_bins.min() + 2) + energy_bins[order]
+        starts = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+        groups = {}
+        for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+            indices = order[start:end]
+            groups[(int(self.codes[indices[0]]), int(energy_bins[indices[0]]))] = (indices, self.bpm[indices])
+
+        for (code, energy_bin), (members_all, bpm_all) in groups.items():
+            firsts = np.arange(0, len(members_all), BUILD_CHUNK)
+            low = bpm_all[firsts] - self.max_bpm_diff
+            high = bpm_all[np.minimum(firsts + BUILD_CHUNK, len(members_all)) - 1] + self.max_bpm_diff
+            # Compatible groups in reach, with the slice bounds of every chunk
+            reachable = []
+            for other, key_cost in compatible_codes(code).items():
+                for other_bin in range(energy_bin - ENERGY_BINS_PER_JUMP, energy_bin + ENERGY_BINS_PER_JUMP + 1):
+                    group = groups.get((other, other_bin))
+                    if group is not None:
+                        indices, bpm = group
+                        reachable.append((indices, key_cost, (other, other_bin) == (code, energy_bin),
+                                          bpm.searchsorted(low, 'left'), bpm.searchsorted(high, 'right')))
+
+            for c, first in enumerate(firsts):
+                members = members_all[first:first + BUILD_CHUNK]
+                parts, key_costs, lengths = [], [], []
+                own = 0
+                for indices, key_cost, is_own, los, his in reachable:
+                    lo, hi = los[c], his[c]
+                    if is_own:
+                        own = sum(lengths) + first - lo  # column of members[0] itself
+                    if hi > lo:
+                        parts.append(indices[lo:hi])
+                        key_costs.append(key_cost)
+                        lengths.append(hi - lo)
+                candidates = np.concatenate(parts)
+
+                bpm_diff = self.bpm[members, None] - self.bpm[candidates]
+                np.abs(bpm_diff, out=bpm_diff)
+                energy_diff = self.energy[members, None] - self.energy[candidates]
+                np.abs(energy_diff, out=energy_diff)
+                invalid = bpm_diff > self.max_bpm_diff
+                invalid |= energy_diff > self.max_energy_jump
+                cost = bpm_diff
+                cost *= 1 / self.max_bpm_diff
+                energy_diff *= 1 / self.max_energy_jump
+                cost += energy_diff
+                cost += np.repeat(np.asarray(key_costs, dtype=np.float32), lengths)
+                np.copyto(cost, np.inf, where=invalid)
+                cost[np.arange(len(members)), own + np.arange(len(members))] = np.inf
+
+                if len(candidates) > k:
+                    best = np.argpartition(cost, k - 1, axis=1)[:, :k]
+                    cost = np.take_along_axis(cost, best, axis=1)
+                    chosen = candidates[best]
+                else:
+                    chosen = np.broadcast_to(candidates, cost.shape)
+                ranked = np.argsort(cost, axis=1)
+                cost = np.take_along_axis(cost, ranked, axis=1)
+                chosen = np.where(np.isfinite(cost), np.take_along_axis(chosen, ranked, axis=1), -1)
+                self.neighbors[members, :cost.shape[1]] = chosen
+                self.costs[members, :cost.shape[1]] = cost
+
+    def plan(self, duration: float, energy_curve: Union[float, Sequence[float], Callable] = 0.7,
+             allowed: Optional[np.ndarray] = None, start: Optional[int] = None, beam_width: int = 64,
+             energy_weight: float = 2.0, time_budget: float = 0.5) -> PlannedPlaylist:
+        """A playlist of about `duration` seconds following `energy_curve`.
+
+        Beam search: every step extends the `beam_width` cheapest partial
+        playlists by each of their unused neighbours. A step's cost is the
+        transition cost plus the distance of the new track's energy from
+        the curve at that point of the set. The search stops when every
+        playlist in the beam is long enough or `time_budget` runs out, and
+        returns the best playlist found.
+        """
+        started = time.perf_counter()
+        allowed = np.ones(len(self), dtype=bool) if allowed is None else np.asarray(allowed, dtype=bool)
+        if not allowed.any():
+            return PlannedPlaylist([], 0.0, 0.0, False, time.perf_counter() - started)
+
+        def fit(indices: np.ndarray, elapsed: np.ndarray) -> np.ndarray:
+            # Energy measured against the curve at the middle of each track
+            progress = np.clip((elapsed + self.durations[indices] / 2) / duration, 0.0, 1.0)
+            return energy_weight * np.abs(self.energy[indices] - energy_targets(energy_curve, progress))
+
+        if start is not None:
+            starts = np.array([start])
+        else:
+            candidates = np.flatnonzero(allowed & (self.neighbors[:, 0] >= 0))
+            if not len(candidates):
+                candidates = np.flatnonzero(allowed)
+            start_cost = fit(candidates, np.zeros(len(candidates)))
+            starts = candidates[np.argsort(start_cost, kind='stable')[:beam_width]]
+
+        # Beam entries: (cost, elapsed seconds, path)
+        beam = [(float(c), float(self.durations[s]), [int(s)])
+                for s, c in zip(starts, fit(starts, np.zeros(len(starts))))]
+        finished = [entry for entry in beam if entry[1] >= duration]
+        beam = [entry for entry in beam if entry[1] < duration]
+        best_partial = min(beam, key=lambda entry: (-entry[1], entry[0]), default=None)
+
+        while beam and time.perf_counter() - started < time_budget:
+            last = np.array([path[-1] for _, _, path in beam])
+            nexts = self.neighbors[last]
+            step_costs = self.costs[last].astype(np.float64)
+            valid = nexts >= 0
+            valid[valid] &= allowed[nexts[valid]]
+            rows, cols = np.nonzero(valid)
+            if not len(rows):
+                break
+            chosen = nexts[rows, cols]
+            elapsed = np.array([beam[r][1] for r in rows])
+            total = np.array([beam[r][0] for r in rows]) + step_costs[rows, cols] + fit(chosen, elapsed)
+
+            extended = []
+            for i in np.argsort(total, kind='stable'):
+                cost, seconds, path = beam[rows[i]]
+                track = int(chosen[i])
+                if track in path:
+                    continue
+                extended.append((float(total[i]), seconds + float(self.durations[track]), path + [track]))
+                if len(extended) == beam_width:
+                    break
+            if not extended:
+                break
+            finished += [entry for entry in extended if entry[1] >= duration]
+            beam = [entry for entry in extended if entry[1] < duration]
+            if beam:
+                best_partial = max(beam, key=lambda entry: (entry[1], -entry[0]))
+
+        if finished:
+            cost, seconds, path = min(finished, key=lambda entry: entry[0] / len(entry[2]))
+            complete = True
+        else:
+            cost, seconds, path = best_partial
+            complete = False
+        return PlannedPlaylist(path, seconds, cost, complete, time.perf_counter() - started)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Mix timelines for the DJ agent, played live or rendered offline.
+
+A mix is a list of `MixEntry`s placed on a timeline with crossfades. The
+tracks are decoded and time-stretched in parallel worker processes, then
+the timeline is mixed block by block through an `AudioEngine` chain. For
+rendering the whole mix is prepared first and the blocks go straight to a
+WAV/FLAC file, as fast as the chain allows; for playback (`LiveMix`) the
+blocks go to the engine's ring buffer while later tracks are still being
+prepared.
+"""
+import os
+import time
+import asyncio
+import itertools
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from dj_engine import AudioEngine
+from dj_pcm_cache import get_pcm_cache
+
+logger = logging.getLogger(__name__)
+
+RENDER_BLOCK_SIZE = 65536
+
+@dataclass
+class MixEntry:
+    """One track on a mix timeline; times are seconds of the mix."""
+    file_path: str
+    start: float
+    tempo_ratio: float = 1.0  # time-stretch rate applied to the track
+    fade_in: float = 0.0
+    fade_out_start: Optional[float] = None  # the track ends fade_out seconds after this
+    fade_out: float = 0.0
+
+@dataclass
+class RenderResult:
+    path: str
+    seconds: float  # length of the rendered mix
+    prepare_seconds: float  # decoding and time-stretching
+    render_seconds: float  # mixing, effects and writing
+    workers: int
+
+    @property
+    def total_seconds(self) -> float:
+        return self.prepare_seconds + self.render_seconds
+
+    @property
+    def speed(self) -> float:
+        """Render speed as a multiple of real time"""
+        return self.seconds / self.total_seconds if self.total_seconds else float('inf')
+
+    def info(self) -> Dict[str, float]:
+        return {
+            'path': self.path,
+            'seconds': self.seconds,
+            'prepare_seconds': self.prepare_seconds,
+            'render_seconds': self.render_seconds,
+            'workers': self.workers,
+            'speed': self.speed,
+        }
+
+def load_track(file_path: str, sample_rate: int, tempo_ratio: float) -> np.ndarray:
+    """Mono float PCM of a track, time-stretched, decoded only if not in the PCM cache."""
+    return get_pcm_cache().load(file_path, sample_rate, tempo_ratio)
+
+def _load_missing_track(file_path: str, sample_rate: int, tempo_ratio: float) -> np.ndarray:
+    # prepare_tracks already counted this track's cache miss
+    return get_pcm_cache().load(file_path, sample_rate, tempo_ratio, count=False)
+
+def _warm_up_worker() -> None:
+    # Importing librosa and compiling its kernels takes longer than stretching a track
+    import librosa
+    noise = np.random.default_rng(0).standard_normal(22050).astype(np.float32)
+    librosa.effects.time_stretch(noise, rate=1.01)
+
+def _prepare_track(loader: Callable, file_path: str, sample_rate: int, tempo_ratio: float, out_path: str) -> str:
+    # Runs in a worker process; the PCM travels back through a file, not a pipe
+    audio = loader(file_path, sample_rate, tempo_ratio)
+    if isinstance(audio, np.memmap) and audio.filename and audio.dtype == np.float32:
+        return audio.filename  # already a file, e.g. in the PCM cache
+    np.save(out_path, np.asarray(audio, dtype=np.float32))
+    return out_path
+
+def track_keys(entries: List[MixEntry]) -> List[Tuple[str, float]]:
+    """Distinct (file_path, tempo_ratio) pairs, each prepared once."""
+    return list(dict.fromkeys((entry.file_path, entry.tempo_ratio) for entry in entries))
+
+def worker_count(tracks: int, workers: Optional[int] = None) -> int:
+    return max(1, min(workers or os.cpu_count() or 1, tracks))
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+def worker_pool(workers: int) -> ProcessPoolExecutor:
+    """Persistent pool of `workers` processes, so later mixes skip process start-up."""
+    pool = _pools.get(workers)
+    if pool is None:
+        # Spawned workers do not inherit the agent's model-laden process state
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        _pools[workers] = pool
+    return pool
+
+def warm_up(workers: Optional[int] = None) -> None:
+    """Start the preparation workers and have each load librosa ahead of the first mix."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _warm_up_worker()
+        return
+    pool = worker_pool(workers)
+    for future in [pool.submit(_warm_up_worker) for _ in range(workers)]:
+        future.result()
+
+def shutdown_workers() -> None:
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+def prepare_tracks(entries: List[MixEntry], sample_rate: int, work_dir: str, workers: Optional[int] = None,
+                   loader: Callable = load_track) -> Dict[Tuple[str, float], np.ndarray]:
+    """Decode and stretch every distinct (file, ratio) of `entries`, one process per track.
+
+    Returns memory-mapped arrays keyed by (file_path, tempo_ratio). With
+    the default loader, tracks already in the PCM cache are mapped
+    without a worker round trip and `work_dir` stays unused.
+    """
+    keys = track_keys(entries)
+    tracks = {}
+    if loader is load_track:
+        cache = get_pcm_cache()
+        for key in keys:
+            mapped = cache.lookup(key[0], sample_rate, key[1])
+            if mapped is not None:
+                tracks[key] = mapped
+        loader = _load_missing_track
+    missing = [key for key in keys if key not in tracks]
+    if not missing:
+        return tracks
+
+    workers = worker_count(len(missing), workers)
+    paths = {key: os.path.join(work_dir, f"track_{i}.npy") for i, key in enumerate(missing)}
+    if workers == 1:
+        paths = {key: _prepare_track(loader, key[0], sample_rate, key[1], paths[key]) for key in missing}
+    else:
+        pool = worker_pool(workers)
+        futures = {key: pool.submit(_prepare_track, loader, key[0], sample_rate, key[1], paths[key])
+                   for key in missing}
+        paths = {key: future.result() for key, future in futures.items()}
+    tracks.update({key: np.load(path, mmap_mode='r') for key, path in paths.items()})
+    return {key: tracks[key] for key in keys}
+
+class MixTimeline:
+    """Mixes prepared tracks with their fades, one block at a time.
+
+    Tracks can be added while the timeline plays, as long as each starts
+    after the playback position. `position` is the next frame `blocks`
+    reads, and `seek` moves it.
+    """
+
+    def __init__(self, entries: List[MixEntry], tracks: Dict[Tuple[str, float], np.ndarray],
+                 sample_rate: int, channels: int = 2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._spans = []
+        self.frames = 0
+        self.position = 0
+        for entry in entries:
+            self.add(entry, tracks[(entry.file_path, entry.tempo_ratio)])
+
+    def add(self, entry: MixEntry, audio: np.ndarray) -> None:
+        """Place a prepared track on the timeline"""
+        start = int(round(entry.start * self.sample_rate))
+        end = start + len(audio)
+        fade_out_start = None
+        if entry.fade_out_start is not None:
+            fade_out_start = int(round(entry.fade_out_start * self.sample_rate))
+            end = min(end, fade_out_start + int(entry.fade_out * self.sample_rate))
+        self._spans.append((entry, audio, start, end, fade_out_start))
+        self.frames = max(self.frames, end)
+
+    @property
+    def seconds(self) -> float:
+        return self.frames / self.sample_rate
+
+    @property
+    def entries(self) -> List[MixEntry]:
+        return [entry for entry, *_ in self._spans]
+
+    def entry_at(self, frame: int) -> Optional[MixEntry]:
+        """The latest track started by `frame`"""
+        started = [entry for entry, _, start, *_ in self._spans if start <= frame]
+        return started[-1] if started else None
+
+    def seek(self, frame: int) -> None:
+        self.position = min(max(int(frame), 0), self.frames)
+
+    def read(self, position: int, frames: int) -> np.ndarray:
+        """The mix from frame `position`, at most `frames` long."""
+        frames = max(min(frames, self.frames - position), 0)
+        block = np.zeros((frames, self.channels))
+        for entry, audio, start, end, fade_out_start in self._spans:
+            first, last = max(position, start), min(position + frames, end)
+            if first >= last:
+                continue
+            t = np.arange(first, last)
+            gain = np.ones(last - first)
+            fade_in = int(entry.fade_in * self.sample_rate)
+            if fade_in and first < start + fade_in:
+                gain *= np.minimum((t - start) / fade_in, 1.0)
+            if fade_out_start is not None and last > fade_out_start:
+                fade_out = max(int(entry.fade_out * self.sample_rate), 1)
+                gain *= np.clip(1.0 - (t - fade_out_start) / fade_out, 0.0, 1.0)
+            samples = np.asarray(audio[first - start:last - start], dtype=np.float64)
+            samples = samples.reshape(len(samples), -1)
+            block[first - position:last - position] += samples * gain[:, None]
+        return block
+
+    def blocks(self, block_size: int) -> Iterator[np.ndarray]:
+        """The mix from `position` on, advancing it"""
+        while self.position < self.frames:
+            block = self.read(self.position, block_size)
+            self.position += len(block)
+            yield block
+
+class LiveMix:
+    """A mix played while it is still being planned and prepared.
+
+    `plan` yields the entries in timeline order; planning an entry can be
+    slow (beat matching reads the audio), so it runs in a worker thread
+    together with preparing the track. Playback starts once the first two
+    tracks are ready, and each later track is planned and prepared while
+    the one before it plays, one transition ahead.
+    """
+
+    def __init__(self, plan: Iterable[MixEntry], sample_rate: int, channels: int, work_dir: str,
+                 workers: Optional[int] = None):
+        self.timeline = MixTimeline([], {}, sample_rate, channels)
+        self._plan = iter(plan)
+        self._work_dir = work_dir
+        self._workers = workers
+        self.planned = False  # every entry is on the timeline
+        self._last_start = 0  # frame the newest track starts at
+        self._horizon = 0  # frames playable before the next track must be on the timeline
+
+    def _prepare(self, count: int) -> List[Tuple[MixEntry, np.ndarray]]:
+        # Runs in a worker thread
+        entries = list(itertools.islice(self._plan, count))
+        if not entries:
+            return []
+        tracks = prepare_tracks(entries, self.timeline.sample_rate, self._work_dir, self._workers)
+        return [(entry, tracks[(entry.file_path, entry.tempo_ratio)]) for entry in entries]
+
+    def _add(self, prepared: List[Tuple[MixEntry, np.ndarray]]) -> None:
+        if not prepared:
+            self.planned = True
+            self._horizon = self.timeline.frames
+            return
+        sample_rate = self.timeline.sample_rate
+        for entry, audio in prepared:
+            self.timeline.add(entry, audio)
+        entry = prepared[-1][0]
+        self._last_start = int(round(entry.start * sample_rate))
+        # The next track comes in where this one starts fading out
+        self._horizon = (int(round(entry.fade_out_start * sample_rate)) if entry.fade_out_start is not None
+                         else self.timeline.frames)
+
+    async def blocks(self, block_size: int) -> AsyncIterator[np.ndarray]:
+        timeline = self.timeline
+        self._add(await asyncio.to_thread(self._prepare, 2))
+        pending: Optional[asyncio.Future] = None
+        try:
+            while True:
+                if pending is None and not self.planned and timeline.position >= self._last_start:
+                    pending = asyncio.ensure_future(asyncio.to_thread(self._prepare, 1))
+                if pending is not None and (pending.done() or timeline.position + block_size > self._horizon):
+                    if not pending.done():
+                        logger.warning("Mix preparation is behind playback, waiting for the next track")
+                    self._add(await pending)
+                    pending = None
+                    continue
+                if timeline.position >= timeline.frames:
+                    if self.planned:
+                        return
+                    continue
+                block = timeline.read(timeline.position, block_size)
+                timeline.position += len(block)
+                yield block
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+def render_mix(entries: List[MixEntry], output_path: str, engine: AudioEngine,
+               block_size: int = RENDER_BLOCK_SIZE, workers: Optional[int] = None,
+               loader: Callable = load_track) -> RenderResult:
+    """Render a mix through `engine`'s chain straight to a WAV/FLAC file.
+
+    The engine should be a dedicated one (not the playback engine), since
+    its processors carry the state of the render. The file format follows
+    the extension of `output_path`.
+    """
+    import soundfile as sf
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='dj_render_') as work_dir:
+        tracks = prepare_tracks(entries, engine.sample_rate, work_dir, workers, loader)
+        prepared = time.perf_counter()
+        timeline = MixTimeline(entries, tracks, engine.sample_rate, engine.channels)
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with sf.SoundFile(output_path, 'w', samplerate=engine.sample_rate, channels=engine.channels) as out:
+            for block in timeline.blocks(block_size):
+                out.write(np.clip(engine.render(block), -1.0, 1.0))
+        del tracks
+    result = RenderResult(output_path, timeline.seconds, prepared - started, time.perf_counter() - prepared,
+                          worker_count(len(track_keys(entries)), workers))
+    logger.info(f"Rendered {result.seconds:.1f}s mix to {output_path} at {result.speed:.1f}x real time")
+    return result
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Rhythm analysis of a track, computed once and shared.
+
+One pass finds the onset envelope, frame energy, beats, downbeats and a
+per-beat tempo curve. Danceability, section analysis, the beat grid and
+its markers all read from that result instead of each re-running beat
+tracking or tempo estimation. Everything is on one frame grid (hop of
+ONSET_HOP samples), so looking a beat up in a frame-rate feature is an
+index, and other grids are matched with sorted searches.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.ndimage import median_filter
+
+from dj_beat_align import ONSET_HOP
+
+# Beats of local tempo smoothed together in the tempo curve
+TEMPO_SMOOTHING_BEATS = 9
+
+@dataclass
+class Rhythm:
+    sample_rate: int
+    hop_length: int
+    onset_envelope: np.ndarray  # onset strength per frame
+    rms: np.ndarray  # energy per frame
+    tempo: float  # global BPM
+    beat_frames: np.ndarray
+    downbeat_frames: np.ndarray
+    tempo_curve: np.ndarray  # local BPM at each beat
+
+    @property
+    def frame_rate(self) -> float:
+        return self.sample_rate / self.hop_length
+
+    @property
+    def beat_times(self) -> np.ndarray:
+        return self.beat_frames / self.frame_rate
+
+    @property
+    def downbeat_times(self) -> np.ndarray:
+        return self.downbeat_frames / self.frame_rate
+
+    @property
+    def beat_strength(self) -> np.ndarray:
+        """Onset strength at each beat"""
+        return self.onset_envelope[np.minimum(self.beat_frames, len(self.onset_envelope) - 1)]
+
+    def tempo_between(self, start: float, end: float) -> float:
+        """Median local tempo of the beats in [start, end) seconds; the global tempo if there are none."""
+        lo, hi = np.searchsorted(self.beat_times, [start, end])
+        return float(np.median(self.tempo_curve[lo:hi])) if hi > lo else self.tempo
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'tempo': self.tempo,
+            'beats': len(self.beat_frames),
+            'downbeats': len(self.downbeat_frames),
+            'tempo_range': [float(self.tempo_curve.min()), float(self.tempo_curve.max())]
+            if len(self.tempo_curve) else None,
+        }
+
+def analyze_rhythm(y: np.ndarray, sample_rate: int, hop_length: int = ONSET_HOP, beats_per_bar: int = 4) -> Rhythm:
+    """Onset envelope, energy, beats, downbeats and tempo curve of a mono signal.
+
+    The downbeat is the beat phase (of `beats_per_bar`) with the strongest
+    mean onset.
+    """
+    import librosa
+    y = np.asarray(y, dtype=np.float32)
+    # Median across bands, as librosa's beat tracker computes it from audio
+    onset = librosa.onset.onset_strength(y=y, sr=sample_rate, hop_length=hop_length, aggregate=np.median)
+    rms = librosa.feature.rms(y=y, hop_length=hop_length)[0]
+    tempo, beat_frames = librosa.beat.beat_track(onset_envelope=onset, sr=sample_rate, hop_length=hop_length)
+    tempo = float(np.atleast_1d(tempo)[0])
+    beat_frames = np.asarray(beat_frames, dtype=np.int64)
+
+    strength = onset[np.minimum(beat_frames, len(onset) - 1)] if len(onset) else np.zeros(len(beat_frames))
+    phases = [strength[phase::beats_per_bar].mean() if len(strength[phase::beats_per_bar]) else -np.inf
+              for phase in range(beats_per_bar)]
+    downbeat_frames = beat_frames[int(np.argmax(phases))::beats_per_bar]
+
+    if len(beat_frames) > 1:
+        local = 60.0 * sample_rate / hop_length / np.diff(beat_frames)
+        local = median_filter(np.r_[local, local[-1]], size=TEMPO_SMOOTHING_BEATS, mode='nearest')
+    else:
+        local = np.full(len(beat_frames), tempo)
+    return Rhythm(sample_rate, hop_length, onset, rms, tempo, beat_frames, downbeat_frames, local)
+
+def nearest_index(grid: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Index of the nearest element of the sorted `grid` for each value (the earlier one on ties)."""
+    if len(grid) < 2:
+        return np.zeros(len(values), dtype=np.int64)
+    right = np.clip(np.searchsorted(grid, values), 1, len(grid) - 1)
+    left = right - 1
+    return np.where(values - grid[left] <= grid[right] - values, left, right)
+
+def danceability(rhythm: Rhythm, spectral_centroid: float) -> float:
+    """Tempo, energy and brightness blended into a 0-1 score."""
+    tempo_score = min(rhythm.tempo / 180.0, 1.0)
+    energy_score = float(np.mean(rhythm.rms))
+    spectral_score = spectral_centroid / (rhythm.sample_rate / 2)
+    return float(tempo_score * 0.4 + energy_score * 0.3 + spectral_score * 0.3)
+
+def sections(S: np.ndarray, rhythm: Rhythm, count: int = 100) -> List[Dict[str, Any]]:
+    """Structural sections from a magnitude spectrogram on the rhythm's frame grid.
+
+    Frames are averaged per beat before clustering, so boundaries fall on
+    beats and the clustering works on one column per beat instead of one
+    per frame. Energy and tempo of each section come from the rhythm.
+    """
+    import librosa
+    frames = S.shape[1]
+    bounds = np.unique(np.r_[0, rhythm.beat_frames[rhythm.beat_frames < frames]])
+    synced = librosa.util.sync(S, bounds, aggregate=np.mean, pad=True)
+    segment_starts = np.r_[bounds, frames][:synced.shape[1]]
+    if synced.shape[1] < 2:
+        return []
+    boundaries = np.r_[segment_starts[librosa.segment.agglomerative(synced, min(count, synced.shape[1]))], frames]
+    result = []
+    for start_frame, end_frame in zip(boundaries[:-1], boundaries[1:]):
+        start = float(start_frame / rhythm.frame_rate)
+        end = float(end_frame / rhythm.frame_rate)
+        result.append({
+            "start_time": start,
+            "end_time": end,
+            "energy": float(np.mean(rhythm.rms[start_frame:end_frame])),
+            "tempo": rhythm.tempo_between(start, end),
+        })
+    return result
+
+def beat_markers(rhythm: Rhythm, energy_times: Optional[np.ndarray] = None,
+                 energy: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """A marker per beat with the energy at the nearest energy frame and a 0-1 beat confidence.
+
+    Energy defaults to the rhythm's own, on its own frame grid.
+    """
+    if energy is None:
+        energy = rhythm.rms
+        energy_times = np.arange(len(energy)) / rhythm.frame_rate
+    beat_times = rhythm.beat_times
+    beat_energy = energy[nearest_index(energy_times, beat_times)] if len(energy) else np.zeros(len(beat_times))
+    strength = rhythm.beat_strength
+    confidence = strength / strength.max() if len(strength) and strength.max() > 0 else np.ones(len(beat_times))
+    downbeats = np.isin(rhythm.beat_frames, rhythm.downbeat_frames)
+    return [{"time": time, "type": "downbeat" if downbeat else "beat", "energy": level, "confidence": conf}
+            for time, downbeat, level, conf in zip(beat_times.tolist(), downbeats.tolist(), beat_energy.tolist(),
+                                                   confidence.tolist())]
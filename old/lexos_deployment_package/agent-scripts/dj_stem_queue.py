@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""Stem separation for the DJ agent: a disk cache and a background queue.
+
+Separated stems are stored per (track contents, model, stem count), so a
+track is only ever separated once per model. Separation runs in a small
+pool of worker processes, each loading its model once. Upcoming tracks
+can be queued ahead of time; a request for stems that are cached returns
+at once, and one for stems already being separated joins that job.
+"""
+import os
+import re
+import json
+import heapq
+import shutil
+import hashlib
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from dj_track_db import hash_file
+
+logger = logging.getLogger(__name__)
+
+STEM_CACHE_DIR = os.getenv('DJ_STEM_CACHE_DIR', 'cache/dj_stems')
+STEM_CACHE_MAX_BYTES = int(float(os.getenv('DJ_STEM_CACHE_MAX_GB', '20')) * 2 ** 30)
+STEM_WORKERS = int(os.getenv('DJ_STEM_WORKERS', '1'))
+STEM_MODEL = os.getenv('DJ_STEM_MODEL', 'spleeter:6stems')
+# File hashes remembered by (path, size, mtime), most recently used
+HASHES_KEPT = 4096
+
+# Queue priorities: requests someone is waiting for go before prefetching
+ON_DEMAND = 0
+PREFETCH = 1
+
+def stem_count(model: str) -> int:
+    """Number of stems a spleeter model name like "spleeter:4stems" produces."""
+    match = re.search(r'(\d+)stems', model)
+    return int(match.group(1)) if match else 0
+
+class StemCache:
+    """Separated stems on disk, one directory of `.npy` files per key.
+
+    Directories are written under a temporary name and renamed into
+    place, so a reader never sees half of a separation. A hit touches the
+    directory's mtime; eviction deletes the least recently used ones.
+    """
+
+    def __init__(self, directory: str = STEM_CACHE_DIR, max_bytes: int = STEM_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, content_hash: str, model: str, stems: int) -> str:
+        digest = hashlib.sha256(f"{content_hash}\0{model}\0{stems}".encode()).hexdigest()[:32]
+        return os.path.join(self.directory, digest)
+
+    def get(self, content_hash: str, model: str, stems: int) -> Optional[Dict[str, np.ndarray]]:
+        """Memory-mapped stems, or None; counts towards the hit rate."""
+        loaded = self._load(self.path(content_hash, model, stems))
+        with self._lock:
+            if loaded is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return loaded
+
+    def put(self, content_hash: str, model: str, stems: int, separated: Dict[str, np.ndarray]) -> str:
+        path = self.path(content_hash, model, stems)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+        os.makedirs(partial, exist_ok=True)
+        for name, audio in separated.items():
+            np.save(os.path.join(partial, f"{name}.npy"), np.asarray(audio, dtype=np.float32))
+        with open(os.path.join(partial, 'meta.json'), 'w') as f:
+            json.dump({'content_hash': content_hash, 'model': model, 'stems': sorted(separated)}, f)
+        try:
+            os.rename(partial, path)
+        except OSError:
+            # Another worker stored the same stems first
+            shutil.rmtree(partial, ignore_errors=True)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete least recently used separations until the cache fits its cap; returns how many."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and not entry.name.endswith('.partial'):
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime_ns, size, entry.path))
+                except FileNotFoundError:
+                    continue
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} stem separations from {self.directory}")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        entries = [entry for entry in os.scandir(self.directory) if entry.is_dir() and
+                   not entry.name.endswith('.partial')]
+        return {
+            'directory': self.directory,
+            'entries': len(entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
+
+    @staticmethod
+    def _load(path: str) -> Optional[Dict[str, np.ndarray]]:
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                names = json.load(f)['stems']
+            stems = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in names}
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return stems
+
+# Worker process state: the separation function loaded once by the pool initializer
+_worker_separate: Optional[Callable[[str], Dict[str, np.ndarray]]] = None
+
+def _init_worker(load_separator: Callable[[str], Callable], model: str) -> None:
+    global _worker_separate
+    _worker_separate = load_separator(model)
+
+def _separate_to_cache(file_path: str, content_hash: str, model: str, stems: int,
+                       cache_dir: str, max_bytes: int) -> str:
+    # Runs in a worker; the stems travel back through the cache, not the pipe
+    return StemCache(cache_dir, max_bytes).put(content_hash, model, stems, _worker_separate(file_path))
+
+def load_spleeter(model: str) -> Callable[[str], Dict[str, np.ndarray]]:
+    """A function separating a file with a spleeter model, for the queue's workers."""
+    from spleeter.separator import Separator
+    from dj_pcm_cache import get_pcm_cache
+    separator = Separator(model)
+
+    def separate(file_path: str) -> Dict[str, np.ndarray]:
+        audio = get_pcm_cache().load(file_path, 44100)
+        return separator.separate(np.asarray(audio).reshape(len(audio), -1))
+    return separate
+
+class StemQueue:
+    """Background stem separation with a bounded worker pool and a stem cache.
+
+    Jobs wait in a priority queue and at most `workers` run at once, so
+    on-demand requests overtake queued prefetches. Every request for the
+    same (contents, model, stems) shares one future.
+    """
+
+    def __init__(self, model: str = STEM_MODEL, workers: int = STEM_WORKERS, cache: Optional[StemCache] = None,
+                 load_separator: Callable[[str], Callable] = load_spleeter):
+        self.model = model
+        self.stems = stem_count(model)
+        self.workers = max(1, workers)
+        self.cache = cache or StemCache()
+        self.load_separator = load_separator
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int, str, str]] = []  # (priority, order, content_hash, file_path)
+        self._jobs: Dict[str, Future] = {}  # by content hash, queued or running
+        self._running = 0
+        self._order = itertools.count()
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+
+    def content_hash(self, file_path: str) -> str:
+        """SHA-256 of a file, remembered while its size and mtime stay the same.
+
+        Reads the whole file on a miss, so callers on an event loop should
+        run requests in a thread.
+        """
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            content_hash = self._hashes.pop(key, None)
+        if content_hash is None:
+            content_hash = hash_file(file_path)
+        with self._lock:
+            self._hashes[key] = content_hash
+            while len(self._hashes) > HASHES_KEPT:
+                self._hashes.pop(next(iter(self._hashes)))
+        return content_hash
+
+    def request(self, file_path: str, priority: int = ON_DEMAND) -> Future:
+        """Future of a file's stems: already done when cached, shared with any job in flight."""
+        content_hash = self.content_hash(file_path)
+        with self._lock:
+            job = self._jobs.get(content_hash)
+            if job is not None:
+                if priority < PREFETCH:
+                    self._promote(content_hash, priority)
+                return job
+        cached = self.cache.get(content_hash, self.model, self.stems)
+        if cached is not None:
+            done: Future = Future()
+            done.set_result(cached)
+            return done
+        with self._lock:
+            job = self._jobs.get(content_hash)
+            if job is None:
+                job = self._jobs[content_hash] = Future()
+                heapq.heappush(self._queue, (priority, next(self._order), content_hash, file_path))
+        self._dispatch()
+        return job
+
+    def get(self, file_path: str, timeout: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """A file's stems, waiting for the separation if needed."""
+        return self.request(file_path).result(timeout)
+
+    def prefetch(self, file_paths: Iterable[str]) -> List[Future]:
+        """Queue files for separation ahead of time, in the given order."""
+        return [self.request(path, PREFETCH) for path in file_paths]
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            queued, running = len(self._queue), self._running
+        return {'model': self.model, 'workers': self.workers, 'queued': queued, 'running': running,
+                'cache': self.cache.stats()}
+
+    def close(self) -> None:
+        with self._lock:
+            for _, _, content_hash, _ in self._queue:
+                self._jobs.pop(content_hash).cancel()
+            self._queue.clear()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _promote(self, content_hash: str, priority: int) -> None:
+        for i, (queued_priority, order, queued_hash, file_path) in enumerate(self._queue):
+            if queued_hash == content_hash and queued_priority > priority:
+                self._queue[i] = (priority, order, queued_hash, file_path)
+                heapq.heapify(self._queue)
+                return
+
+    def _dispatch(self) -> None:
+        with self._lock:
+            while self._queue and self._running < self.workers:
+                queued = heapq.heappop(self._queue)
+                _, _, content_hash, file_path = queued
+                if self._executor is None:
+                    # Spawned workers do not inherit the agent's model-laden process state
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker, initargs=(self.load_separator, self.model))
+                executor = self._executor
+                try:
+                    running = executor.submit(_separate_to_cache, file_path, content_hash, self.model,
+                                              self.stems, self.cache.directory, self.cache.max_bytes)
+                except BrokenProcessPool:
+                    # A worker died since the last job; the job never ran, so queue it again on a new pool
+                    logger.warning("Stem separation workers died, restarting them")
+                    self._discard_executor(executor)
+                    heapq.heappush(self._queue, queued)
+                    continue
+                self._running += 1
+                running.add_done_callback(
+                    lambda f, h=content_hash, p=file_path, e=executor: self._finished(h, p, f, e))
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        # Called with the lock held
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, content_hash: str, file_path: str, running: Future, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            self._running -= 1
+            job = self._jobs.pop(content_hash, None)
+            if not running.cancelled() and isinstance(running.exception(), BrokenProcessPool):
+                # The pool is unusable once a worker dies; the next dispatch starts a new one
+                self._discard_executor(executor)
+        if job is not None and not job.cancelled():
+            try:
+                stems = self.cache._load(running.result())
+                if stems is None:
+                    raise RuntimeError("stems were evicted before they could be read")
+                job.set_result(stems)
+            except Exception as e:
+                logger.error(f"Error separating stems of {file_path}: {str(e)}")
+                job.set_exception(e)
+        self._dispatch()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Persistent per-track feature database for the DJ agent's music library.
+
+Tracks are keyed by path and remember the size, mtime and content hash
+they were analysed at, so a rescan only analyses files that are new or
+whose contents changed, and forgets files that are gone.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DB_PATH = os.getenv('DJ_TRACK_DB_PATH', 'data/dj_tracks.sqlite3')
+
+# Bump when DJAgent._analyze_track changes what it computes; older rows are re-analysed
+ANALYZER_VERSION = '3'
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac')
+
+# Arrays stored next to the JSON record, as raw bytes of a fixed dtype
+ARRAY_FIELDS = {'beat_frames': np.int32, 'waveform': np.float16}
+
+# Stored tracks keep a peak overview instead of their full PCM
+WAVEFORM_POINTS = 2048
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    analyzer_version TEXT NOT NULL,
+    info TEXT NOT NULL,
+    beat_frames BLOB,
+    waveform BLOB,
+    analyzed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_content_hash ON tracks (content_hash);
+"""
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars and arrays that end up in sections and features
+    return value.tolist() if hasattr(value, 'tolist') else str(value)
+
+def waveform_overview(y: np.ndarray, points: int = WAVEFORM_POINTS) -> np.ndarray:
+    """Peak amplitude of `points` equal slices of a signal."""
+    y = np.abs(np.asarray(y, dtype=np.float32).reshape(len(y), -1)).max(axis=1) if len(y) else np.zeros(0)
+    if len(y) <= points:
+        return y
+    edges = np.linspace(0, len(y), points + 1).astype(np.int64)
+    return np.maximum.reduceat(y, edges[:-1])
+
+@dataclass
+class FileState:
+    path: str
+    size: int
+    mtime_ns: int
+    content_hash: Optional[str] = None
+
+@dataclass
+class ScanPlan:
+    """What a rescan of a library directory has to do."""
+    unchanged: List[str] = field(default_factory=list)
+    analyze: List[FileState] = field(default_factory=list)  # new or changed contents
+    reuse: List[Tuple[FileState, str]] = field(default_factory=list)  # (file, stored path with the same contents)
+    removed: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'unchanged': len(self.unchanged),
+            'analyze': len(self.analyze),
+            'reused': len(self.reuse),
+            'removed': len(self.removed),
+        }
+
+class TrackDatabase:
+    """Track features in a local SQLite file.
+
+    A record is a JSON object of the track's fields plus the arrays in
+    ARRAY_FIELDS, which are stored as raw bytes so that loading a whole
+    library does not parse them.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def plan_scan(self, root: str, extensions: Iterable[str] = AUDIO_EXTENSIONS) -> ScanPlan:
+        """Compare a directory with the database without analysing anything.
+
+        Only files whose size or mtime changed are hashed. A changed file
+        whose contents are already stored under some path (moved, copied
+        or merely touched) is reused instead of analysed.
+        """
+        root = os.path.abspath(root)
+        extensions = tuple(extensions)
+        with self._lock:
+            stored = {path: (size, mtime_ns, version) for path, size, mtime_ns, version in self._conn.execute(
+                'SELECT path, size, mtime_ns, analyzer_version FROM tracks WHERE path >= ? AND path < ?',
+                (root + os.sep, root + chr(ord(os.sep) + 1))
+            )}
+
+        plan = ScanPlan()
+        seen = set()
+        for directory, _, files in os.walk(root):
+            for name in files:
+                if not name.lower().endswith(extensions):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(path)
+                if stored.get(path) == (stat.st_size, stat.st_mtime_ns, ANALYZER_VERSION):
+                    plan.unchanged.append(path)
+                    continue
+                state = FileState(path, stat.st_size, stat.st_mtime_ns, hash_file(path))
+                source = self.path_with_contents(state.content_hash)
+                if source is not None:
+                    plan.reuse.append((state, source))
+                else:
+                    plan.analyze.append(state)
+        plan.removed = [path for path in stored if path not in seen]
+        return plan
+
+    def path_with_contents(self, content_hash: str) -> Optional[str]:
+        """A stored path analysed by the current analyzer from identical bytes."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT path FROM tracks WHERE content_hash = ? AND analyzer_version = ? LIMIT 1',
+                (content_hash, ANALYZER_VERSION)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, state: FileState, record: Dict[str, Any]) -> None:
+        """Store a track's record for the file in `state`, replacing any older one."""
+        info = {name: value for name, value in record.items() if name not in ARRAY_FIELDS}
+        arrays = [None if record.get(name) is None else np.asarray(record[name], dtype=dtype).tobytes()
+                  for name, dtype in ARRAY_FIELDS.items()]
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO tracks (path, size, mtime_ns, content_hash, analyzer_version, info, '
+                'beat_frames, waveform, analyzed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (state.path, state.size, state.mtime_ns, state.content_hash, ANALYZER_VERSION,
+                 json.dumps(info, default=_json_default), *arrays, time.time())
+            )
+
+    def reuse(self, state: FileState, source_path: str) -> Optional[Dict[str, Any]]:
+        """Store the record of `source_path` for another file with the same contents."""
+        record = self.get(source_path)
+        if record is None:
+            return None
+        record['file_path'] = state.path
+        record['title'] = os.path.basename(state.path)
+        self.put(state, record)
+        return record
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT info, beat_frames, waveform FROM tracks WHERE path = ?', (path,)
+            ).fetchone()
+        return self._record(row) if row else None
+
+    def load(self, root: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Every current record, optionally only those under `root`."""
+        query = 'SELECT info, beat_frames, waveform FROM tracks WHERE analyzer_version = ?'
+        params: list = [ANALYZER_VERSION]
+        if root:
+            root = os.path.abspath(root)
+            query += ' AND path >= ? AND path < ?'
+            params += [root + os.sep, root + chr(ord(os.sep) + 1)]
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def remove(self, paths: Iterable[str]) -> int:
+        with self._lock, self._conn:
+            return self._conn.executemany('DELETE FROM tracks WHERE path = ?', [(p,) for p in paths]).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT analyzer_version, COUNT(*) FROM tracks GROUP BY analyzer_version'
+            ).fetchall()
+        return {'path': self.path, 'tracks': {version: count for version, count in rows},
+                'analyzer_version': ANALYZER_VERSION}
+
+    @staticmethod
+    def _record(row: tuple) -> Dict[str, Any]:
+        record = json.loads(row[0])
+        for (name, dtype), blob in zip(ARRAY_FIELDS.items(), row[1:]):
+            record[name] = None if blob is None else np.frombuffer(blob, dtype=dtype)
+        return record